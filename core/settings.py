@@ -35,6 +35,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware', # Requeriment d'admin
     'django.middleware.clickjacking.XFrameOptionsMiddleware', # protegeix la web contra atacs de 'clickjacking'
     'whitenoise.middleware.WhiteNoiseMiddleware', # permet servir fitxers estàtics en producció (amb collecstatic)
+    'processdata.resolver.FormResolverMiddleware', # cada fingerprint es resol com a molt una vegada per petició
 ]
 
 ROOT_URLCONF = 'core.urls' # Li diu a Django on ha de buscar les rutes
@@ -63,6 +64,112 @@ TEMPLATES = [
 # Directori de metadades incloses en JSON
 JSON_DIR = os.path.join(BASE_DIR, "processdata/config")  
 
+# Caché de resultats del càlcul CSR (processdata/rating/cache.py)
+# BACKEND: LocalMemoryBackend (memòria del procés, LRU + TTL) o DjangoCacheBackend (OPTIONS: ALIAS, TIMEOUT) 
+RATING_CACHE = {
+    "BACKEND": "processdata.rating.cache.LocalMemoryBackend",
+    "OPTIONS": {"MAX_ENTRIES": 256, "TIMEOUT": 3600},
+}
+
+# Geocodificació inversa de la ubicació de la mina (processdata/geocoding.py)
+# BACKEND: NominatimGeocoder (OPTIONS: TIMEOUT) o StubGeocoder (OPTIONS: ADDRESS) per a tests sense xarxa.
+# ASYNC: resol l'adreça en un fil en segon pla després de desar l'Overview. QUEUE: l'encua a la cua de tasques
+# (TASK_QUEUE, requereix python manage.py run_task_worker): no es perd en reiniciar i es reintenta si falla. PRECISION: decimals de la caché de coordenades.
+GEOCODER = {
+    "BACKEND": "processdata.geocoding.NominatimGeocoder",
+    "OPTIONS": {"TIMEOUT": 5},
+    "ASYNC": True,
+    "QUEUE": False,
+    "PRECISION": 4,
+}
+
+# Creació de les files de subdimensió (processdata/models.py: create_forms)
+# False: es creen totes en registrar el fingerprint. True: cada fila es crea la primera vegada que es desa la seva secció
+# (les subdimensions sense fila es llegeixen amb els valors per defecte del model).
+LAZY_SUBDIMENSIONS = False
+
+# Emmagatzematge de les respostes de les dimensions (processdata/storage.py)
+# TableStorage: una taula per subdimensió. DocumentStorage: un document JSON per dimensió i formulari.
+# Per canviar de backend amb dades existents: python manage.py convert_answer_storage --to documents|tables
+ANSWER_STORAGE = {
+    "BACKEND": "processdata.storage.TableStorage",
+}
+
+# Resolució fingerprint -> formulari (processdata/resolver.py): LRU del procés amb les claus dels formularis,
+# a més de la memòria de cada petició (FormResolverMiddleware). MAX_ENTRIES = 0: només durant la petició.
+FORM_RESOLVER = {
+    "MAX_ENTRIES": 10000,
+}
+
+# Interval mínim (segons) entre escriptures de l'última connexió d'un usuari (last_seen) en recuperar el formulari
+LAST_SEEN_RESOLUTION = 3600
+
+# Escriptura diferida de last_seen (processdata/heartbeat.py): les visites es registren en un buffer i es desen amb un
+# sol UPDATE cada FLUSH_INTERVAL segons, en arribar a MAX_PENDING usuaris o en aturar el procés.
+# BACKEND: LocalHeartbeatBuffer (memòria del procés; cada worker desa les seves connexions).
+# El retard màxim de last_seen (FLUSH_INTERVAL + LAST_SEEN_RESOLUTION) ha de ser molt menor que el període de clean_bd.
+HEARTBEAT = {
+    "BACKEND": "processdata.heartbeat.LocalHeartbeatBuffer",
+    "FLUSH_INTERVAL": 30,
+    "MAX_PENDING": 500,
+}
+
+# Eliminació dels usuaris inactius (processdata/retention.py, python manage.py sweep_retention)
+# DAYS: dies sense connexió, BATCH_SIZE: usuaris per bloc (una transacció), SLEEP: segons d'espera entre blocs.
+RETENTION = {
+    "DAYS": 7,
+    "BATCH_SIZE": 500,
+    "SLEEP": 0.5,
+}
+
+# Tasques periòdiques (processdata/scheduler.py, processdata/jobs.py): python manage.py run_scheduler o, amb
+# IN_PROCESS = True, un fil a cada worker (core/wsgi.py). Un bloqueig a la base de dades (JobLock) evita que dos
+# processos executin la mateixa tasca. INTERVALS: segons entre execucions per tasca (None: desactivada). LOCK_TIMEOUT: segons
+# del bloqueig; les tasques llargues (retention_sweep) el renoven entre blocs.
+# Execucions (durada i files tractades): model JobRun (admin). KEEP_RUNS: dies que es conserven (tasca periòdica purge_tasks).
+SCHEDULER = {
+    "INTERVALS": {"retention_sweep": 3600, "warm_results_cache": 600, "geocode_backfill": 300, "purge_tasks": 86400},
+    "POLL_INTERVAL": 30,
+    "LOCK_TIMEOUT": 3600,
+    "IN_PROCESS": False,
+    "KEEP_RUNS": 30,
+}
+
+# Cua de tasques en segon pla a la base de dades (processdata/tasks.py, model Task): python manage.py run_task_worker.
+# WORKERS: fils per procés, POLL_INTERVAL: segons d'espera amb la cua buida, LEASE_TIMEOUT: segons màxims d'una tasca
+# abans que un altre worker la pugui reprendre. Reintents: MAX_ATTEMPTS, amb espera RETRY_DELAY * 2^(intent - 1) fins a
+# MAX_RETRY_DELAY segons. KEEP_FINISHED: dies que es conserven les tasques acabades (tasca periòdica purge_tasks).
+# Les instantànies de resultats de /api/results/ es recalculen en aquesta cua després de cada desat (sense worker, només
+# les actualitza la tasca periòdica warm_results_cache).
+TASK_QUEUE = {
+    "WORKERS": 2,
+    "POLL_INTERVAL": 1,
+    "LEASE_TIMEOUT": 300,
+    "MAX_ATTEMPTS": 5,
+    "RETRY_DELAY": 10,
+    "MAX_RETRY_DELAY": 3600,
+    "KEEP_FINISHED": 7,
+}
+
+# Límit de desats per fingerprint a /sync/ (processdata/throttle.py)
+# BACKEND: LocalTokenBuckets (memòria del procés) o CacheTokenBuckets (OPTIONS: ALIAS; compartit entre processos).
+# RATE: desats per segon, BURST: ràfega màxima. COALESCE_WINDOW: segons durant els quals s'agrupen els desats que
+# superen el límit en una sola escriptura (0: es rebutgen amb 429), que es responen amb 202 fins que el client les confirma.
+# Els lots pendents són sempre de la memòria de cada procés, també amb CacheTokenBuckets: un lot només es desa si les
+# respostes no han canviat mentrestant (si no, es descarta i el client reenvia). Comptadors: /api/save-stats/ (staff).
+SAVE_THROTTLE = {
+    "BACKEND": "processdata.throttle.LocalTokenBuckets",
+    "OPTIONS": {"RATE": 2, "BURST": 10},
+    "COALESCE_WINDOW": 1.0,
+}
+
+# Còdec JSON de les peticions i respostes de processdata (processdata/codec.py)
+# BACKEND: None (orjson si està instal·lat, si no la llibreria estàndard), "processdata.codec.OrjsonCodec" o "processdata.codec.StdlibCodec".
+# Comparativa amb les dades reals: python manage.py benchmark_codec
+JSON_CODEC = {
+    "BACKEND": None,
+}
+
 # Referència al punt d'entrada
 WSGI_APPLICATION = 'core.wsgi.application'
 
@@ -112,6 +219,10 @@ STATICFILES_DIRS = (
     os.path.join(BASE_DIR, 'core/static'),
 )
 
+# Fitxers amb hash del contingut al nom (ex: assets/build/questions.<hash>.js): WhiteNoise els serveix
+# amb capçaleres de caché de llarga durada (immutable), ja que qualsevol canvi genera un nom nou.
+WHITENOISE_IMMUTABLE_FILE_TEST = r"^.+\.[0-9a-f]{12}\..+$"
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,  # Mantenir els loggers que venen per defecte
@@ -90,94 +90,171 @@ function save_fingerprint(fingerprintId) {
 }
 
 /**
- * Envia les respostes de la secció “Overview” (pas 0 del formulari) al servidor per actualitzar-les.
+ * Estat de la sincronització amb el servidor.
  * 
- * Aquesta funció fa una petició POST a l’endpoint `/update-overview/` amb les respostes recollides
- * del formulari. El token CSRF s’inclou per complir amb les proteccions de seguretat de Django.
- * 
- * @param {Object} answers - Objecte amb les respostes del pas 0 (projecte, empresa, fase, ubicació...).
- * @returns {Promise<Object>} Resposta JSON del servidor.
+ * - `version`: versió de les respostes desades que coneix el client (retornada per `/check-fingerprint/` i `/sync/`).
+ * - `answers`: últimes respostes enviades (o carregades) per a cada dimensió, per calcular els canvis.
+ * - `unconfirmed`: camps enviats en un desat agrupat (202) que el servidor encara no ha confirmat. S'envien de nou
+ *   en cada sincronització fins que una resposta 200 els confirma.
+ * - `latest`: últimes respostes passades a `sync_answers` per a cada dimensió.
  */
+let syncState = {
+    version: null,
+    answers: { overview: {}, socioeconomic: {}, environment: {} },
+    unconfirmed: { overview: {}, socioeconomic: {}, environment: {} },
+    latest: {}
+};
 
-function update_overview(answers) {
-    return fetch("/update-overview/", {
-        method: "POST",
-        headers: {
-            "Content-Type": "application/json",
-            "X-CSRFToken": getCSRFToken()
-        },
-        body: JSON.stringify(answers),
-        credentials: "include"
-    })
-    .then(response => response.json())
-    .then(data => {
-        return data;
-    })
-    .catch(error => {
-        console.error("Error actualizant l'Overview:", error);
-    });
+/**
+ * Inicialitza l'estat de la sincronització amb les respostes carregades al formulari.
+ * 
+ * @param {number|null} version - Versió de les respostes desades al servidor.
+ * @param {Object} answers - Respostes actuals per dimensió. Ex: { socioeconomic: {...}, environment: {...} }
+ */
+function init_sync_state(version, answers) {
+    syncState.version = version;
+    Object.assign(syncState.answers, JSON.parse(JSON.stringify(answers)));
 }
 
 /**
- * Envia al servidor les respostes de la dimensió socioeconòmica del formulari.
+ * Retorna els camps que han canviat entre dues versions de les respostes d'una dimensió.
  * 
- * Aquesta funció fa una petició POST a l’endpoint `/update-socioeconomic-dimension/` amb
- * totes les dades introduïdes per l’usuari en la secció “Dimensió Socioeconòmica”.
+ * Les respostes de l'Overview són planes ({ camp: valor }) i les de les dimensions estan agrupades per
+ * subdimensió ({ subdimensió: { camp: valor } }). Els valors es comparen en format JSON (inclou llistes i objectes).
  * 
- * El token CSRF es passa a l'encapçalament per garantir la seguretat contra atacs CSRF.
- * 
- * @param {Object} answers - Objecte amb totes les respostes de la dimensió socioeconòmica.
- *                           Inclou el `fingerprint` i totes les preguntes agrupades per secció.
- * @returns {Promise<Object>} Resposta JSON del servidor.
+ * @param {Object} previous - Respostes enviades anteriorment.
+ * @param {Object} current - Respostes actuals.
+ * @param {boolean} nested - Indica si les respostes estan agrupades per subdimensió.
+ * @returns {Object} Només els camps modificats, amb la mateixa estructura.
  */
-function update_socioeconomic_dimension(answers) {
-    return fetch("/update-socioeconomic-dimension/", {
-        method: "POST",
-        headers: {
-            "Content-Type": "application/json",
-            "X-CSRFToken": getCSRFToken()
-        },
-        body: JSON.stringify(answers),
-        credentials: "include"
-    })
-    .then(response => response.json())
-    .then(data => {
-        return data;
-    })
-    .catch(error => {
-        console.error("Error actualizant les dades de la dimensió socioeconòmica:", error);
-    });
+function diff_answers(previous, current, nested) {
+    let changes = {};
+    for (const [key, value] of Object.entries(current)) {
+        if (nested) {
+            const sectionChanges = diff_answers(previous[key] || {}, value, false);
+            if (Object.keys(sectionChanges).length > 0) {
+                changes[key] = sectionChanges;
+            }
+        } else if (JSON.stringify(previous[key]) !== JSON.stringify(value)) {
+            changes[key] = value;
+        }
+    }
+    return changes;
 }
 
 /**
- * Envia al servidor les respostes de la dimensió ambiental del formulari.
+ * Retorna els valors actuals dels camps indicats (mateixa estructura que `diff_answers`).
  * 
- * Aquesta funció fa una petició POST a l’endpoint `/update-environment-dimension/` amb
- * totes les dades proporcionades per l’usuari en la secció “Dimensió Ambiental”.
+ * @param {Object} current - Respostes actuals.
+ * @param {Object} fields - Camps a recuperar (només s'utilitzen les claus).
+ * @param {boolean} nested - Indica si les respostes estan agrupades per subdimensió.
+ * @returns {Object} Valors actuals dels camps.
+ */
+function pick_answers(current, fields, nested) {
+    let picked = {};
+    for (const key of Object.keys(fields)) {
+        if (!(key in current)) {
+            continue;
+        }
+        if (nested) {
+            const section = pick_answers(current[key], fields[key], false);
+            if (Object.keys(section).length > 0) {
+                picked[key] = section;
+            }
+        } else {
+            picked[key] = current[key];
+        }
+    }
+    return picked;
+}
+
+/**
+ * Afegeix els camps de `source` a `target` (per subdimensió si `nested`). Modifica i retorna `target`.
+ */
+function merge_answers(target, source, nested) {
+    for (const [key, value] of Object.entries(source)) {
+        target[key] = nested ? Object.assign(target[key] || {}, value) : value;
+    }
+    return target;
+}
+
+/**
+ * Envia al servidor únicament els canvis de les respostes (de qualsevol dimensió) en una sola petició a `/sync/`.
  * 
- * Inclou el token CSRF com a mesura de seguretat i espera una resposta JSON del backend.
+ * Si no hi ha cap canvi respecte a l'última sincronització no es fa cap petició. Si el servidor respon 409
+ * (les respostes s'han desat des d'una altra pestanya), es tornen a enviar totes les respostes amb la versió actual.
+ * Si respon 429 (massa desats seguits), es torna a enviar passats `retry_after` segons. Si respon 202, els canvis
+ * s'han agrupat amb altres desats però encara no s'han escrit: els camps queden pendents de confirmar i es tornen a
+ * enviar passats `retry_after` segons (si no hi ha hagut cap sincronització posterior de la mateixa dimensió).
  * 
- * @param {Object} answers - Objecte amb totes les respostes de la dimensió ambiental,
- *                           incloent el `fingerprint` i les preguntes agrupades per secció.
- * @returns {Promise<Object>} Resposta JSON del servidor.
+ * @param {string} fingerprintId - Identificador únic de l’usuari.
+ * @param {Object} answers - Respostes actuals per dimensió. Ex: { overview: {...} } o { socioeconomic: {...} }
+ * @param {boolean} force - Envia totes les respostes, no només els canvis.
+ * @returns {Promise<Object>} Resposta JSON del servidor (o la versió actual si no hi ha canvis).
  */
+function sync_answers(fingerprintId, answers, force = false) {
+    let changes = {};
+    for (const [dimension, current] of Object.entries(answers)) {
+        const nested = dimension !== "overview";
+        syncState.latest[dimension] = current;
+        let dimensionChanges = force ? current : diff_answers(syncState.answers[dimension] || {}, current, nested);
+        if (!force) { // Els camps pendents de confirmar s'envien sempre
+            dimensionChanges = merge_answers(pick_answers(current, syncState.unconfirmed[dimension] || {}, nested), dimensionChanges, nested);
+        }
+        if (Object.keys(dimensionChanges).length > 0) {
+            changes[dimension] = dimensionChanges;
+        }
+    }
 
-function update_environment_dimension(answers) {
-    return fetch("/update-environment-dimension/", {
+    if (Object.keys(changes).length === 0) { // Res a enviar
+        return Promise.resolve({ version: syncState.version, skipped: true });
+    }
+
+    return fetch("/sync/", {
         method: "POST",
         headers: {
             "Content-Type": "application/json",
             "X-CSRFToken": getCSRFToken()
         },
-        body: JSON.stringify(answers),
+        body: JSON.stringify({ fingerprint: fingerprintId, version: syncState.version, changes: changes }),
         credentials: "include"
     })
-    .then(response => response.json())
-    .then(data => {
+    .then(response => response.json().then(data => ({ status: response.status, data: data })))
+    .then(({ status, data }) => {
+        if (status === 409 && !force) { // Versió desactualitzada: s'envien totes les respostes
+            syncState.version = data.version;
+            return sync_answers(fingerprintId, answers, true);
+        }
+        if (status === 429) { // Massa desats seguits: es torna a enviar quan hi hagi un desat disponible
+            return new Promise(resolve => setTimeout(resolve, (data.retry_after || 1) * 1000))
+                .then(() => sync_answers(fingerprintId, answers, force));
+        }
+        if (status === 200) {
+            syncState.version = data.version;
+            for (const [dimension, current] of Object.entries(answers)) {
+                syncState.answers[dimension] = JSON.parse(JSON.stringify(current));
+                syncState.unconfirmed[dimension] = {};
+            }
+        }
+        if (status === 202) { // Desat agrupat, encara no escrit: es confirma passat `retry_after` segons
+            syncState.version = data.version;
+            for (const [dimension, current] of Object.entries(answers)) {
+                syncState.answers[dimension] = JSON.parse(JSON.stringify(current));
+                if (changes[dimension]) {
+                    merge_answers(syncState.unconfirmed[dimension], JSON.parse(JSON.stringify(changes[dimension])), dimension !== "overview");
+                }
+            }
+            return new Promise(resolve => setTimeout(resolve, (data.retry_after || 1) * 1000))
+                .then(() => {
+                    // Una sincronització posterior ja envia aquests camps pendents
+                    const superseded = Object.keys(answers).some(dimension => syncState.latest[dimension] !== answers[dimension]);
+                    return superseded ? data : sync_answers(fingerprintId, answers);
+                });
+        }
         return data;
     })
     .catch(error => {
-        console.error("Error actualizant les dades de la dimensió ambiental:", error);
+        console.error("Error sincronitzant les respostes del formulari:", error);
     });
 }
 
@@ -187,25 +264,24 @@ function update_environment_dimension(answers) {
  * Comprova si el `fingerprintId` ja està registrat al sistema i, si és així,
  * retorna les dades del formulari associades.
  * 
- * Aquesta funció envia una petició POST a `/check-fingerprint/` amb l’ID hash del fingerprint
+ * Aquesta funció fa una petició GET a `/check-fingerprint/` amb l’ID hash del fingerprint
  * i espera que el servidor respongui amb un objecte que indiqui si el fingerprint existeix
  * i, si escau, les dades de formulari prèviament desades.
  * 
+ * La resposta porta un ETag: el navegador la desa a la seva caché i en les següents visites la revalida
+ * (`If-None-Match`). Si les respostes no han canviat el servidor respon 304 i es reutilitza la còpia local.
+ * 
  * @param {string} fingerprintId - Identificador únic de l’usuari, hash SHA-256 del fingerprint original.
  * @returns {Promise<Object|null>} Objecte amb les claus:
  *    - `registered` (boolean): si el fingerprint ja estava registrat,
- *    - `form` (objecte): dades del formulari si existeixen.
+ *    - `form` (objecte): dades del formulari si existeixen,
+ *    - `version` (number): versió de les respostes desades (veure `sync_answers`).
  *    En cas d’error, retorna `null`.
  */
 
 function check_fingerprint(fingerprintId) {
-    return fetch("/check-fingerprint/", {
-        method: "POST",
-        headers: {
-            "Content-Type": "application/json",
-            "X-CSRFToken": getCSRFToken()
-        },
-        body: JSON.stringify({ fingerprint_id: fingerprintId }),
+    return fetch(`/check-fingerprint/?fingerprint_id=${encodeURIComponent(fingerprintId)}`, {
+        method: "GET",
         credentials: "include"
     })
     .then(response => response.json())
@@ -6,3 +6,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_wsgi_application()
+
+# Tasques periòdiques dins dels workers si SCHEDULER["IN_PROCESS"] és True (si no: python manage.py run_scheduler)
+from processdata.scheduler import start_in_background
+start_in_background()
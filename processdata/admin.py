@@ -1,21 +1,60 @@
 from django.apps import apps
 from django.contrib import admin
-from .models import SubSubForm, UserFingerprint, Overview  # els que sí estan definits
+from django.http import StreamingHttpResponse
+from .models import SubSubForm, UserFingerprint, Overview, DimensionDocument, ResultSnapshot, Form, JobRun, Task  # els que sí estan definits
+from .export import EXPORT_FORMATS, iter_assessments
 
 class DynamicAdmin(admin.ModelAdmin): 
     def get_list_display(self, request): # Tots els camps de totes les subdimensions són visibles.
         return [field.name for field in self.model._meta.fields]
 
+def export_assessments(queryset, export_format):
+    """
+    Resposta en streaming amb l'exportació (veure `processdata.export`) dels formularis dels fingerprints seleccionats.
+    """
+    to_lines, content_type = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(to_lines(iter_assessments(Form.objects.filter(fingerprint__in = queryset))), content_type = content_type)
+    response["Content-Disposition"] = f'attachment; filename="assessments.{export_format}"'
+    return response
+
+@admin.action(description = "Exporta les avaluacions seleccionades (CSV)")
+def export_assessments_csv(modeladmin, request, queryset):
+    return export_assessments(queryset, "csv")
+
+@admin.action(description = "Exporta les avaluacions seleccionades (JSONL)")
+def export_assessments_jsonl(modeladmin, request, queryset):
+    return export_assessments(queryset, "jsonl")
+
 # Models amb configuració personalitzada
 @admin.register(UserFingerprint)
 class UserFingerprintAdmin(admin.ModelAdmin):
     list_display = ("fingerprint_id", "first_seen", "last_seen")
     readonly_fields = ("first_seen", "last_seen")
+    actions = [export_assessments_csv, export_assessments_jsonl]
 
 @admin.register(Overview)
 class OverviewAdmin(admin.ModelAdmin):
     list_display = ("form", "project_name", "company_name", "mine_ubication", "phase")
 
+@admin.register(DimensionDocument)
+class DimensionDocumentAdmin(admin.ModelAdmin):
+    list_display = ("form", "dimension", "updated_at")
+    list_filter = ("dimension",)
+
+@admin.register(ResultSnapshot)
+class ResultSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("form", "revision", "config_version", "updated_at")
+
+@admin.register(JobRun)
+class JobRunAdmin(admin.ModelAdmin):
+    list_display = ("job", "started_at", "duration", "rows", "status", "owner")
+    list_filter = ("job", "status")
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ("name", "status", "attempts", "run_at", "finished_at", "locked_by")
+    list_filter = ("name", "status")
+
 # Models dinàmics (hereten de SubSubForm)
 for model in apps.get_app_config("processdata").get_models():  
     if issubclass(model, SubSubForm) and model is not SubSubForm:
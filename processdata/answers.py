@@ -0,0 +1,177 @@
+import ast
+from django.apps import apps
+from django.db import models
+from .data import OVERVIEW_QUESTIONS, SOCIOECONOMIC_DIMENSION_QUESTIONS, ENVIRONMENT_DIMENSION_QUESTIONS
+from .getdata import get_results_for_dimension
+
+# Dimensions del formulari: referència utilitzada als resultats -> preguntes
+DIMENSIONS = {
+    "socioeconomic": SOCIOECONOMIC_DIMENSION_QUESTIONS,
+    "environment": ENVIRONMENT_DIMENSION_QUESTIONS,
+}
+
+# Camps de l'Overview que es poden incloure en un conjunt de respostes
+OVERVIEW_FIELDS = [question["input_id"] for question in OVERVIEW_QUESTIONS] + ["mine_ubication"]
+
+# Valors acceptats per a preguntes Sí/No quan arriben en format text (ex: CSV)
+TRUE_VALUES = {"on", "true", "1", "sí", "si", "yes"}
+FALSE_VALUES = {"off", "false", "0", "no"}
+
+
+def build_question_index():
+    """
+    Construeix un índex de totes les preguntes de les dimensions a partir del seu `input_id`.
+
+    :return (dict): clau: input_id; valor: tupla (referència de la dimensió, ID de la subdimensió (model), pregunta).
+                    Per a les preguntes amb fills (`one-to-many-numbers`) s'indexa cada fill.
+    """
+    index = {}
+    for dimension_reference, sections in DIMENSIONS.items():
+        for section in sections:
+            for question in section["questions"]:
+                if "input_id" in question:
+                    index[question["input_id"]] = (dimension_reference, section["id"], question)
+                elif "parent_id" in question:
+                    for children in question["childrens"]:
+                        index[children["input_id"]] = (dimension_reference, section["id"], question)
+    return index
+
+QUESTION_INDEX = build_question_index()
+
+
+def clean_answer(input_id, value):
+    """
+    Valida i converteix una resposta al mateix format amb què es desa a la base de dades.
+
+    S'apliquen les mateixes regles que `save_dimension_data` ("on"/"off" -> booleà, buit -> None) i la conversió
+    del camp del model (ex: "45" -> 45.0). Les opcions de `select` i `multiple-select` es validen contra el JSON de preguntes.
+
+    :param input_id (str): identificador de la pregunta.
+    :param value: valor de la resposta (natiu o text).
+
+    :return: valor net. None si la pregunta no té resposta.
+    :raises ValueError: si la pregunta no existeix o el valor no és vàlid.
+    """
+    if input_id not in QUESTION_INDEX:
+        raise ValueError(f"Unknown question '{input_id}'.")
+
+    _, model_name, question = QUESTION_INDEX[input_id]
+    field = apps.get_model("processdata", model_name)._meta.get_field(input_id)
+
+    if value is None or value == "" or value == []:
+        return None
+
+    if isinstance(field, models.BooleanField):
+        if isinstance(value, str):
+            if value.strip().lower() in TRUE_VALUES:
+                return True
+            if value.strip().lower() in FALSE_VALUES:
+                return False
+            raise ValueError(f"Invalid yes/no answer for '{input_id}': {value}")
+        return bool(value)
+
+    if question["type"] == "multiple-select":
+        valid_ids = {option["id"] for option in question["options"]}
+        if isinstance(value, str) and value.strip() in valid_ids: # Una sola opció sense llista: valor per defecte del model, es desa igual
+            return value.strip()
+        if isinstance(value, str): # Text: llista (JSON o tal com es desa a la base de dades) o identificadors separats per ';'
+            try:
+                value = ast.literal_eval(value.strip()) if value.strip().startswith("[") else [v.strip() for v in value.split(";") if v.strip()]
+            except (SyntaxError, ValueError):
+                raise ValueError(f"Invalid list for '{input_id}': {value}")
+        for option_id in value:
+            if option_id not in valid_ids:
+                raise ValueError(f"Invalid option for '{input_id}': {option_id}")
+        return field.to_python(list(value)) # Es desa en format text, igual que des del formulari web
+
+    if question["type"] == "select" and value not in question["options"]:
+        raise ValueError(f"Invalid option for '{input_id}': {value}")
+
+    try:
+        return field.to_python(value)
+    except Exception:
+        raise ValueError(f"Invalid value for '{input_id}': {value}")
+
+
+def clean_answers(answers):
+    """
+    Valida un conjunt de respostes indexades per `input_id` i les agrupa per subdimensió (model).
+
+    Els camps de l'Overview s'ignoren. Les respostes buides no s'inclouen.
+
+    :param answers (dict): respostes {input_id: valor}.
+
+    :return (dict): {ID de la subdimensió: {input_id: valor net}}.
+    :raises ValueError: si alguna resposta no és vàlida.
+    """
+    grouped = {}
+    for input_id, value in answers.items():
+        if input_id in OVERVIEW_FIELDS:
+            continue
+        cleaned = clean_answer(input_id, value)
+        if cleaned is not None:
+            _, model_name, _ = QUESTION_INDEX[input_id]
+            grouped.setdefault(model_name, {})[input_id] = cleaned
+    return grouped
+
+
+def clean_overview(values):
+    """
+    Valida les dades generals del projecte i les converteix al format de les columnes de l'Overview.
+
+    Les opcions de les preguntes `select` es validen contra el JSON de preguntes. La ubicació de la mina s'accepta
+    com a text "lat,lon" o com a diccionari {"latitude", "longitude"} (format del formulari web).
+
+    :param values (dict): dades {camp: valor}. Els camps que no són de l'Overview s'ignoren.
+
+    :return (dict): {columna: valor net}, sense els camps buits.
+    :raises ValueError: si algun valor no és vàlid.
+    """
+    questions = {question["input_id"]: question for question in OVERVIEW_QUESTIONS}
+    cleaned = {}
+    for field in OVERVIEW_FIELDS + ["mine_address"]:
+        value = values.get(field)
+        if value is None or value == "":
+            continue
+
+        if field == "mine_ubication":
+            if isinstance(value, dict):
+                value = f"{value.get('latitude')},{value.get('longitude')}"
+            try:
+                latitude, longitude = (float(coordinate) for coordinate in str(value).split(","))
+            except ValueError:
+                raise ValueError(f"Invalid location for 'mine_ubication': {value}")
+            value = f"{latitude},{longitude}"
+        elif field in questions and questions[field]["type"] == "select" and value not in questions[field]["options"]:
+            raise ValueError(f"Invalid option for '{field}': {value}")
+
+        cleaned[field] = str(value)
+    return cleaned
+
+
+def get_results_from_answers(answers):
+    """
+    Retorna les respostes en el mateix format que `get_results` (entrada de `calculate_rating`) sense accedir a la base de dades.
+
+    Per a cada subdimensió es crea una instància del model sense desar, de manera que les preguntes sense
+    resposta tenen el mateix valor per defecte que una fila nova.
+
+    :param answers (dict): respostes {input_id: valor}.
+    :raises ValueError: si alguna resposta no és vàlida.
+    """
+    return get_results_from_clean_answers(clean_answers(answers))
+
+def get_results_from_clean_answers(grouped):
+    """
+    Com `get_results_from_answers`, per a respostes ja validades i agrupades per subdimensió (ex: importació).
+
+    :param grouped (dict): respostes {ID de la subdimensió: {input_id: valor net}} (veure `clean_answers`).
+    """
+    results = {}
+    for dimension_reference, sections in DIMENSIONS.items():
+        instances = {}
+        for section in sections:
+            Model = apps.get_model("processdata", section["id"])
+            instances[section["id"]] = Model(**grouped.get(section["id"], {}))
+        results.update(get_results_for_dimension(sections, instances, dimension_reference))
+    return results
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import logging
+import os
+from functools import lru_cache
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.template.loader import render_to_string
+from .data import OVERVIEW_QUESTIONS, SOCIOECONOMIC_DIMENSION_QUESTIONS, ENVIRONMENT_DIMENSION_QUESTIONS
+
+logger = logging.getLogger(__name__)
+
+# Directori (relatiu a STATIC) on es desa el paquet de preguntes
+BUNDLE_DIR = "assets/build"
+BUNDLE_PREFIX = "questions."
+
+# Bloc del formulari -> (plantilla parcial, contenidor de la pàgina)
+QUESTION_BLOCKS = {
+    "overview": ("partials/overview_questions.html", "overview-questions"),
+    "socioeconomic": ("partials/socioeconomic_questions.html", "socioeconomic-questions"),
+    "environment": ("partials/environment_questions.html", "environment-questions"),
+}
+
+#----------------------------------------------------------------
+#--------------------------- RENDERITZAT ------------------------
+#----------------------------------------------------------------
+
+@lru_cache(maxsize = None)
+def render_question_markup():
+    """
+    Renderitza una sola vegada (per procés i versió de la configuració) l'HTML de les preguntes del formulari.
+    Les preguntes només canvien amb els fitxers JSON de configuració, que es carreguen en iniciar l'aplicació.
+
+    :return (dict): {bloc: html} per a cada bloc de QUESTION_BLOCKS.
+    """
+    context = {
+        "overview_questions": OVERVIEW_QUESTIONS,
+        "socio_economic_questions": SOCIOECONOMIC_DIMENSION_QUESTIONS,
+        "environment_questions": ENVIRONMENT_DIMENSION_QUESTIONS,
+    }
+    return {block: render_to_string(template, context) for block, (template, _) in QUESTION_BLOCKS.items()}
+
+@lru_cache(maxsize = None)
+def get_question_bundle():
+    """
+    Genera el paquet JS que insereix les preguntes pre-renderitzades als contenidors de l'avaluador.
+    El nom del fitxer inclou el hash del contingut (ex: assets/build/questions.3f2a9c1b7d4e.js), de manera que
+    es pot servir amb capçaleres de caché de llarga durada: qualsevol canvi a les preguntes o a les plantilles
+    genera un nom nou.
+
+    :return (tuple): (nom relatiu a STATIC, contingut JS).
+    """
+    markup = render_question_markup()
+    targets = {container: markup[block] for block, (_, container) in QUESTION_BLOCKS.items()}
+    content = (
+        "(function () {\n"
+        f"  var blocks = {json.dumps(targets, ensure_ascii = False)};\n"
+        "  for (var id in blocks) {\n"
+        "    var container = document.getElementById(id);\n"
+        "    if (container) { container.innerHTML = blocks[id]; }\n"
+        "  }\n"
+        "})();\n"
+    )
+    digest = hashlib.sha256(content.encode("utf-8")).hexdigest()[:12]
+    return f"{BUNDLE_DIR}/{BUNDLE_PREFIX}{digest}.js", content
+
+def get_built_question_bundle():
+    """
+    Retorna el nom del paquet de preguntes si s'ha generat (`manage.py build_question_bundle`) per a la configuració actual.
+    Si no existeix (ex: desenvolupament sense generar-lo), retorna None i l'avaluador insereix les preguntes directament.
+    """
+    name, _ = get_question_bundle()
+    return name if _bundle_exists(name) else None
+
+@lru_cache(maxsize = None)
+def _bundle_exists(name):
+    try:
+        return bool(finders.find(name)) or staticfiles_storage.exists(name)
+    except Exception: # STATIC_ROOT no configurat
+        return False
+
+#----------------------------------------------------------------
+#----------------------------- ESCRIPTURA -----------------------
+#----------------------------------------------------------------
+
+def write_question_bundle(directory = None):
+    """
+    Escriu el paquet de preguntes al directori d'estàtics del projecte i elimina els paquets anteriors.
+    Després cal executar `collectstatic` perquè WhiteNoise el serveixi en producció.
+
+    :param directory (str): directori base dels estàtics. Per defecte, el primer de STATICFILES_DIRS.
+    :return (str): ruta del fitxer escrit.
+    """
+    directory = directory or settings.STATICFILES_DIRS[0]
+    name, content = get_question_bundle()
+    build_dir = os.path.join(directory, BUNDLE_DIR)
+    os.makedirs(build_dir, exist_ok = True)
+
+    for filename in os.listdir(build_dir): # Paquets de versions anteriors de la configuració
+        if filename.startswith(BUNDLE_PREFIX) and filename != os.path.basename(name):
+            os.remove(os.path.join(build_dir, filename))
+
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding = "utf-8") as file:
+        file.write(content)
+    _bundle_exists.cache_clear()
+    logger.info(f"Question bundle written to {path}")
+    return path
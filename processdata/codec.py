@@ -0,0 +1,106 @@
+import importlib.util
+import json
+import logging
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Configuració per defecte (es pot sobreescriure amb JSON_CODEC a settings.py).
+# BACKEND None: OrjsonCodec si orjson està instal·lat, si no StdlibCodec.
+DEFAULT_JSON_CODEC = {
+    "BACKEND": None,
+}
+
+#----------------------------------------------------------------
+#--------------------------- BACKENDS ---------------------------
+#----------------------------------------------------------------
+
+class StdlibCodec:
+    """
+    Còdec JSON de la llibreria estàndard. Accepta els mateixos tipus que el JsonResponse de Django (dates, Decimal, UUID...).
+    """
+    name = "json"
+
+    def loads(self, data):
+        return json.loads(data)
+
+    def dumps(self, obj):
+        return json.dumps(obj, cls = DjangoJSONEncoder, ensure_ascii = False, separators = (",", ":")).encode("utf-8")
+
+
+class OrjsonCodec:
+    """
+    Còdec JSON amb orjson (implementació en Rust, dependència opcional). Els tipus que orjson no serialitza
+    directament (ex: Decimal, textos traduïbles) es converteixen amb el DjangoJSONEncoder.
+    """
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+        self._encoder = DjangoJSONEncoder()
+
+    def loads(self, data):
+        return self._orjson.loads(data)
+
+    def dumps(self, obj):
+        return self._orjson.dumps(obj, default = self._encoder.default, option = self._orjson.OPT_NON_STR_KEYS)
+
+
+def get_available_codecs():
+    """
+    Retorna les classes de còdec que es poden utilitzar en aquest entorn (sempre inclou StdlibCodec).
+    """
+    codecs = [StdlibCodec]
+    if importlib.util.find_spec("orjson") is not None:
+        codecs.append(OrjsonCodec)
+    return codecs
+
+_codec = None
+
+def get_codec():
+    """
+    Retorna la instància del còdec JSON configurat a settings.JSON_CODEC.
+    """
+    global _codec
+    if _codec is None:
+        config = {**DEFAULT_JSON_CODEC, **getattr(settings, "JSON_CODEC", {})}
+        backend_class = import_string(config["BACKEND"]) if config["BACKEND"] else get_available_codecs()[-1]
+        _codec = backend_class(**config.get("OPTIONS", {}))
+        logger.debug(f"JSON codec: {_codec.name}")
+    return _codec
+
+#----------------------------------------------------------------
+#----------------------------- API ------------------------------
+#----------------------------------------------------------------
+
+def loads(data):
+    """
+    Descodifica un document JSON (bytes o str) amb el còdec configurat.
+
+    :raises ValueError: si el document no és JSON vàlid.
+    """
+    return get_codec().loads(data)
+
+def dumps(obj):
+    """
+    Codifica un objecte en JSON (bytes UTF-8) amb el còdec configurat.
+    """
+    return get_codec().dumps(obj)
+
+
+class JsonResponse(HttpResponse):
+    """
+    Equivalent a `django.http.JsonResponse` que codifica amb el còdec configurat.
+
+    :param data: objecte a serialitzar. Per defecte només s'accepten diccionaris (veure `safe` a django.http.JsonResponse).
+    :param safe (bool): si és False, s'accepta qualsevol objecte serialitzable.
+    """
+    def __init__(self, data, safe = True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError("In order to allow non-dict objects to be serialized set the safe parameter to False.")
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(content = dumps(data), **kwargs)
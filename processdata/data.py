@@ -1,8 +1,14 @@
-from .utils import load_json
+from .utils import load_json, get_config_version
 
 OVERVIEW_QUESTIONS = load_json("overview_questions.json")
 SOCIOECONOMIC_DIMENSION_QUESTIONS = load_json("socioeconomic_questions.json")
 ENVIRONMENT_DIMENSION_QUESTIONS = load_json("environment_questions.json")
 
 SOCIOECONOMIC_DIMENSION_RESULTS = load_json("socioeconomic_results.json")
-ENVIRONMENT_DIMENSION_RESULTS = load_json("environment_results.json")
\ No newline at end of file
+ENVIRONMENT_DIMENSION_RESULTS = load_json("environment_results.json")
+
+CONFIG_FILES = [
+    "overview_questions.json", "socioeconomic_questions.json", "environment_questions.json",
+    "socioeconomic_results.json", "environment_results.json"
+]
+CONFIG_VERSION = get_config_version(CONFIG_FILES) # Versió de la configuració. Ex: invalida caché de resultats
@@ -0,0 +1,124 @@
+import csv
+import gc
+import json
+from itertools import islice
+from django.apps import apps
+from .models import Form, Overview, ResultSnapshot
+from .data import CONFIG_VERSION
+from .getdata import get_results_from_instances
+from .storage import SECTION_DIMENSIONS, get_field_names, get_storage
+from .snapshots import compact_scores
+from .rating.calculate import calculate_rating, indicators_handlers
+from .rating.batch import SECTIONS
+
+# Columnes de l'Overview incloses a l'exportació
+OVERVIEW_COLUMNS = ["project_name", "company_name", "mine_ubication", "mine_address", "phase"]
+
+#----------------------------------------------------------------
+#--------------------------- LECTURA ----------------------------
+#----------------------------------------------------------------
+
+def get_answer_columns():
+    """
+    Retorna els `input_id` de totes les preguntes de les dimensions, en l'ordre de les subdimensions.
+    """
+    return [field for section_id in SECTION_DIMENSIONS for field in get_field_names(apps.get_model("processdata", section_id))]
+
+def _chunks(iterator, size):
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+def iter_assessments(forms = None, chunk_size = 500):
+    """
+    Recorre tots els formularis amb les dades generals, les respostes i les puntuacions, amb memòria constant.
+
+    Els formularis es llegeixen amb `.iterator()` en blocs de `chunk_size`. Per a cada bloc, l'Overview, les respostes
+    (backend d'emmagatzematge configurat) i les instantànies de resultats es carreguen amb una consulta cadascun.
+    Les puntuacions es prenen de la instantània (veure `processdata.snapshots`) si està al dia; si no, es calculen.
+
+    :param forms (QuerySet): formularis a exportar. Per defecte, tots.
+    :param chunk_size (int): formularis per bloc.
+
+    :return (generator(dict)): {"fingerprint", "revision", "created_at", "overview", "scores", "answers"} per formulari,
+                               amb les puntuacions en el format de `compact_scores`.
+    """
+    forms = (forms if forms is not None else Form.objects.all()).order_by("pk").values("pk", "revision", "created_at", "fingerprint__fingerprint_id")
+    storage, answer_columns = get_storage(), get_answer_columns()
+
+    for chunk in _chunks(forms.iterator(chunk_size = chunk_size), chunk_size):
+        gc.collect() # les instàncies del bloc anterior formen cicles (relacions pare-fill de l'herència multitaula)
+        form_ids = [form["pk"] for form in chunk]
+        overviews = {overview.pop("pk"): overview for overview in Overview.objects.filter(pk__in = form_ids).values("pk", *OVERVIEW_COLUMNS)}
+        snapshots = {
+            form_id: (revision, scores)
+            for form_id, revision, scores in ResultSnapshot.objects.filter(pk__in = form_ids, config_version = CONFIG_VERSION).values_list("form_id", "revision", "scores")
+        }
+        instances = storage.get_instances_for_forms(form_ids)
+
+        for form in chunk:
+            form_instances = instances[form["pk"]]
+            revision, scores = snapshots.get(form["pk"], (None, None))
+            if revision != form["revision"]: # Sense instantània o desactualitzada
+                scores = calculate_rating(get_results_from_instances(form_instances), render = False)
+
+            answers = {}
+            for instance in form_instances.values():
+                for field in get_field_names(type(instance)):
+                    answers[field] = getattr(instance, field)
+
+            yield {
+                "fingerprint": form["fingerprint__fingerprint_id"],
+                "revision": form["revision"],
+                "created_at": form["created_at"].isoformat(),
+                "overview": overviews.get(form["pk"], dict.fromkeys(OVERVIEW_COLUMNS)),
+                "scores": compact_scores(scores),
+                "answers": {field: answers.get(field) for field in answer_columns},
+            }
+
+#----------------------------------------------------------------
+#--------------------------- FORMATS ----------------------------
+#----------------------------------------------------------------
+
+class _Echo:
+    """
+    Objecte tipus fitxer que retorna el text escrit, per generar línies CSV sense acumular-les.
+    """
+    def write(self, value):
+        return value
+
+def get_csv_header():
+    dimensions = list(indicators_handlers)
+    return (
+        ["fingerprint", "revision", "created_at", *OVERVIEW_COLUMNS, "rating", "out_of", "nrating"]
+        + [f"{name}_{value}" for name in dimensions + SECTIONS for value in ("rating", "out_of")]
+        + get_answer_columns()
+    )
+
+def iter_csv_lines(records):
+    """
+    Converteix els registres de `iter_assessments` en línies CSV (una fila per formulari, una columna per resposta).
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(get_csv_header())
+    for record in records:
+        scores = record["scores"]
+        partials = {**scores["dimensions"], **scores["sections"]}
+        yield writer.writerow(
+            [record["fingerprint"], record["revision"], record["created_at"]]
+            + [record["overview"][column] for column in OVERVIEW_COLUMNS]
+            + [scores["rating"], scores["out_of"], scores["nrating"]]
+            + [value for name in list(indicators_handlers) + SECTIONS for value in partials.get(name, [None, None])]
+            + list(record["answers"].values())
+        )
+
+def iter_jsonl_lines(records):
+    """
+    Converteix els registres de `iter_assessments` en línies JSONL (un objecte per formulari).
+    """
+    for record in records:
+        yield json.dumps(record, ensure_ascii = False) + "\n"
+
+EXPORT_FORMATS = {
+    "csv": (iter_csv_lines, "text/csv"),
+    "jsonl": (iter_jsonl_lines, "application/x-ndjson"),
+}
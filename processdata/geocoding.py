@@ -0,0 +1,217 @@
+import asyncio
+import importlib.util
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+from .utils import reverse_geocode, areverse_geocode
+from .rating.cache import LocalMemoryBackend
+
+logger = logging.getLogger(__name__)
+
+# Configuració per defecte (es pot sobreescriure amb GEOCODER a settings.py)
+DEFAULT_GEOCODER = {
+    "BACKEND": "processdata.geocoding.NominatimGeocoder",
+    "OPTIONS": {"TIMEOUT": 5},
+    "ASYNC": True,
+    "QUEUE": False,
+    "PRECISION": 4,
+}
+
+#----------------------------------------------------------------
+#--------------------------- BACKENDS ---------------------------
+#----------------------------------------------------------------
+
+class NominatimGeocoder:
+    """
+    Geocodificació inversa amb el servei públic de Nominatim (OpenStreetMap).
+
+    :param TIMEOUT (float): segons màxims d'espera de la resposta.
+    """
+    def __init__(self, TIMEOUT = 5):
+        self.timeout = TIMEOUT
+
+    def reverse(self, lat, lon):
+        wait_for_request_slot() # Nominatim: com a màxim una petició per segon, compartit amb la resta de fils del procés
+        return reverse_geocode(lat, lon, timeout = self.timeout)
+
+    async def areverse(self, lat, lon):
+        await _wait_for_request_slot() # Nominatim: com a màxim una petició per segon
+        if importlib.util.find_spec("httpx") is not None:
+            return await areverse_geocode(lat, lon, timeout = self.timeout)
+        return await asyncio.to_thread(reverse_geocode, lat, lon, timeout = self.timeout) # sense httpx: petició síncrona en un fil a part
+
+
+class StubGeocoder:
+    """
+    Geocodificador local sense accés a la xarxa (tests i desenvolupament).
+
+    :param ADDRESS (str): adreça fixa a retornar. Si és None es retornen les coordenades en format text.
+    """
+    def __init__(self, ADDRESS = None):
+        self.address = ADDRESS
+
+    def reverse(self, lat, lon):
+        return self.address if self.address is not None else f"{lat}, {lon}"
+
+    async def areverse(self, lat, lon):
+        return self.reverse(lat, lon)
+
+#----------------------------------------------------------------
+#--------------------- CACHÉ I RESOLUCIÓ ------------------------
+#----------------------------------------------------------------
+
+# Adreces ja resoltes, indexades per coordenades arrodonides (4 decimals ~ 11 metres)
+_address_cache = LocalMemoryBackend(MAX_ENTRIES = 1024, TIMEOUT = None)
+# Un únic fil per a les resolucions en segon pla (el límit d'una petició per segon el garanteix `wait_for_request_slot`)
+_executor = ThreadPoolExecutor(max_workers = 1, thread_name_prefix = "geocoder")
+# Overviews amb una resolució programada (evita programar-ne més d'una per formulari)
+_pending, _pending_lock = set(), threading.Lock()
+# Instant (time.monotonic) a partir del qual es pot fer la següent petició al geocodificador
+_next_request_at = 0.0
+_next_request_lock = threading.Lock() # protegeix _next_request_at (executor, workers, tasques periòdiques i vistes asíncrones)
+REQUEST_INTERVAL = 1.0 # segons
+
+def get_geocoder_config():
+    return {**DEFAULT_GEOCODER, **getattr(settings, "GEOCODER", {})}
+
+def get_geocoder():
+    """
+    Retorna una instància del geocodificador configurat a settings.GEOCODER.
+    """
+    config = get_geocoder_config()
+    return import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+
+def get_cache_key(lat, lon):
+    precision = get_geocoder_config()["PRECISION"]
+    return f"{round(float(lat), precision)},{round(float(lon), precision)}"
+
+def get_cached_address(lat, lon):
+    """
+    Retorna l'adreça desada a la caché per a unes coordenades, o None si encara no s'ha resolt. No fa cap petició externa.
+
+    :param lat(float): latitud
+    :param lon(float): longitud
+    """
+    return _address_cache.get(get_cache_key(lat, lon))
+
+def geocode(lat, lon):
+    """
+    Retorna l'adreça en format text per a unes coordenades, consultant primer la caché i després el geocodificador.
+
+    :param lat(float): latitud
+    :param lon(float): longitud
+    """
+    address = get_cached_address(lat, lon)
+    if address is None:
+        address = get_geocoder().reverse(lat, lon)
+        if address is not None:
+            _address_cache.set(get_cache_key(lat, lon), address)
+    return address
+
+def _reserve_request_slot():
+    """
+    Reserva el següent interval lliure de peticions al geocodificador i retorna els segons d'espera fins que arriba.
+    La reserva es fa amb el bloqueig: sota WSGI cada vista asíncrona té el seu bucle d'esdeveniments en un fil diferent,
+    i els workers de la cua de tasques també fan peticions en paral·lel.
+    """
+    global _next_request_at
+    with _next_request_lock:
+        current = time.monotonic()
+        wait = max(0.0, _next_request_at - current)
+        _next_request_at = max(current, _next_request_at) + REQUEST_INTERVAL
+    return wait
+
+async def _wait_for_request_slot():
+    """
+    Reserva el següent interval lliure de peticions al geocodificador i espera (sense bloquejar el fil) fins que arriba.
+    No depèn del bucle d'esdeveniments, de manera que és vàlid tant amb ASGI com amb vistes asíncrones sota WSGI.
+    """
+    wait = _reserve_request_slot() # el bloqueig no es manté durant l'espera
+    if wait:
+        await asyncio.sleep(wait)
+
+def wait_for_request_slot():
+    """
+    Versió síncrona de `_wait_for_request_slot`. La crida `NominatimGeocoder.reverse`, de manera que totes les peticions
+    síncrones del procés (executor, workers de la cua de tasques, tasques periòdiques) comparteixen el mateix límit.
+    """
+    wait = _reserve_request_slot()
+    if wait:
+        time.sleep(wait)
+
+async def ageocode(lat, lon):
+    """
+    Versió asíncrona de `geocode`, per a les vistes asíncrones: l'espera de la resposta del geocodificador no ocupa
+    cap fil del servidor.
+
+    :param lat(float): latitud
+    :param lon(float): longitud
+    """
+    address = get_cached_address(lat, lon)
+    if address is None:
+        geocoder = get_geocoder()
+        if hasattr(geocoder, "areverse"):
+            address = await geocoder.areverse(lat, lon)
+        else: # backends personalitzats només síncrons
+            address = await asyncio.to_thread(geocoder.reverse, lat, lon)
+        if address is not None:
+            _address_cache.set(get_cache_key(lat, lon), address)
+    return address
+
+def resolve_overview_address(overview_pk, mine_ubication):
+    """
+    Resol i desa l'adreça d'un formulari Overview. Només s'actualitza si les coordenades no han canviat mentrestant.
+
+    :param overview_pk(int): clau primària de l'Overview.
+    :param mine_ubication(str): coordenades en format "lat,lon".
+    """
+    from .models import Overview
+    try:
+        lat, lon = (float(value) for value in mine_ubication.split(","))
+        address = geocode(lat, lon)
+        if address is not None:
+            Overview.objects.filter(pk = overview_pk, mine_ubication = mine_ubication).update(mine_address = address)
+        return address
+    except Exception as e:
+        logger.error(f"Error in resolve_overview_address({overview_pk}): {e}")
+        return None
+
+def _resolve_in_background(overview_pk, mine_ubication):
+    try:
+        resolve_overview_address(overview_pk, mine_ubication)
+    finally:
+        with _pending_lock:
+            _pending.discard(overview_pk)
+        connection.close() # el fil no forma part del cicle petició/resposta, tanquem la seva connexió
+
+def _submit_resolution(overview_pk, mine_ubication):
+    """
+    Envia la resolució de l'adreça al fil del geocodificador, si l'Overview no en té cap de pendent.
+    """
+    with _pending_lock:
+        if overview_pk in _pending:
+            return
+        _pending.add(overview_pk)
+    _executor.submit(_resolve_in_background, overview_pk, mine_ubication)
+
+def schedule_address_resolution(overview_subform):
+    """
+    Programa la resolució de l'adreça un cop confirmada la transacció actual, fora del cicle petició/resposta
+    si GEOCODER["ASYNC"] és True. Amb GEOCODER["QUEUE"] la resolució s'encua a la cua de tasques (veure
+    `processdata.tasks`): no es perd si el procés s'atura i es torna a provar si el geocodificador falla.
+
+    :param overview_subform (Overview): instància amb les coordenades ja desades.
+    """
+    pk, mine_ubication = overview_subform.pk, overview_subform.mine_ubication
+    config = get_geocoder_config()
+    if config["QUEUE"]:
+        from .tasks import enqueue # evita la importació circular (les tasques depenen d'aquest mòdul)
+        enqueue("geocode_overview", {"overview_pk": pk}, key = f"geocode_overview:{pk}")
+    elif config["ASYNC"]:
+        transaction.on_commit(lambda: _submit_resolution(pk, mine_ubication)) # si la transacció es desfà, no queda res pendent
+    else:
+        transaction.on_commit(lambda: resolve_overview_address(pk, mine_ubication))
@@ -1,12 +1,37 @@
-from .models import Overview, SocioeconomicDimension, EnvironmentDimension
+from .models import Form, SubForm, Overview, SocioeconomicDimension, EnvironmentDimension
+from .storage import DIMENSIONS, SECTION_DIMENSIONS, get_storage
 from .data import SOCIOECONOMIC_DIMENSION_QUESTIONS, ENVIRONMENT_DIMENSION_QUESTIONS
-from .utils import reverse_geocode, is_child
-from django.shortcuts import get_object_or_404
-from django.apps import apps
+from .utils import is_child
+from .geocoding import get_cached_address, schedule_address_resolution, ageocode
+from .resolver import get_for_fingerprint, aget_for_fingerprint
+from django.db import transaction
+from django.db.models import F
 import logging
 
 logger = logging.getLogger(__name__)
 
+def get_location(mine_ubication):
+    """
+    Converteix les coordenades desades ("lat,lon") en un diccionari amb latitud i longitud.
+
+    :param mine_ubication(str): coordenades desades a l'Overview. Pot ser None.
+
+    :return (dict): Diccionari amb les claus `latitude` i `longitude`. Si no hi ha coordenades vàlides, els dos valors són None.
+    """
+    if mine_ubication:
+        try:
+            lat_str, lon_str = mine_ubication.split(",")
+            return {
+                "latitude": float(lat_str.strip()),
+                "longitude": float(lon_str.strip())
+            }
+        except ValueError:
+            pass
+    return {
+        "latitude": None,
+        "longitude": None
+    }
+
 def get_overview_data(fingerprint):
     """
     Recupera les dades del formulari Overview associat a un fingerprint.
@@ -20,30 +45,12 @@ def get_overview_data(fingerprint):
     """
     try:
 
-        overview_subform = get_object_or_404(Overview, form__fingerprint__fingerprint_id = fingerprint)
-        
-        if overview_subform.mine_ubication:
-            try:
-                lat_str, lon_str = overview_subform.mine_ubication.split(",")
-                location = {
-                    "latitude": float(lat_str.strip()),
-                    "longitude": float(lon_str.strip())
-                }
-            except ValueError:
-                location = {
-                    "latitude": None,
-                    "longitude": None
-                }
-        else:
-            location = {
-                "latitude": None,
-                "longitude": None
-            }
+        overview_subform = get_for_fingerprint(Overview.objects, fingerprint)
 
         overview_data = {
                         "project_name": overview_subform.project_name,
                         "company_name": overview_subform.company_name,
-                        "mine_ubication": location,
+                        "mine_ubication": get_location(overview_subform.mine_ubication),
                         "phase": overview_subform.phase
                         }
     
@@ -65,8 +72,7 @@ def get_socioeconomic_data(fingerprint):
     :return (dict): Diccionari amb les respostes processades de la dimensió socioeconòmica. Retorna un diccionari buit si ocorre un error.
     """
     try:
-        socioeconomic_subform = get_object_or_404(SocioeconomicDimension, form__fingerprint__fingerprint_id = fingerprint)
-        socioeconomic_data = get_dimension_data(SOCIOECONOMIC_DIMENSION_QUESTIONS, socioeconomic_subform)
+        socioeconomic_data = get_dimension_data(SOCIOECONOMIC_DIMENSION_QUESTIONS, get_subdimension_instances(fingerprint))
         return socioeconomic_data
     except Exception as e:
         logger.error(f"Error in get_socioeconomic_data({fingerprint}): {e}")
@@ -85,25 +91,24 @@ def get_environment_data(fingerprint):
     :return (dict): Diccionari amb les respostes processades de la dimensió ambiental. Retorna un diccionari buit si hi ha un error.
     """
     try:
-        environment_subform = get_object_or_404(EnvironmentDimension, form__fingerprint__fingerprint_id = fingerprint)
-        environment_data = get_dimension_data(ENVIRONMENT_DIMENSION_QUESTIONS, environment_subform)
+        environment_data = get_dimension_data(ENVIRONMENT_DIMENSION_QUESTIONS, get_subdimension_instances(fingerprint))
         return environment_data
     except Exception as e:
         logger.error(f"Error in get_environment_data({fingerprint}): {e}")
         return {}
     
 
-def get_dimension_data(dimension_questions, dimension_subform):
+def get_dimension_data(dimension_questions, instances):
     """
-    Extreu les dades d'una dimensió concreta d’un formulari mitjançant les preguntes i el subformulari corresponent.
+    Extreu les dades d'una dimensió concreta d’un formulari mitjançant les preguntes i les instàncies de les subdimensions.
 
     Aquesta funció recorre la llista de preguntes definides per una dimensió (com Socioeconòmica o Ambiental),
-    obté el model associat a cada grup de preguntes i recupera les respostes desades en la base de dades,
+    obté la instància associada a cada grup de preguntes i recupera les respostes desades,
     utilitzant els noms dels camps especificats com `input_id` o `parent_id` amb fills.
 
     :param dimension_questions (list(dict)): Llista de diccionaris que descriuen les preguntes associades a una dimensió.
 
-    :param dimension_subform (Model Instance): Instància del subformulari relacionat amb la dimensió (ex: `SocioeconomicDimension` o `EnvironmentDimension`).
+    :param instances (dict): Diccionari amb les instàncies de cada subdimensió, on la clau és l'ID del model (veure `get_subdimension_instances`).
 
     :return (dict): Diccionari amb les dades extretes dels models corresponents, on les claus són els identificadors dels camps i els valors són les respostes desades.
     """
@@ -111,8 +116,7 @@ def get_dimension_data(dimension_questions, dimension_subform):
 
     for i in range(len(dimension_questions)):
             model_name = dimension_questions[i]['id'] # ID de la subdimensió.    
-            Model = apps.get_model("processdata", model_name) # Obtenció del model corresponent a la subdimensió
-            instance = Model.objects.get(subform = dimension_subform) # Instància al model
+            instance = instances[model_name] # Instància ja carregada per a aquesta subdimensió
             for question in dimension_questions[i]['questions']:
                 if "input_id" in question:
                     field = question["input_id"]
@@ -125,6 +129,18 @@ def get_dimension_data(dimension_questions, dimension_subform):
                         dimension_data.update({field: value})
     return dimension_data
 
+def get_form_data(fingerprint):
+    """
+    Recupera totes les respostes desades d'un formulari (Overview i les dues dimensions) per tornar-les a mostrar a la pàgina.
+
+    :param fingerprint(str): Identificador únic del fingerprint del formulari principal.
+    """
+    return {
+        "overview": get_overview_data(fingerprint),
+        "socioeconomic_dimension": get_socioeconomic_data(fingerprint),
+        "environment_dimension": get_environment_data(fingerprint)
+    }
+
 def get_overview_data_for_results(fingerprint):
     """
     Recupera les dades generals d’un projecte per mostrar-les a l’apartat de resultats, amb la ubicació en format text.
@@ -132,35 +148,88 @@ def get_overview_data_for_results(fingerprint):
     Aquesta funció és molt similar a `get_overview_data`, però està pensada per a l’apartat de resultats,
     on es vol mostrar l’adreça de la mina en format llegible (textual) en comptes de les coordenades.
 
-    Per aconseguir això, utilitza la funció `reverse_geocode` per convertir la latitud i longitud en una adreça textual.
-    Si hi ha algun error durant la geocodificació inversa, s’afegeix `mine_address = None`.
+    L'adreça es resol en desar les coordenades (`save_overview_data`) i queda desada a l'Overview, de manera que
+    aquesta funció no fa cap petició externa. Si encara no s'ha resolt, es consulta la caché de coordenades i, si
+    tampoc hi és, es programa la resolució en segon pla i s’afegeix `mine_address = None`.
 
     :param fingerprint(str): Identificador únic del fingerprint del formulari principal.
 
     :return (dict): Diccionari amb les dades del projecte, incloent l’adreça textual (`mine_address`) i la resta d’informació.
              Si no es pot recuperar el formulari Overview, retorna un diccionari buit.
     """
+    try:
+        overview_subform = get_for_fingerprint(Overview.objects, fingerprint)
+    except Exception as e:
+        logger.error(f"Error in get_overview_data_for_results({fingerprint}): {e}")
+        return {}
 
-    overview_data = get_overview_data(fingerprint)
+    overview_data = {
+        "project_name": overview_subform.project_name,
+        "company_name": overview_subform.company_name,
+        "phase": overview_subform.phase,
+        "mine_address": overview_subform.mine_address
+    }
 
-    if overview_data == {}:
-        return overview_data
-    
-    try:
-        latitude = overview_data['mine_ubication']['latitude']
-        longitude = overview_data['mine_ubication']['longitude']
-        
-        mine_address = reverse_geocode(latitude, longitude)
-        overview_data['mine_address'] = mine_address
-        del overview_data['mine_ubication']  
+    location = get_location(overview_subform.mine_ubication)
 
-    except Exception as e:
-        logger.error(f"Error in reverse geocoding for fingerprint {fingerprint}: {e}")
-        overview_data['mine_address'] = None
+    if overview_data["mine_address"] is None and location["latitude"] is not None:
+        overview_data["mine_address"] = get_cached_address(location["latitude"], location["longitude"])
+        if overview_data["mine_address"] is None: # Pendent de resoldre (ex: error de Nominatim en desar)
+            schedule_address_resolution(overview_subform)
 
     return overview_data  
 
-def get_results_for_dimension(dimension_questions, dimension_subform, dimension_reference):
+async def aget_overview_data_for_results(fingerprint):
+    """
+    Versió asíncrona de `get_overview_data_for_results` (ORM asíncron), per a la vista de resultats asíncrona.
+
+    Si l'adreça encara no s'ha resolt, s'espera el geocodificador asíncron en comptes de programar la resolució en
+    segon pla: l'espera no ocupa cap fil del servidor. L'adreça obtinguda es desa a l'Overview.
+
+    :param fingerprint(str): Identificador únic del fingerprint del formulari principal.
+
+    :return (dict): Diccionari amb les dades del projecte. Si no es pot recuperar el formulari Overview, retorna un diccionari buit.
+    """
+    try:
+        overview_subform = await aget_for_fingerprint(Overview.objects, fingerprint)
+    except Overview.DoesNotExist as e:
+        logger.error(f"Error in aget_overview_data_for_results({fingerprint}): {e}")
+        return {}
+
+    overview_data = {
+        "project_name": overview_subform.project_name,
+        "company_name": overview_subform.company_name,
+        "phase": overview_subform.phase,
+        "mine_address": overview_subform.mine_address
+    }
+
+    location = get_location(overview_subform.mine_ubication)
+
+    if overview_data["mine_address"] is None and location["latitude"] is not None:
+        try:
+            overview_data["mine_address"] = await ageocode(location["latitude"], location["longitude"])
+        except Exception as e:
+            logger.error(f"Error in aget_overview_data_for_results({fingerprint}): {e}")
+        if overview_data["mine_address"] is not None: # Només si les coordenades no han canviat mentrestant
+            await Overview.objects.filter(pk = overview_subform.pk, mine_ubication = overview_subform.mine_ubication).aupdate(mine_address = overview_data["mine_address"])
+
+    return overview_data
+
+def get_subdimension_instances(fingerprint):
+    """
+    Recupera les instàncies de totes les subdimensions (Socioeconòmica i Ambiental) d'un fingerprint a través del
+    backend d'emmagatzematge configurat (veure `processdata.storage`). Una única consulta amb qualsevol dels backends.
+
+    Les subdimensions sense respostes desades es retornen com a instàncies sense desar, amb els valors per defecte del model.
+
+    :param fingerprint(str): Identificador únic del fingerprint del formulari principal.
+
+    :return (dict): Diccionari on la clau és l'ID de la subdimensió (nom del model) i el valor la seva instància.
+    :raises ObjectDoesNotExist: si el fingerprint no té formulari.
+    """
+    return get_storage().get_instances(fingerprint)
+
+def get_results_for_dimension(dimension_questions, instances, dimension_reference):
     """
     Genera un conjunt de resultats estructurat a partir de les respostes d'una dimensió del formulari, amb identificadors,
     valors i títols de secció, pensat per ser mostrat a la vista de resultats.
@@ -171,7 +240,7 @@ def get_results_for_dimension(dimension_questions, dimension_subform, dimension_
 
     :param dimension_questions (list(dict)): Llista de diccionaris que defineixen la configuració de la dimensió (models, preguntes, seccions).
 
-    :param dimension_subform (Model instance): Instància del subformulari associat a la dimensió.
+    :param instances (dict): Diccionari amb les instàncies de cada subdimensió, on la clau és l'ID del model (veure `get_subdimension_instances`).
 
     :param dimension_reference (str): Identificador de la dimensió per encapsular els resultats (ex: "socioeconomic").
 
@@ -186,9 +255,8 @@ def get_results_for_dimension(dimension_questions, dimension_subform, dimension_
         model_name, name = dimension_questions[i]['id'], dimension_questions[i]['section_name']
         # Inicialitzem la llista on es guardarán les respostes.
         values = []
-        # Accés al model i instància a aquest
-        Model = apps.get_model("processdata", model_name)  
-        instance = Model.objects.get(subform = dimension_subform)
+        # Instància ja carregada per a aquesta subdimensió
+        instance = instances[model_name]
         
         for question in dimension_questions[i]['questions']:
             
@@ -256,6 +324,17 @@ def get_results_for_dimension(dimension_questions, dimension_subform, dimension_
     return results  
     
 
+def get_results_from_instances(instances):
+    """
+    Retorna les respostes de les dues dimensions en el format d'entrada de `calculate_rating` a partir de les
+    instàncies de les subdimensions ja carregades.
+
+    :param instances (dict): Diccionari amb les instàncies de cada subdimensió (veure `get_subdimension_instances`).
+    """
+    results = get_results_for_dimension(SOCIOECONOMIC_DIMENSION_QUESTIONS, instances, 'socioeconomic')
+    results.update(get_results_for_dimension(ENVIRONMENT_DIMENSION_QUESTIONS, instances, 'environment'))
+    return results
+
 def get_results(fingerprint):
     """
     Retorna les respostes del formulari en el format adecuat per ser avaluades per a un usuari concret.
@@ -264,18 +343,63 @@ def get_results(fingerprint):
     """ 
     results = {}
     try:
-        # Extracció de les respostes desades per a Dimensió Socioeconòmica i Ambiental
-        socioeconomic_subform = get_object_or_404(SocioeconomicDimension, form__fingerprint__fingerprint_id = fingerprint)
-        environment_subform = get_object_or_404(EnvironmentDimension, form__fingerprint__fingerprint_id = fingerprint)
+        # Extracció de les respostes desades per a Dimensió Socioeconòmica i Ambiental (una sola consulta)
+        instances = get_subdimension_instances(fingerprint)
         # Processament de les dades per poder ser usades pel càlcul. 
-        results = get_results_for_dimension(SOCIOECONOMIC_DIMENSION_QUESTIONS, socioeconomic_subform, 'socioeconomic')
-        results.update(get_results_for_dimension(ENVIRONMENT_DIMENSION_QUESTIONS, environment_subform, 'environment'))
-
-        return results
+        return get_results_from_instances(instances)
     except Exception as e:
         logger.error(f"Error in get_results({fingerprint}): {e}")
 
 
+def update_overview_subform(overview_subform, data):
+    """
+    Aplica les dades generals del projecte (totes o només les modificades) a una instància d'Overview i la desa.
+
+    :param overview_subform (Overview): instància a actualitzar.
+    :param data(dict): diccionari amb les dades entrades. Les claus que no hi són conserven el valor previ.
+    """
+    # Actualitza les columnes amb les dades entrades, en cas de no haber-hi deixa les que habia previament.
+    overview_subform.project_name = data.get("project_name", overview_subform.project_name)
+    overview_subform.company_name = data.get("company_name", overview_subform.company_name)
+
+    mine_ubication = data.get("mine_ubication")
+    new_location = False
+
+    if mine_ubication:
+        latitude = mine_ubication.get("latitude")
+        longitude = mine_ubication.get("longitude")
+        if latitude is not None and longitude is not None: 
+            new_location = overview_subform.mine_ubication != f"{latitude},{longitude}"
+            overview_subform.mine_ubication = f"{latitude},{longitude}"
+
+    if new_location: # Noves coordenades: l'adreça es resol una sola vegada (caché o en segon pla)
+        overview_subform.mine_address = get_cached_address(latitude, longitude)
+        overview_subform.geocode_failed_at = None
+
+    overview_subform.phase = data.get("phase", overview_subform.phase)
+    overview_subform.save() # aplica els canvis
+
+    if new_location and overview_subform.mine_address is None:
+        schedule_address_resolution(overview_subform)
+
+def bump_revision(form_id):
+    """
+    Incrementa la versió de les respostes d'un formulari (veure `sync_form_data`).
+
+    :param form_id(int): clau primària del formulari (igual a la de les seves dimensions).
+    """
+    Form.objects.filter(pk = form_id).update(revision = F("revision") + 1)
+
+def answers_saved(fingerprint):
+    """
+    Accions posteriors a un desat de respostes: programa el recàlcul de la instantània de resultats de l'API (veure
+    `processdata.snapshots`). La caché de resultats no s'invalida: les entrades depenen del hash de les respostes.
+
+    :param fingerprint(str): id que identifica a l'usuari a la base de dades.
+    """
+    from .snapshots import schedule_snapshot_refresh # snapshots depèn d'aquest mòdul
+    schedule_snapshot_refresh(fingerprint)
+
 def save_overview_data(fingerprint, data):
     """
     Emmagatzema les dades generals del projecte miner entrades per l'usuari.
@@ -285,21 +409,10 @@ def save_overview_data(fingerprint, data):
     """ 
     try:
         # Instància al model Overview 
-        overview_subform = get_object_or_404(Overview, form__fingerprint__fingerprint_id = fingerprint)
-        # Actualitza les columnes amb les dades entrades, en cas de no haber-hi deixa les que habia previament.
-        overview_subform.project_name = data.get("project_name", overview_subform.project_name)
-        overview_subform.company_name = data.get("company_name", overview_subform.company_name)
-
-        mine_ubication = data.get("mine_ubication")
-    
-        if mine_ubication:
-            latitude = mine_ubication.get("latitude")
-            longitude = mine_ubication.get("longitude")
-            if latitude is not None and longitude is not None: 
-                overview_subform.mine_ubication = f"{latitude},{longitude}"
-
-        overview_subform.phase = data.get("phase", overview_subform.phase)
-        overview_subform.save() # aplica els canvis
+        overview_subform = get_for_fingerprint(Overview.objects, fingerprint)
+        update_overview_subform(overview_subform, data)
+        bump_revision(overview_subform.pk)
+        answers_saved(fingerprint) # el resultat desat ja no és vàlid
 
         return True
 
@@ -315,9 +428,11 @@ def save_socioeconomic_data(fingerprint, data):
     :param data(dict): diccionari amb les dades a emmagatzemar.
     """
     # Instància al model SocioeconomicDimension
-    socioeconomic_subform = get_object_or_404(SocioeconomicDimension, form__fingerprint__fingerprint_id = fingerprint)
+    socioeconomic_subform = get_for_fingerprint(SocioeconomicDimension.objects, fingerprint)
     try:
         save_dimension_data(socioeconomic_subform, data)
+        bump_revision(socioeconomic_subform.pk)
+        answers_saved(fingerprint) # el resultat desat ja no és vàlid
         return True
     except Exception as e:
         logger.error(f"Error in save_economic_data(...): {e}")
@@ -331,9 +446,11 @@ def save_environment_data(fingerprint, data):
     :param data(dict): diccionari amb les dades a emmagatzemar.
     """
     # Instància al model EnvironmentDimension
-    environment_subform = get_object_or_404(EnvironmentDimension, form__fingerprint__fingerprint_id = fingerprint)
+    environment_subform = get_for_fingerprint(EnvironmentDimension.objects, fingerprint)
     try:
         save_dimension_data(environment_subform, data)
+        bump_revision(environment_subform.pk)
+        answers_saved(fingerprint) # el resultat desat ja no és vàlid
         return True
     except Exception as e:
         logger.error(f"Error in save_environment_data(...): {e}")
@@ -342,19 +459,80 @@ def save_environment_data(fingerprint, data):
 
 def save_dimension_data(dimension_subform, data):
     """
-    Funció que s'encarrega d'emmagatzemar noves dades per a una dimensió determinada.
+    Funció que s'encarrega d'emmagatzemar noves dades per a una dimensió determinada, a través del backend
+    d'emmagatzematge configurat (veure `processdata.storage`).
 
     :param dimension_subform: instància del model de la dimensió.
     :param data(dict): dades a emmagatzemar agrupades per subdimensions.
     """
-    for model, fields in data.items():
-        Model = apps.get_model("processdata", model) 
-        subsubform = Model.objects.get(subform = dimension_subform)
-        for field, value in fields.items():
-            if value != "" and value !=[]: 
-                value = True if value == "on" else False if value == "off" else value # Valors si/no s'emmagatzemen en format booleà
-                setattr(subsubform, field, value)
-            else: # Contingut buit s'emmagatzemma com a None
-                setattr(subsubform, field, None)
-    
-        subsubform.save() # Guardem les dades per la subdimensió
\ No newline at end of file
+    get_storage().save(dimension_subform, data)
+
+
+def get_form_version(fingerprint):
+    """
+    Retorna la versió actual de les respostes d'un fingerprint, o None si no té formulari.
+
+    :param fingerprint(str): id que identifica a l'usuari a la base de dades.
+    """
+    try:
+        return get_for_fingerprint(Form.objects.only("revision"), fingerprint).revision
+    except Form.DoesNotExist:
+        return None
+
+class VersionConflict(Exception):
+    """
+    La versió de les respostes enviada pel client no coincideix amb la desada (ex: formulari obert en dues pestanyes).
+
+    :param version(int): versió actual desada.
+    """
+    def __init__(self, version):
+        super().__init__(f"Stored version is {version}")
+        self.version = version
+
+def validate_changes(changes):
+    """
+    Comprova que els canvis d'una sincronització només fan referència a dimensions i subdimensions existents.
+
+    :param changes(dict): canvis agrupats per dimensió (veure `sync_form_data`).
+    :raises ValueError: si alguna dimensió o subdimensió és desconeguda.
+    """
+    for reference, sections in changes.items():
+        if reference != "overview" and (reference not in DIMENSIONS or any(SECTION_DIMENSIONS.get(section) != reference for section in sections)):
+            raise ValueError(f"Unknown dimension or section in '{reference}'.")
+
+def sync_form_data(fingerprint, changes, version = None):
+    """
+    Aplica en una única transacció els canvis del formulari de qualsevol dimensió i retorna la nova versió.
+
+    El client només envia els camps que han canviat des de l'última sincronització, juntament amb la versió que coneix.
+    Si no hi ha cap canvi no s'escriu res i es retorna la versió actual.
+
+    :param fingerprint(str): id que identifica a l'usuari a la base de dades.
+    :param changes(dict): canvis agrupats per dimensió:
+                          {"overview": {camp: valor}, "socioeconomic": {subdimensió: {camp: valor}}, "environment": {...}}
+    :param version(int): versió coneguda pel client. Si és None no es comprova.
+
+    :return (int): versió de les respostes després d'aplicar els canvis.
+    :raises Form.DoesNotExist: si el fingerprint no té formulari.
+    :raises VersionConflict: si la versió del client no és l'actual.
+    :raises ValueError: si algun canvi fa referència a una dimensió o subdimensió desconeguda.
+    """
+    validate_changes(changes)
+
+    with transaction.atomic():
+        form = get_for_fingerprint(Form.objects.select_for_update(), fingerprint)
+        if version is not None and version != form.revision:
+            raise VersionConflict(form.revision)
+        if not any(changes.values()): # Res a desar
+            return form.revision
+
+        if changes.get("overview"):
+            update_overview_subform(Overview.objects.get(pk = form.pk), changes["overview"])
+        for reference in DIMENSIONS:
+            if changes.get(reference):
+                save_dimension_data(SubForm(form = form), changes[reference]) # Les dimensions comparteixen la clau primària del formulari
+
+        bump_revision(form.pk)
+
+    answers_saved(fingerprint) # el resultat desat ja no és vàlid
+    return form.revision + 1
@@ -0,0 +1,159 @@
+import atexit
+import logging
+import threading
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, F, Q, When, Value
+from django.utils.module_loading import import_string
+from django.utils.timezone import now
+from .models import UserFingerprint
+
+logger = logging.getLogger(__name__)
+
+# Configuració per defecte (es pot sobreescriure amb HEARTBEAT a settings.py)
+DEFAULT_HEARTBEAT = {
+    "BACKEND": "processdata.heartbeat.LocalHeartbeatBuffer",
+    "FLUSH_INTERVAL": 30,
+    "MAX_PENDING": 500,
+}
+
+# Usuaris per sentència UPDATE (dos paràmetres per usuari: límit de variables de SQLite)
+UPDATE_BATCH_SIZE = 400
+
+#----------------------------------------------------------------
+#--------------------------- BACKENDS ---------------------------
+#----------------------------------------------------------------
+
+class LocalHeartbeatBuffer:
+    """
+    Últimes connexions pendents de desar a la memòria del procés: una entrada per usuari amb l'última hora registrada.
+    Cada procés desa les seves; registrar una visita és O(1) i no fa cap E/S, també des de les vistes asíncrones.
+    """
+    def __init__(self):
+        self._pending = {} # clau primària de UserFingerprint -> última connexió
+        self._lock = threading.Lock()
+
+    def record(self, user_pk, timestamp):
+        """
+        Registra una connexió. Retorna el nombre d'usuaris pendents.
+        """
+        with self._lock:
+            if self._pending.get(user_pk) is None or self._pending[user_pk] < timestamp:
+                self._pending[user_pk] = timestamp
+            return len(self._pending)
+
+    def drain(self):
+        """
+        Retorna i buida les connexions pendents.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            return pending
+
+
+#----------------------------------------------------------------
+#---------------------------- DESAT -----------------------------
+#----------------------------------------------------------------
+
+def write_heartbeats(pending):
+    """
+    Desa les últimes connexions amb una sentència UPDATE per bloc de UPDATE_BATCH_SIZE usuaris (CASE per usuari).
+    Una connexió més antiga que la desada no la sobreescriu; els usuaris eliminats s'ignoren.
+
+    :param pending (dict): {clau primària de UserFingerprint: última connexió}.
+    :return (int): files actualitzades.
+    """
+    items, updated = list(pending.items()), 0
+    for start in range(0, len(items), UPDATE_BATCH_SIZE):
+        batch = items[start:start + UPDATE_BATCH_SIZE]
+        last_seen = Case(
+            *[When(Q(pk = user_pk) & Q(last_seen__lt = timestamp), then = Value(timestamp)) for user_pk, timestamp in batch],
+            default = F("last_seen")
+        )
+        updated += UserFingerprint.objects.filter(pk__in = [user_pk for user_pk, _ in batch]).update(last_seen = last_seen)
+    return updated
+
+
+class HeartbeatWriter:
+    """
+    Buffer d'escriptura diferida de les últimes connexions (last_seen): les visites només es registren al buffer i es
+    desen totes juntes (veure `write_heartbeats`) al cap de FLUSH_INTERVAL segons o en arribar a MAX_PENDING usuaris,
+    en un fil en segon pla, i en aturar el procés. Registrar una visita no accedeix mai a la base de dades, de manera
+    que també es pot fer des de vistes asíncrones.
+    """
+    def __init__(self, buffer, FLUSH_INTERVAL = 30, MAX_PENDING = 500):
+        self.buffer, self.flush_interval, self.max_pending = buffer, FLUSH_INTERVAL, MAX_PENDING
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def record(self, user_pk, timestamp = None):
+        pending = self.buffer.record(user_pk, timestamp or now())
+        if pending >= self.max_pending:
+            self._schedule(0)
+        else:
+            self._schedule(self.flush_interval)
+
+    def _schedule(self, delay):
+        with self._lock:
+            if self._timer is not None and (delay or not self._timer.interval): # Desat ja programat
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(delay, self._flush_in_background)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_in_background(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        finally:
+            connection.close() # el fil no forma part del cicle petició/resposta, tanquem la seva connexió
+
+    def flush(self):
+        """
+        Desa les connexions pendents. En cas d'error es perden (es tornaran a registrar en la següent visita).
+
+        :return (int): files actualitzades.
+        """
+        pending = self.buffer.drain()
+        if not pending:
+            return 0
+        try:
+            return write_heartbeats(pending)
+        except Exception as e:
+            logger.error(f"Error in HeartbeatWriter.flush(): {e}")
+            return 0
+
+#----------------------------------------------------------------
+#------------------------------ API -----------------------------
+#----------------------------------------------------------------
+
+_writer = None
+
+def get_heartbeat_writer():
+    """
+    Retorna el buffer de connexions configurat a settings.HEARTBEAT.
+    """
+    global _writer
+    if _writer is None:
+        config = {**DEFAULT_HEARTBEAT, **getattr(settings, "HEARTBEAT", {})}
+        buffer = import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+        _writer = HeartbeatWriter(buffer, FLUSH_INTERVAL = config["FLUSH_INTERVAL"], MAX_PENDING = config["MAX_PENDING"])
+        atexit.register(_writer.flush) # no es perden les connexions pendents en aturar el procés
+    return _writer
+
+def record_heartbeat(user_pk):
+    """
+    Registra una visita d'un usuari (s'actualitzarà el seu last_seen en el següent desat del buffer).
+
+    :param user_pk (int): clau primària de UserFingerprint.
+    """
+    get_heartbeat_writer().record(user_pk)
+
+def flush_heartbeats():
+    """
+    Desa immediatament les connexions pendents (ex: abans d'eliminar els usuaris inactius).
+    """
+    return get_heartbeat_writer().flush()
@@ -0,0 +1,153 @@
+import csv
+import json
+import time
+from itertools import islice
+from django.db import connections, router, transaction
+from .models import ResultSnapshot, UserFingerprint, create_forms
+from .answers import clean_answers, clean_overview, get_results_from_clean_answers
+from .data import CONFIG_VERSION
+from .export import OVERVIEW_COLUMNS, get_answer_columns, get_csv_header
+from .rating.calculate import calculate_rating
+
+# Columnes de l'exportació (veure `processdata.export`) que no són dades ni respostes: s'ignoren en importar
+IGNORED_COLUMNS = set(get_csv_header()) - set(OVERVIEW_COLUMNS) - set(get_answer_columns()) - {"fingerprint"}
+
+#----------------------------------------------------------------
+#--------------------------- LECTURA ----------------------------
+#----------------------------------------------------------------
+
+def read_import_records(path, input_format):
+    """
+    Llegeix de manera incremental les avaluacions a importar d'un fitxer JSONL o CSV.
+
+    - JSONL: una línia per avaluació, {"fingerprint": ..., "overview": {...}, "answers": {input_id: valor}}
+      (format de `export_assessments`) o bé {"fingerprint": ..., camp: valor, ...}.
+    - CSV: una fila per avaluació, amb una columna `fingerprint` i una columna per a cada camp de l'Overview o `input_id`.
+
+    Les columnes de puntuacions i metadades de l'exportació s'ignoren, de manera que una exportació es pot tornar a importar.
+
+    :return (generator(tuple)): (número de línia, {"fingerprint", "overview", "answers"}).
+    """
+    with open(path, "r", encoding = "utf-8", newline = "") as file:
+        if input_format == "csv":
+            reader = csv.DictReader(file)
+            for row in reader:
+                yield reader.line_num, split_record(row)
+        else:
+            for line_number, line in enumerate(file, start = 1):
+                if line.strip():
+                    record = json.loads(line)
+                    if "answers" not in record:
+                        record = split_record(record)
+                    yield line_number, record
+
+def split_record(row):
+    """
+    Separa una fila plana {camp: valor} en fingerprint, dades de l'Overview i respostes de les dimensions.
+    """
+    row = {column: value for column, value in row.items() if column not in IGNORED_COLUMNS}
+    fingerprint = row.pop("fingerprint", None)
+    overview = {field: row.pop(field) for field in OVERVIEW_COLUMNS if field in row}
+    return {"fingerprint": fingerprint, "overview": overview, "answers": row}
+
+def clean_record(record):
+    """
+    Valida una avaluació a importar contra el JSON de preguntes.
+
+    :return (tuple): (fingerprint, valors de l'Overview, respostes {ID de la subdimensió: {input_id: valor}}).
+    :raises ValueError: si falta el fingerprint o alguna resposta no és vàlida.
+    """
+    fingerprint = str(record.get("fingerprint") or "").strip()
+    if not fingerprint:
+        raise ValueError("Missing fingerprint.")
+    if len(fingerprint) > UserFingerprint._meta.get_field("fingerprint_id").max_length:
+        raise ValueError(f"Fingerprint too long: {fingerprint}")
+    return fingerprint, clean_overview(record.get("overview") or {}), clean_answers(record.get("answers") or {})
+
+#----------------------------------------------------------------
+#-------------------------- IMPORTACIÓ --------------------------
+#----------------------------------------------------------------
+
+class ImportStats:
+    """
+    Comptadors d'una importació: avaluacions importades, ignorades (fingerprint existent), errors i temps.
+    """
+    def __init__(self):
+        self.read, self.imported, self.skipped = 0, 0, 0
+        self.errors = [] # (número de línia, missatge)
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def __str__(self):
+        rate = self.read / self.elapsed if self.elapsed else 0
+        return (
+            f"{self.read} rows read in {self.elapsed:.2f}s ({rate:.0f} rows/s): "
+            f"{self.imported} imported, {self.skipped} skipped (existing fingerprint), {len(self.errors)} errors"
+        )
+
+
+def insert_chunk(chunk):
+    """
+    Insereix un bloc d'avaluacions vàlides en una única transacció: els fingerprints amb una inserció,
+    el formulari complet amb una inserció per taula (veure `create_forms`) i les instantànies de resultats
+    (veure `processdata.snapshots`), calculades a partir de les respostes ja carregades, amb una altra inserció.
+
+    :param chunk (list(tuple)): (fingerprint, valors de l'Overview, respostes) per avaluació.
+    """
+    with transaction.atomic():
+        users = [UserFingerprint(fingerprint_id = fingerprint) for fingerprint, _, _ in chunk]
+        if connections[router.db_for_write(UserFingerprint)].features.can_return_rows_from_bulk_insert:
+            users = UserFingerprint.objects.bulk_create(users)
+        else: # Sense suport per recuperar les claus primàries d'una inserció múltiple
+            UserFingerprint.objects.bulk_create(users)
+            users = list(UserFingerprint.objects.filter(fingerprint_id__in = [user.fingerprint_id for user in users]).order_by("pk"))
+        forms = create_forms(users, overviews = [overview for _, overview, _ in chunk], answers = [answers for _, _, answers in chunk])
+        ResultSnapshot.objects.bulk_create([
+            ResultSnapshot(form_id = form.pk, revision = form.revision, config_version = CONFIG_VERSION,
+                           scores = calculate_rating(get_results_from_clean_answers(answers), render = False))
+            for form, (_, _, answers) in zip(forms, chunk)
+        ])
+
+def import_assessments(records, chunk_size = 500, stats = None):
+    """
+    Importa avaluacions (respostes indexades per `input_id`) per blocs, sense passar pel formulari web.
+
+    Cada registre es valida contra el JSON de preguntes (`clean_answers`, `clean_overview`). Els registres no vàlids i
+    els fingerprints que ja existeixen (a la base de dades o repetits al fitxer) no s'importen. Cada bloc de `chunk_size`
+    registres vàlids es desa amb `insert_chunk` en una transacció pròpia: si la importació s'interromp, els blocs anteriors es conserven.
+
+    :param records (iterable(tuple)): (número de línia, registre), veure `read_import_records`.
+    :param chunk_size (int): avaluacions per transacció.
+    :param stats (ImportStats): comptadors a actualitzar. Opcional.
+    :return (ImportStats): comptadors de la importació.
+    """
+    stats = stats or ImportStats()
+    seen = set()
+    records = iter(records)
+
+    while raw_chunk := list(islice(records, chunk_size)):
+        stats.read += len(raw_chunk)
+        chunk = []
+        for line_number, record in raw_chunk:
+            try:
+                chunk.append(clean_record(record))
+            except ValueError as e:
+                stats.errors.append((line_number, str(e)))
+
+        existing = set(UserFingerprint.objects.filter(fingerprint_id__in = [fingerprint for fingerprint, _, _ in chunk]).values_list("fingerprint_id", flat = True))
+        valid = []
+        for item in chunk:
+            if item[0] in existing or item[0] in seen:
+                stats.skipped += 1
+            else:
+                seen.add(item[0])
+                valid.append(item)
+
+        if valid:
+            insert_chunk(valid)
+            stats.imported += len(valid)
+
+    return stats
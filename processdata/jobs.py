@@ -0,0 +1,112 @@
+import logging
+from datetime import timedelta
+from django.utils.timezone import now
+from django.db.models import Q
+from .models import Overview
+from .geocoding import resolve_overview_address
+from .getdata import get_location
+from .retention import SweepStats, get_retention_config, sweep_expired
+from .scheduler import purge_runs, register_job, renew_lock
+from .snapshots import get_outdated_forms, refresh_result_snapshot
+from .tasks import purge_finished, register_task
+
+logger = logging.getLogger(__name__)
+
+# Màxim de files per execució de les tasques que consulten serveis externs o calculen resultats
+WARM_BATCH_SIZE = 500
+GEOCODE_BATCH_SIZE = 50
+# Segons abans de tornar a provar unes coordenades que el geocodificador no ha pogut resoldre
+GEOCODE_RETRY_INTERVAL = 86400
+# Recàlculs màxims d'una instantània de resultats si les respostes canvien mentre es calcula
+SNAPSHOT_REFRESH_ROUNDS = 3
+
+#----------------------------------------------------------------
+#---------------------- TASQUES PERIÒDIQUES ---------------------
+#----------------------------------------------------------------
+
+@register_job("retention_sweep", interval = 3600)
+def retention_sweep():
+    """
+    Elimina els usuaris inactius (veure `processdata.retention`) bloc a bloc, renovant el bloqueig de la tasca entre
+    blocs: una neteja llarga no supera SCHEDULER["LOCK_TIMEOUT"]. Si el bloqueig s'ha perdut, s'atura (la continuarà el
+    procés que el té). Retorna les files eliminades.
+    """
+    stats, batch_size = SweepStats(), get_retention_config()["BATCH_SIZE"]
+    while renew_lock():
+        users = stats.users
+        sweep_expired(batch_size = batch_size, start_after = stats.last_pk, max_batches = 1, stats = stats)
+        if stats.users - users < batch_size: # Últim bloc
+            break
+    return stats.rows
+
+@register_job("warm_results_cache", interval = 600)
+def warm_results_cache():
+    """
+    Recalcula les instantànies de resultats que falten o estan desactualitzades (ex: després de canviar la configuració
+    de preguntes), de manera que l'API de resultats i l'exportació no les han de calcular. Retorna les instantànies recalculades.
+    """
+    count = 0
+    for fingerprint_id in get_outdated_forms().values_list("fingerprint__fingerprint_id", flat = True)[:WARM_BATCH_SIZE]:
+        if refresh_result_snapshot(fingerprint_id) is not None:
+            count += 1
+    return count
+
+@register_job("geocode_backfill", interval = 300)
+def geocode_backfill():
+    """
+    Resol l'adreça dels Overviews amb coordenades i sense adreça (ex: Nominatim no disponible en desar-les), per ordre
+    de clau primària. Les peticions comparteixen el límit d'una per segon amb la resta del procés (veure
+    `processdata.geocoding.wait_for_request_slot`). Els intents fallits (ex: coordenades sense cap adreça) es marquen
+    i no es tornen a provar fins passats GEOCODE_RETRY_INTERVAL segons, de manera que no ocupen cada execució i la
+    resta de files avancen. Retorna les adreces resoltes.
+    """
+    overviews = (
+        Overview.objects.filter(mine_ubication__isnull = False, mine_address__isnull = True).exclude(mine_ubication = "")
+        .filter(Q(geocode_failed_at__isnull = True) | Q(geocode_failed_at__lt = now() - timedelta(seconds = GEOCODE_RETRY_INTERVAL)))
+        .order_by("pk")
+    )
+    count = 0
+    for pk, mine_ubication in overviews.values_list("pk", "mine_ubication")[:GEOCODE_BATCH_SIZE]:
+        if resolve_overview_address(pk, mine_ubication) is not None:
+            count += 1
+        else:
+            Overview.objects.filter(pk = pk, mine_ubication = mine_ubication).update(geocode_failed_at = now())
+    return count
+
+@register_job("purge_tasks", interval = 86400)
+def purge_tasks():
+    """
+    Elimina les tasques de la cua acabades fa més de TASK_QUEUE["KEEP_FINISHED"] dies i les execucions de les tasques
+    periòdiques (JobRun) de fa més de SCHEDULER["KEEP_RUNS"] dies. Retorna les files eliminades.
+    """
+    return purge_finished() + purge_runs()
+
+#----------------------------------------------------------------
+#--------------------- TASQUES EN SEGON PLA ---------------------
+#----------------------------------------------------------------
+
+@register_task("refresh_result_snapshot")
+def refresh_result_snapshot_task(fingerprint):
+    """
+    Recalcula la instantània de resultats d'un formulari després d'un desat (veure `schedule_snapshot_refresh`). Un
+    desat mentre la tasca s'executa no n'encua cap altra (mateixa clau): si les respostes han canviat durant el càlcul,
+    es torna a calcular, com a màxim SNAPSHOT_REFRESH_ROUNDS vegades.
+    """
+    for _ in range(SNAPSHOT_REFRESH_ROUNDS):
+        if refresh_result_snapshot(fingerprint) is None: # Formulari eliminat
+            return
+        if not get_outdated_forms().filter(fingerprint__fingerprint_id = fingerprint).exists():
+            return
+
+@register_task("geocode_overview")
+def geocode_overview(overview_pk):
+    """
+    Resol i desa l'adreça d'un Overview amb les coordenades desades en el moment d'executar-se (veure
+    `schedule_address_resolution`). Si el geocodificador no respon, llança una excepció perquè es torni a provar.
+    """
+    mine_ubication = Overview.objects.filter(pk = overview_pk).values_list("mine_ubication", flat = True).first()
+    location = get_location(mine_ubication)
+    if location["latitude"] is None: # Formulari eliminat o sense coordenades
+        return
+    if resolve_overview_address(overview_pk, mine_ubication) is None:
+        raise RuntimeError(f"Address not resolved for {mine_ubication}")
@@ -0,0 +1,65 @@
+import timeit
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from processdata.codec import get_available_codecs
+from processdata.data import OVERVIEW_QUESTIONS
+from processdata.getdata import get_dimension_data
+from processdata.storage import DIMENSIONS, SECTION_DIMENSIONS, get_field_names
+
+
+def to_form_value(value):
+    """
+    Valor d'una resposta tal com l'envia el formulari web ("on"/"off", text, buit).
+    """
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "on" if value else "off"
+    return str(value)
+
+
+def build_payloads():
+    """
+    Construeix els documents JSON reals de les vistes a partir de formularis sense desar (valors per defecte dels models):
+
+    - restore: resposta de check-fingerprint amb totes les respostes (17 subdimensions).
+    - sync: petició /sync/ que reenvia totes les respostes (després d'un conflicte de versió).
+    - small: resposta curta (ex: save-fingerprint).
+    """
+    instances = {section_id: apps.get_model("processdata", section_id)() for section_id in SECTION_DIMENSIONS}
+    overview = {question["input_id"]: question.get("placeholder") or "" for question in OVERVIEW_QUESTIONS}
+    overview["mine_ubication"] = {"latitude": 41.72501, "longitude": 1.82602}
+
+    form = {"overview": overview}
+    changes = {"overview": {**overview, "mine_ubication": "41.72501,1.82602"}}
+    for dimension, sections in DIMENSIONS.items():
+        form[f"{dimension}_dimension"] = get_dimension_data(sections, instances)
+        changes[dimension] = {
+            section["id"]: {field: to_form_value(getattr(instances[section["id"]], field)) for field in get_field_names(type(instances[section["id"]]))}
+            for section in sections
+        }
+
+    return {
+        "restore": {"message": "Searched if fingerprint is registered", "registered": True, "form": form, "version": 12},
+        "sync": {"fingerprint": "8f14e45fceea167a5a36dedd4bea2543", "version": 12, "changes": changes},
+        "small": {"message": "Fingerprint saved", "new": False},
+    }
+
+
+class Command(BaseCommand):
+    help = "Compara el temps de codificació i descodificació dels còdecs JSON disponibles amb els documents reals de les vistes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--number", type = int, default = 2000, help = "Repeticions per mesura.")
+
+    def handle(self, *args, **options):
+        payloads, number = build_payloads(), options["number"]
+        self.stdout.write(f"{'codec':<8} {'payload':<8} {'bytes':>7} {'encode µs':>10} {'decode µs':>10}")
+
+        for codec_class in get_available_codecs():
+            codec = codec_class()
+            for name, payload in payloads.items():
+                encoded = codec.dumps(payload)
+                encode = min(timeit.repeat(lambda: codec.dumps(payload), number = number, repeat = 3)) / number
+                decode = min(timeit.repeat(lambda: codec.loads(encoded), number = number, repeat = 3)) / number
+                self.stdout.write(f"{codec.name:<8} {name:<8} {len(encoded):>7} {encode * 1e6:>10.1f} {decode * 1e6:>10.1f}")
@@ -0,0 +1,128 @@
+import asyncio
+import shlex
+import socket
+import statistics
+import subprocess
+import time
+from django.core.management.base import BaseCommand, CommandError
+from processdata.models import UserFingerprint
+
+# Servidors a comparar: vistes síncrones amb workers síncrons de gunicorn i vistes asíncrones amb un servidor ASGI
+DEFAULT_SERVERS = {
+    "wsgi": "gunicorn core.wsgi:application --workers {workers} --bind 127.0.0.1:{port}",
+    "asgi": "gunicorn core.asgi:application --worker-class uvicorn.workers.UvicornWorker --workers {workers} --bind 127.0.0.1:{port}",
+}
+# Rutes de cada servidor ({fp}: fingerprint de prova)
+ENDPOINTS = {
+    "wsgi": ["/check-fingerprint/?fingerprint_id={fp}", "/results/?fingerprintId={fp}"],
+    "asgi": ["/async/check-fingerprint/?fingerprint_id={fp}", "/async/results/?fingerprintId={fp}"],
+}
+FINGERPRINT_PREFIX = "benchmark-"
+
+
+async def fetch(port, path):
+    """
+    Fa una petició GET (HTTP/1.1, sense keep-alive) i retorna el codi d'estat.
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    status_line = await reader.readline()
+    await reader.read() # resta de la resposta fins que el servidor tanca la connexió
+    writer.close()
+    return int(status_line.split()[1])
+
+
+async def run_load(port, paths, concurrency, duration):
+    """
+    Executa `concurrency` clients concurrents durant `duration` segons, cadascun fent peticions consecutives.
+
+    :return (tuple): (latències en segons de les respostes correctes, nombre d'errors, temps total).
+    """
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+
+    async def client(index):
+        nonlocal errors
+        request = index
+        while time.perf_counter() < deadline:
+            path = paths[request % len(paths)]
+            request += 1
+            started = time.perf_counter()
+            try:
+                status = await fetch(port, path)
+            except OSError:
+                status = None
+            if status == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[client(index) for index in range(concurrency)])
+    return latencies, errors, time.perf_counter() - started
+
+
+def wait_for_port(port, process, timeout = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f"Server exited with code {process.returncode}.")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout = 0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f"Server did not start listening on port {port}.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara les vistes síncrones servides amb workers síncrons de gunicorn (WSGI) amb les vistes asíncrones "
+        "servides amb un servidor ASGI (uvicorn), amb molts clients concurrents. Requereix gunicorn i uvicorn."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--servers", nargs = "+", choices = list(DEFAULT_SERVERS), default = list(DEFAULT_SERVERS))
+        parser.add_argument("--wsgi-command", default = DEFAULT_SERVERS["wsgi"], help = "Ordre del servidor WSGI ({workers}, {port}).")
+        parser.add_argument("--asgi-command", default = DEFAULT_SERVERS["asgi"], help = "Ordre del servidor ASGI ({workers}, {port}).")
+        parser.add_argument("--workers", type = int, default = 4)
+        parser.add_argument("--port", type = int, default = 8765)
+        parser.add_argument("--concurrency", type = int, default = 100, help = "Clients concurrents.")
+        parser.add_argument("--duration", type = float, default = 10, help = "Segons de càrrega per servidor.")
+        parser.add_argument("--fingerprints", type = int, default = 50, help = "Formularis de prova a crear.")
+
+    def handle(self, *args, **options):
+        fingerprints = [f"{FINGERPRINT_PREFIX}{index}" for index in range(options["fingerprints"])]
+        for fingerprint_id in fingerprints: # save() crea el formulari complet de cada fingerprint
+            UserFingerprint.objects.get_or_create(fingerprint_id = fingerprint_id)
+
+        try:
+            self.stdout.write(f"{'server':<6} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+            for server in options["servers"]:
+                command = options[f"{server}_command"].format(workers = options["workers"], port = options["port"])
+                paths = [endpoint.format(fp = fingerprint_id) for fingerprint_id in fingerprints for endpoint in ENDPOINTS[server]]
+                self.stdout.write(self.format_row(server, *self.run_server(command, options, paths)))
+        finally:
+            UserFingerprint.objects.filter(fingerprint_id__startswith = FINGERPRINT_PREFIX).delete()
+
+    def run_server(self, command, options, paths):
+        try:
+            process = subprocess.Popen(shlex.split(command), stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+        except FileNotFoundError as e:
+            raise CommandError(f"Cannot start '{command}': {e}")
+        try:
+            wait_for_port(options["port"], process)
+            return asyncio.run(run_load(options["port"], paths, options["concurrency"], options["duration"]))
+        finally:
+            process.terminate()
+            process.wait()
+
+    def format_row(self, server, latencies, errors, elapsed):
+        if not latencies:
+            return f"{server:<6} {0:>9} {errors:>7} {'-':>9} {'-':>8} {'-':>8} {'-':>8}"
+        percentiles = statistics.quantiles(latencies, n = 100) if len(latencies) > 1 else latencies * 99
+        return (
+            f"{server:<6} {len(latencies):>9} {errors:>7} {len(latencies) / elapsed:>9.1f} "
+            f"{percentiles[49] * 1000:>8.1f} {percentiles[94] * 1000:>8.1f} {percentiles[98] * 1000:>8.1f}"
+        )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from processdata.bundle import write_question_bundle
+
+
+class Command(BaseCommand):
+    help = "Genera el paquet JS amb les preguntes pre-renderitzades de l'avaluador (nom amb hash del contingut). Executar abans de collectstatic."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--directory", help = "Directori base dels estàtics. Per defecte, el primer de STATICFILES_DIRS.")
+
+    def handle(self, *args, **options):
+        path = write_question_bundle(options["directory"])
+        self.stdout.write(path)
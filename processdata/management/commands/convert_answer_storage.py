@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from processdata.storage import copy_documents_to_tables, copy_tables_to_documents
+
+
+class Command(BaseCommand):
+    help = "Copia les respostes desades entre les taules de subdimensió i els documents JSON (settings.ANSWER_STORAGE)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--to", choices = ["documents", "tables"], required = True, help = "Backend de destinació.")
+
+    def handle(self, *args, **options):
+        if options["to"] == "documents":
+            count = copy_tables_to_documents()
+            self.stdout.write(f"{count} documents created. Set ANSWER_STORAGE BACKEND to processdata.storage.DocumentStorage.")
+        else:
+            count = copy_documents_to_tables()
+            self.stdout.write(f"{count} documents copied to tables. Set ANSWER_STORAGE BACKEND to processdata.storage.TableStorage.")
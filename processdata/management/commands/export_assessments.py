@@ -0,0 +1,38 @@
+import logging
+from django.core.management.base import BaseCommand, CommandError
+from processdata.export import EXPORT_FORMATS, iter_assessments
+
+
+class Command(BaseCommand):
+    help = "Exporta tots els formularis (dades generals, respostes i puntuacions per secció) en CSV o JSONL, amb memòria constant."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices = list(EXPORT_FORMATS), default = "jsonl")
+        parser.add_argument("--output", help = "Fitxer de sortida. Per defecte, la sortida estàndard.")
+        parser.add_argument("--chunk-size", type = int, default = 500, help = "Formularis per bloc de lectura.")
+
+    def handle(self, *args, **options):
+        # Els calculadors registren cada pas en DEBUG: en l'exportació només interessen els errors.
+        logging.getLogger("processdata.rating").setLevel(logging.WARNING)
+
+        try:
+            output = open(options["output"], "w", encoding = "utf-8", newline = "") if options["output"] else None
+        except OSError as e:
+            raise CommandError(e)
+
+        to_lines, _ = EXPORT_FORMATS[options["format"]]
+        try:
+            write = output.write if output else lambda line: self.stdout.write(line, ending = "")
+            for line in to_lines(self.count(iter_assessments(chunk_size = options["chunk_size"]))):
+                write(line)
+        finally:
+            if output:
+                output.close()
+
+        self.stderr.write(f"{self.exported} assessments exported")
+
+    def count(self, records):
+        self.exported = 0
+        for record in records:
+            self.exported += 1
+            yield record
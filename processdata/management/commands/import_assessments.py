@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from processdata.importer import ImportStats, import_assessments, read_import_records
+
+
+class Command(BaseCommand):
+    help = "Importa avaluacions d'un fitxer JSONL/CSV de respostes (per input_id) amb insercions per lots, validant-les contra el JSON de preguntes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help = "Fitxer d'entrada (.jsonl o .csv). Admet el format de sortida de export_assessments.")
+        parser.add_argument("--input-format", choices = ["jsonl", "csv"], help = "Format d'entrada. Per defecte, segons l'extensió.")
+        parser.add_argument("--chunk-size", type = int, default = 500, help = "Avaluacions per transacció.")
+        parser.add_argument("--max-errors", type = int, default = 20, help = "Errors de validació que es mostren.")
+
+    def handle(self, *args, **options):
+        input_format = options["input_format"] or ("csv" if options["input"].endswith(".csv") else "jsonl")
+        stats = ImportStats()
+
+        try:
+            import_assessments(read_import_records(options["input"], input_format), chunk_size = options["chunk_size"], stats = stats)
+        except OSError as e:
+            raise CommandError(e)
+        except ValueError as e: # Fitxer mal format (ex: línia JSON no vàlida)
+            raise CommandError(f"Invalid input after {stats.read} rows: {e}")
+
+        for line_number, message in stats.errors[:options["max_errors"]]:
+            self.stderr.write(f"Line {line_number}: {message}")
+        if len(stats.errors) > options["max_errors"]:
+            self.stderr.write(f"... {len(stats.errors) - options['max_errors']} more errors")
+        self.stdout.write(str(stats))
@@ -0,0 +1,25 @@
+import logging
+from django.core.management.base import BaseCommand
+from processdata.models import Form
+from processdata.snapshots import get_outdated_forms, refresh_result_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula les instantànies de resultats de l'API (/api/results/<fingerprint>/). Per defecte, només les que "
+        "falten o estan desactualitzades (respostes o configuració més noves)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action = "store_true", help = "Recalcula totes les instantànies.")
+
+    def handle(self, *args, **options):
+        logging.getLogger("processdata.rating").setLevel(logging.WARNING) # els calculadors registren cada pas en DEBUG
+
+        forms = Form.objects.all() if options["all"] else get_outdated_forms()
+
+        count = 0
+        for fingerprint_id in forms.values_list("fingerprint__fingerprint_id", flat = True).iterator():
+            if refresh_result_snapshot(fingerprint_id) is not None:
+                count += 1
+        self.stdout.write(f"{count} result snapshots refreshed")
@@ -0,0 +1,27 @@
+import logging
+from django.core.management.base import BaseCommand, CommandError
+from processdata.scheduler import get_jobs, run_due_jobs, run_scheduler
+
+
+class Command(BaseCommand):
+    help = "Executa les tasques periòdiques (neteja d'usuaris inactius, instantànies de resultats, adreces pendents) en un procés dedicat."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action = "store_true", help = "Executa les tasques pendents una sola vegada i acaba.")
+        parser.add_argument("--job", action = "append", default = [], help = "Executa aquesta tasca ara, encara que no li toqui (es pot repetir). Implica --once.")
+
+    def handle(self, *args, **options):
+        logging.getLogger("processdata.rating").setLevel(logging.WARNING) # els calculadors registren cada pas en DEBUG
+        unknown = set(options["job"]) - set(get_jobs())
+        if unknown:
+            raise CommandError(f"Unknown jobs: {', '.join(sorted(unknown))}. Available: {', '.join(get_jobs())}")
+
+        if options["once"] or options["job"]:
+            for run in run_due_jobs(force = options["job"]):
+                self.stdout.write(f"{run.job}: {run.rows} rows in {run.duration:.2f}s ({run.status}){' ' + run.error if run.error else ''}")
+            return
+
+        try:
+            run_scheduler()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,20 @@
+import logging
+from django.core.management.base import BaseCommand, CommandError
+from processdata.tasks import get_task_queue_config, run_workers
+
+
+class Command(BaseCommand):
+    help = "Executa les tasques en segon pla de la cua (model Task) amb N workers. Es poden iniciar diversos processos alhora."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type = int, default = None, help = "Fils de treball. Per defecte, TASK_QUEUE['WORKERS'].")
+        parser.add_argument("--burst", action = "store_true", help = "Executa les tasques pendents i acaba quan la cua és buida.")
+
+    def handle(self, *args, **options):
+        workers = options["workers"] or get_task_queue_config()["WORKERS"]
+        if workers < 1:
+            raise CommandError("--workers must be at least 1")
+        logging.getLogger("processdata.rating").setLevel(logging.WARNING) # els calculadors registren cada pas en DEBUG
+
+        count = run_workers(workers, burst = options["burst"])
+        self.stdout.write(f"{count} tasks executed by {workers} workers")
@@ -0,0 +1,73 @@
+import csv
+import json
+import logging
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from processdata.rating.batch import BatchStats, SECTIONS, score_batch
+
+
+def read_records(path, input_format):
+    """
+    Llegeix de manera incremental els conjunts de respostes d'un fitxer JSONL o CSV.
+
+    - JSONL: una línia per avaluació, {"id": ..., "answers": {input_id: valor}} o bé {"id": ..., input_id: valor, ...}.
+    - CSV: una fila per avaluació, amb una columna `id` i una columna per a cada `input_id`.
+    """
+    with open(path, "r", encoding = "utf-8", newline = "") as file:
+        if input_format == "csv":
+            for row in csv.DictReader(file):
+                record_id = row.pop("id", None)
+                yield {"id": record_id, "answers": row}
+        else:
+            for line in file:
+                if line.strip():
+                    record = json.loads(line)
+                    if "answers" not in record:
+                        record = {"id": record.pop("id", None), "answers": record}
+                    yield record
+
+
+class Command(BaseCommand):
+    help = "Avalua per lots un fitxer JSONL/CSV de respostes i escriu les puntuacions (total, dimensions i seccions) en JSONL o CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help = "Fitxer d'entrada (.jsonl o .csv)")
+        parser.add_argument("--input-format", choices = ["jsonl", "csv"], help = "Format d'entrada. Per defecte, segons l'extensió.")
+        parser.add_argument("--output", help = "Fitxer de sortida. Per defecte, la sortida estàndard.")
+        parser.add_argument("--output-format", choices = ["jsonl", "csv"], default = "jsonl")
+        parser.add_argument("--workers", type = int, default = None, help = "Nombre de processos (per defecte, tots els nuclis).")
+        parser.add_argument("--chunksize", type = int, default = 100, help = "Avaluacions per bloc enviat a cada procés.")
+
+    def handle(self, *args, **options):
+        input_format = options["input_format"] or ("csv" if options["input"].endswith(".csv") else "jsonl")
+        # Els calculadors registren cada pas en DEBUG: en lots només interessen els errors.
+        logging.getLogger("processdata.rating").setLevel(logging.WARNING)
+
+        try:
+            records = read_records(options["input"], input_format)
+            output = open(options["output"], "w", encoding = "utf-8", newline = "") if options["output"] else sys.stdout
+        except OSError as e:
+            raise CommandError(e)
+
+        stats = BatchStats()
+        results = score_batch(records, workers = options["workers"], chunksize = options["chunksize"], stats = stats)
+
+        try:
+            if options["output_format"] == "csv":
+                writer = csv.writer(output)
+                writer.writerow(["id", "rating_total", "nrating_total", "socioeconomic", "environment", *SECTIONS, "error"])
+                for result in results:
+                    dimensions, sections = result.get("dimensions", {}), result.get("sections", {})
+                    writer.writerow([
+                        result["id"], result.get("rating_total"), result.get("nrating_total"),
+                        dimensions.get("socioeconomic"), dimensions.get("environment"),
+                        *[sections.get(section) for section in SECTIONS], result.get("error")
+                    ])
+            else:
+                for result in results:
+                    output.write(json.dumps(result, ensure_ascii = False) + "\n")
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+        self.stderr.write(str(stats))
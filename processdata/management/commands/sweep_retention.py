@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from processdata.retention import SweepStats, get_expired_users, get_retention_config, sweep_expired_with_memory
+
+
+class Command(BaseCommand):
+    help = "Elimina per blocs els usuaris inactius i els seus formularis (substitueix clean_bd). Es pot executar amb el lloc web en marxa i reprendre."
+
+    def add_arguments(self, parser):
+        config = get_retention_config()
+        parser.add_argument("--days", type = int, default = config["DAYS"], help = "Dies d'inactivitat (last_seen) a partir dels quals s'eliminen els usuaris.")
+        parser.add_argument("--batch-size", type = int, default = config["BATCH_SIZE"], help = "Usuaris per bloc (una transacció per bloc).")
+        parser.add_argument("--sleep", type = float, default = config["SLEEP"], help = "Segons d'espera entre blocs.")
+        parser.add_argument("--start-after", type = int, default = 0, help = "Clau primària a partir de la qual es continua.")
+        parser.add_argument("--max-batches", type = int, help = "Blocs màxims d'aquesta execució.")
+        parser.add_argument("--dry-run", action = "store_true", help = "Només compta els usuaris que s'eliminarien.")
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            self.stdout.write(f"{get_expired_users(options['days']).count()} users inactive for more than {options['days']} days")
+            return
+
+        stats = SweepStats()
+        try:
+            sweep_expired_with_memory(
+                days = options["days"], batch_size = options["batch_size"], sleep = options["sleep"],
+                start_after = options["start_after"], max_batches = options["max_batches"], stats = stats
+            )
+        except KeyboardInterrupt:
+            self.stderr.write(f"Interrupted. Resume with --start-after {stats.last_pk}")
+        self.stdout.write(str(stats))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-17 11:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processdata', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='overview',
+            name='mine_address',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.2 on 2026-10-17 11:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Subdimensions existents en aquesta migració -> dimensió. Còpia fixa: no depèn del JSON de preguntes actual.
+SECTION_DIMENSIONS = {
+    "LocalProcurement": "socioeconomic", "LocalExpediture": "socioeconomic", "InfraestructureCreation": "socioeconomic",
+    "ValueChain": "socioeconomic", "EconomicDisturbance": "socioeconomic", "AdditionalInvolvement": "socioeconomic",
+    "ClosureProcess": "socioeconomic",
+    "Energy": "environment", "Tailings": "environment", "Waste": "environment", "Water": "environment", "Air": "environment",
+    "LandformChanges": "environment", "Biodiversity": "environment", "Subsidence": "environment",
+    "PositiveEnvironmental": "environment", "EnvironmentalLiabilities": "environment",
+}
+
+
+def get_field_names(model_class):
+    # Columnes pròpies del model històric (preguntes), sense la clau primària
+    return [field.attname for field in model_class._meta.local_concrete_fields if not field.primary_key]
+
+
+def forwards(apps, schema_editor):
+    # Només es copien les respostes si el backend configurat és el de documents (veure settings.ANSWER_STORAGE).
+    # La còpia només utilitza els models històrics: no depèn de processdata.storage ni del JSON de preguntes.
+    from django.conf import settings
+    if not getattr(settings, "ANSWER_STORAGE", {}).get("BACKEND", "").endswith("DocumentStorage"):
+        return
+
+    Document = apps.get_model("processdata", "DimensionDocument")
+    documents = {} # (form_id, dimensió) -> {ID de la subdimensió: valors}
+    for section_id, dimension in SECTION_DIMENSIONS.items():
+        Model = apps.get_model("processdata", section_id)
+        for row in Model.objects.values("pk", *get_field_names(Model)).iterator():
+            form_id = row.pop("pk")
+            documents.setdefault((form_id, dimension), {})[section_id] = row
+
+    Document.objects.bulk_create(
+        [Document(form_id = form_id, dimension = dimension, answers = answers) for (form_id, dimension), answers in documents.items()],
+        batch_size = 500
+    )
+
+
+def backwards(apps, schema_editor):
+    # Abans d'eliminar la taula de documents es tornen a copiar les respostes a les taules de subdimensió
+    Document = apps.get_model("processdata", "DimensionDocument")
+    for document in Document.objects.iterator():
+        for section_id, values in document.answers.items():
+            if section_id not in SECTION_DIMENSIONS:
+                continue
+            Model = apps.get_model("processdata", section_id)
+            field_names = set(get_field_names(Model))
+            defaults = {field: value for field, value in values.items() if field in field_names}
+            Model.objects.update_or_create(subform_id = document.form_id, defaults = defaults)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processdata', '0002_overview_mine_address'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DimensionDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('socioeconomic', 'socioeconomic'), ('environment', 'environment')], max_length=20)),
+                ('answers', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('form', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='documents', to='processdata.form')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('form', 'dimension'), name='unique_dimension_document')],
+            },
+        ),
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-17 11:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processdata', '0003_dimensiondocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='form',
+            name='revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.2 on 2026-10-17 11:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processdata', '0004_form_revision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultSnapshot',
+            fields=[
+                ('form', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='result_snapshot', serialize=False, to='processdata.form')),
+                ('revision', models.PositiveIntegerField()),
+                ('config_version', models.CharField(max_length=12)),
+                ('scores', models.JSONField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
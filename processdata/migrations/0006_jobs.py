@@ -0,0 +1,37 @@
+# Generated by Django 5.2.2 on 2026-10-17 12:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processdata', '0005_resultsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobLock',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('owner', models.CharField(max_length=100)),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='JobRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job', models.CharField(max_length=100)),
+                ('owner', models.CharField(max_length=100)),
+                ('started_at', models.DateTimeField()),
+                ('duration', models.FloatField()),
+                ('rows', models.PositiveIntegerField(default=0)),
+                ('status', models.CharField(choices=[('ok', 'ok'), ('error', 'error')], max_length=10)),
+                ('error', models.TextField(blank=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['job', '-started_at'], name='jobrun_job_started')],
+            },
+        ),
+    ]
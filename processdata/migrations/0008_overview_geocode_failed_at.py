@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-17 12:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processdata', '0007_tasks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='overview',
+            name='geocode_failed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
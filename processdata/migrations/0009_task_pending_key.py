@@ -0,0 +1,28 @@
+# Generated by Django 5.2.2 on 2026-10-17 12:32
+
+from django.db import migrations, models
+
+
+def fail_duplicate_pending_tasks(apps, schema_editor):
+    # Tasques pendents repetides encuades abans de la restricció: es conserva la primera de cada clau
+    Task = apps.get_model("processdata", "Task")
+    seen = set()
+    for pk, key in Task.objects.filter(key__isnull = False, status__in = ("queued", "running")).order_by("pk").values_list("pk", "key"):
+        if key in seen:
+            Task.objects.filter(pk = pk).update(status = "failed", last_error = "Duplicate key")
+        seen.add(key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processdata', '0008_overview_geocode_failed_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicate_pending_tasks, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='task',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ('queued', 'running'))), fields=('key',), name='task_pending_key'),
+        ),
+    ]
@@ -1,7 +1,9 @@
 from django.db import models
 from django.apps import apps
-from django.db import transaction
+from django.conf import settings
+from django.db import transaction, connections, router
 from .data import SOCIOECONOMIC_DIMENSION_QUESTIONS, ENVIRONMENT_DIMENSION_QUESTIONS
+import inspect
 import json
 
 class UserFingerprint(models.Model):
@@ -15,28 +17,7 @@ class UserFingerprint(models.Model):
 
         if is_new: 
             try:
-                with transaction.atomic(): # totes les consultes s'executen en una sola transacció
-                    # Es fan instancies dels models...
-                    form = Form.objects.create(fingerprint = self)
-                    # OVERVIEW
-                    Overview.objects.create(form = form)
-
-                    # Crear SocioeconomicDimension + subformularis
-                    socioeconomic_dimension = SocioeconomicDimension.objects.create(form=form)
-
-                    for subdimension in SOCIOECONOMIC_DIMENSION_QUESTIONS:
-                        model_name = subdimension["id"]
-                        model_class = apps.get_model(self._meta.app_label, model_name)
-                        model_class.objects.create(subform=socioeconomic_dimension)
-
-                    # Crear EnvironmentDimension + subformularis
-                    environment_dimension = EnvironmentDimension.objects.create(form=form)
-
-                    for subdimension in ENVIRONMENT_DIMENSION_QUESTIONS:
-                        model_name = subdimension["id"]
-                        model_class = apps.get_model(self._meta.app_label, model_name)
-                        model_class.objects.create(subform=environment_dimension)
-
+                create_forms([self]) # totes les consultes s'executen en una sola transacció
             except Exception as e:
                 print("Error creating form and subforms: ", e)
 
@@ -47,6 +28,7 @@ class UserFingerprint(models.Model):
 class Form(models.Model):
     fingerprint = models.ForeignKey(UserFingerprint, on_delete = models.CASCADE)  # Relació amb l'usuari  
     created_at = models.DateTimeField(auto_now_add = True)  # Data de creació del formulari
+    revision = models.PositiveIntegerField(default = 0)  # Versió de les respostes: s'incrementa a cada desat (veure /sync/)
 
     def __str__(self):
         return f"Form {self.fingerprint.fingerprint_id}"
@@ -71,6 +53,8 @@ class Overview(SubForm):
     project_name = models.TextField(blank = True, null = True)
     company_name = models.TextField(blank = True, null = True)
     mine_ubication = models.CharField(max_length=100, blank=True, null=True) 
+    mine_address = models.TextField(blank = True, null = True) # Adreça resolta a partir de mine_ubication (geocodificació inversa)
+    geocode_failed_at = models.DateTimeField(blank = True, null = True) # Últim intent fallit de resoldre l'adreça (veure jobs.geocode_backfill)
     phase = models.TextField(blank = True, null = True)
 
     def __str__(self):
@@ -170,4 +154,223 @@ class EnvironmentDimension(SubForm):
 # Creació dinàmica de les subdimensions de la dimensió ambiental
 for subdimension in ENVIRONMENT_DIMENSION_QUESTIONS:
     reference = subdimension["id"] # ID com a nom del model
-    globals()[reference] = build_subsubform_model(reference, SubSubForm, subdimension["questions"])
\ No newline at end of file
+    globals()[reference] = build_subsubform_model(reference, SubSubForm, subdimension["questions"])
+
+
+#-------------------------------------------------------------------
+#              EMMAGATZEMATGE EN DOCUMENT JSON (opcional)
+#-------------------------------------------------------------------
+
+class DimensionDocument(models.Model):
+    """
+    Respostes d'una dimensió d'un formulari en un únic document JSON (veure `processdata.storage.DocumentStorage`).
+
+    answers: {ID de la subdimensió: {input_id: valor}}, amb els valors en el mateix format que les columnes dels models de subdimensió.
+    """
+    DIMENSIONS = [("socioeconomic", "socioeconomic"), ("environment", "environment")]
+
+    form = models.ForeignKey(Form, on_delete = models.CASCADE, related_name = "documents")
+    dimension = models.CharField(max_length = 20, choices = DIMENSIONS)
+    answers = models.JSONField(default = dict)
+    updated_at = models.DateTimeField(auto_now = True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields = ["form", "dimension"], name = "unique_dimension_document")]
+
+    def __str__(self):
+        return f"{self.dimension} document for Form {self.form_id}"
+
+
+class ResultSnapshot(models.Model):
+    """
+    Últim resultat calculat d'un formulari (veure `processdata.snapshots`), en format numèric
+    (`calculate_rating(..., render = False)`). Es recalcula a la cua de tasques després de cada desat de respostes.
+
+    revision: versió de les respostes (Form.revision) a partir de la qual s'ha calculat.
+    config_version: versió de la configuració de preguntes i resultats (CONFIG_VERSION) amb què s'ha calculat.
+    """
+    form = models.OneToOneField(Form, on_delete = models.CASCADE, primary_key = True, related_name = "result_snapshot")
+    revision = models.PositiveIntegerField()
+    config_version = models.CharField(max_length = 12)
+    scores = models.JSONField()
+    updated_at = models.DateTimeField(auto_now = True)
+
+    def __str__(self):
+        return f"Result snapshot for Form {self.form_id} (revision {self.revision})"
+
+
+class JobLock(models.Model):
+    """
+    Bloqueig d'una tasca periòdica (veure `processdata.scheduler`): només el procés `owner` la pot executar fins a `expires_at`.
+    """
+    name = models.CharField(max_length = 100, primary_key = True)
+    owner = models.CharField(max_length = 100)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} locked by {self.owner}"
+
+
+class JobRun(models.Model):
+    """
+    Execució d'una tasca periòdica (veure `processdata.scheduler`): durada, files tractades i resultat.
+    """
+    STATUS = [("ok", "ok"), ("error", "error")]
+
+    job = models.CharField(max_length = 100)
+    owner = models.CharField(max_length = 100)
+    started_at = models.DateTimeField()
+    duration = models.FloatField() # segons
+    rows = models.PositiveIntegerField(default = 0)
+    status = models.CharField(max_length = 10, choices = STATUS)
+    error = models.TextField(blank = True)
+
+    class Meta:
+        indexes = [models.Index(fields = ["job", "-started_at"], name = "jobrun_job_started")]
+
+    def __str__(self):
+        return f"{self.job} at {self.started_at} ({self.status})"
+
+
+class Task(models.Model):
+    """
+    Tasca en segon pla de la cua (veure `processdata.tasks`): nom de la funció registrada, paràmetres i estat.
+    Un worker la reserva (`running`) fins a `locked_until`; si falla es torna a programar a `run_at` amb espera exponencial.
+    """
+    STATUS = [("queued", "queued"), ("running", "running"), ("done", "done"), ("failed", "failed")]
+
+    name = models.CharField(max_length = 100)
+    payload = models.JSONField(default = dict) # paràmetres de la funció
+    key = models.CharField(max_length = 200, null = True, blank = True) # evita encuar dues vegades la mateixa feina pendent
+    status = models.CharField(max_length = 10, choices = STATUS, default = "queued")
+    run_at = models.DateTimeField() # no s'executa abans d'aquesta hora
+    attempts = models.PositiveIntegerField(default = 0)
+    max_attempts = models.PositiveIntegerField(default = 5)
+    locked_by = models.CharField(max_length = 100, blank = True)
+    locked_until = models.DateTimeField(null = True, blank = True)
+    last_error = models.TextField(blank = True)
+    created_at = models.DateTimeField(auto_now_add = True)
+    finished_at = models.DateTimeField(null = True, blank = True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields = ["status", "run_at"], name = "task_status_run_at"),
+            models.Index(fields = ["key"], name = "task_key"),
+        ]
+        constraints = [ # una sola tasca pendent o en execució per clau, encara que dos processos l'encuïn alhora
+            models.UniqueConstraint(fields = ["key"], condition = models.Q(status__in = ("queued", "running")), name = "task_pending_key"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+
+#-------------------------------------------------------------------
+#                   CREACIÓ DEL FORMULARI COMPLET
+#-------------------------------------------------------------------
+
+def get_subdimension_models():
+    """
+    Retorna els models de totes les subdimensions (socioeconòmiques i ambientals), en l'ordre del JSON de preguntes.
+    """
+    return [apps.get_model("processdata", subdimension["id"]) for subdimension in SOCIOECONOMIC_DIMENSION_QUESTIONS + ENVIRONMENT_DIMENSION_QUESTIONS]
+
+def has_bulk_insert_api():
+    """
+    Indica si `QuerySet._insert` (API interna de Django, sense garantia d'estabilitat) accepta els paràmetres que
+    utilitza `insert_children`. Verificat amb Django 5.2; el test `test_bulk_insert_api` falla si una actualització el canvia.
+    """
+    try:
+        parameters = inspect.signature(models.QuerySet._insert).parameters
+    except (AttributeError, TypeError, ValueError):
+        return False
+    return {"objs", "fields", "using"} <= set(parameters)
+
+BULK_INSERT_API = has_bulk_insert_api()
+
+def insert_children(model_class, objs):
+    """
+    Insereix les files pròpies d'un model fill (herència multi-taula) amb una consulta per lot.
+
+    `bulk_create` no admet models amb herència multi-taula, però aquí la fila del pare ja existeix i comparteix la
+    clau primària, de manera que només cal inserir les columnes locals del fill (sense les consultes prèvies de `save()`).
+
+    Depèn d'una API interna de Django (`QuerySet._insert`, la que fa servir `bulk_create`). Si la seva signatura
+    canvia (veure `has_bulk_insert_api`), les files s'insereixen una a una amb `save_base(raw = True)`, com `loaddata`:
+    també només la taula del fill, però amb una consulta per fila.
+
+    :param model_class (Model): model fill. Ex: Overview, LocalProcurement.
+    :param objs (list(Model)): instàncies amb el punter al pare (clau primària) assignat.
+    """
+    using = router.db_for_write(model_class)
+    if not BULK_INSERT_API:
+        for obj in objs:
+            obj.save_base(raw = True, force_insert = True, using = using)
+        return
+    fields = model_class._meta.local_concrete_fields
+    batch_size = max(connections[using].ops.bulk_batch_size(fields, objs), 1)
+    for start in range(0, len(objs), batch_size):
+        model_class._base_manager._insert(objs[start:start + batch_size], fields = fields, using = using)
+
+def create_forms(fingerprints, overviews = None, answers = None):
+    """
+    Crea el formulari complet de cada fingerprint: Form, Overview, les dues dimensions i totes les subdimensions.
+
+    Es fa una sola inserció per taula per a tots els fingerprints (en lloc d'una inserció i les comprovacions
+    de `save()` per a cada instància), dins d'una única transacció.
+
+    Amb `settings.LAZY_SUBDIMENSIONS` les subdimensions no es creen: cada fila es crea la primera vegada que es desa la seva secció.
+    Tampoc es creen si les respostes es desen en documents JSON (`settings.ANSWER_STORAGE`).
+
+    Opcionalment, els formularis es poden crear amb dades inicials (importació, veure `processdata.importer`): les files es
+    creen directament amb els valors, sense actualitzacions posteriors. En mode LAZY_SUBDIMENSIONS només es creen les files de
+    les subdimensions amb respostes, i amb DocumentStorage un document per dimensió amb respostes.
+
+    :param fingerprints (list(UserFingerprint)): usuaris ja desats.
+    :param overviews (list(dict)): valors de les columnes de l'Overview de cada fingerprint (mateix ordre). Opcional.
+    :param answers (list(dict)): respostes netes {ID de la subdimensió: {input_id: valor}} de cada fingerprint (mateix ordre). Opcional.
+    :return (list(Form)): formularis creats.
+    """
+    from .storage import SECTION_DIMENSIONS, get_storage # evita la importació circular (storage depèn dels models)
+
+    overviews = overviews or [{}] * len(fingerprints)
+    answers = answers or [{}] * len(fingerprints)
+
+    with transaction.atomic():
+        if connections[router.db_for_write(Form)].features.can_return_rows_from_bulk_insert:
+            forms = Form.objects.bulk_create([Form(fingerprint = fingerprint) for fingerprint in fingerprints])
+        else: # Sense suport per recuperar les claus primàries d'una inserció múltiple
+            forms = [Form.objects.create(fingerprint = fingerprint) for fingerprint in fingerprints]
+
+        # Overview i dimensions comparteixen la fila de SubForm (clau primària = form_id)
+        SubForm.objects.bulk_create([SubForm(form = form) for form in forms])
+        insert_children(Overview, [Overview(form_id = form.pk, subform_ptr_id = form.pk, **values) for form, values in zip(forms, overviews)])
+        for model_class in (SocioeconomicDimension, EnvironmentDimension):
+            insert_children(model_class, [model_class(form_id = form.pk, subform_ptr_id = form.pk) for form in forms])
+
+        if not get_storage().CREATE_ROWS:
+            documents = []
+            for form, form_answers in zip(forms, answers):
+                grouped = {}
+                for section_id, values in form_answers.items():
+                    grouped.setdefault(SECTION_DIMENSIONS[section_id], {})[section_id] = values
+                documents += [DimensionDocument(form = form, dimension = dimension, answers = sections) for dimension, sections in grouped.items()]
+            DimensionDocument.objects.bulk_create(documents)
+            return forms
+
+        lazy = getattr(settings, "LAZY_SUBDIMENSIONS", False)
+        if lazy and not any(answers):
+            return forms
+
+        # Totes les subdimensions comparteixen la fila de SubSubForm (clau primària = form_id)
+        rows = [(form, form_answers) for form, form_answers in zip(forms, answers) if not lazy or form_answers]
+        SubSubForm.objects.bulk_create([SubSubForm(subform_id = form.pk) for form, _ in rows])
+        for model_class in get_subdimension_models():
+            section_id = model_class.__name__
+            insert_children(model_class, [
+                model_class(subform_id = form.pk, subsubform_ptr_id = form.pk, **form_answers.get(section_id, {}))
+                for form, form_answers in rows if not lazy or section_id in form_answers
+            ])
+
+    return forms
@@ -0,0 +1,128 @@
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from .calculate import calculate_rating, indicators_handlers
+
+logger = logging.getLogger(__name__)
+
+# Seccions avaluables (ordre fix per a les columnes de sortida)
+SECTIONS = [section for handlers in indicators_handlers.values() for section in handlers]
+
+
+class BatchStats:
+    """
+    Estadístiques d'una execució per lots: avaluacions processades, errors i rendiment (avaluacions/segon).
+    """
+    def __init__(self):
+        self.count, self.errors = 0, 0
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def throughput(self):
+        return self.count / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        return f"{self.count} assessments ({self.errors} errors) in {self.elapsed:.2f}s - {self.throughput:.1f} assessments/sec"
+
+
+def summarize_rating(scores):
+    """
+    Redueix el resultat numèric de `calculate_rating(render = False)` a les puntuacions en el mateix format que la
+    vista de resultats ("puntuació/màxim"): total, total normalitzat, total per dimensió i per secció.
+
+    :param scores (dict): sortida de `calculate_rating(form_answers, render = False)`.
+    """
+    summary = {
+        "rating_total": f"{scores['rating']}/{scores['out_of']}",
+        "nrating_total": f"{scores['nrating']}/100",
+        "dimensions": {},
+        "sections": {}
+    }
+    for dimension in indicators_handlers:
+        if dimension in scores:
+            summary["dimensions"][dimension] = f"{scores[dimension]['rating']}/{scores[dimension]['out_of']}"
+            for section, content in scores[dimension]["result"].items():
+                summary["sections"][section] = f"{content['rating']}/{content['out_of']}"
+    return summary
+
+
+def score_record(record):
+    """
+    Avalua un conjunt de respostes i retorna el resum de puntuacions.
+
+    :param record (dict): {"id": identificador, "answers": {input_id: valor}}.
+    :return (dict): resum de puntuacions amb l'identificador, o {"id", "error"} si les respostes no són vàlides.
+    """
+    from ..answers import get_results_from_answers # requereix el registre d'apps de Django carregat
+
+    record_id = record.get("id")
+    try:
+        form_answers = get_results_from_answers(record.get("answers", {}))
+        return {"id": record_id, **summarize_rating(calculate_rating(form_answers, render = False))}
+    except Exception as e:
+        return {"id": record_id, "error": str(e)}
+
+
+def _score_chunk(records):
+    return [score_record(record) for record in records]
+
+
+def _init_worker():
+    """
+    Inicialitza cada procés del pool: configura Django (necessari si els processos no es creen amb fork)
+    i redueix el nivell de log dels calculadors, que escriuen missatges DEBUG per a cada secció.
+    """
+    import django
+    django.setup()
+    logging.getLogger("processdata.rating").setLevel(logging.WARNING)
+
+
+def _chunks(records, size):
+    iterator = iter(records)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def score_batch(records, workers = None, chunksize = 100, stats = None):
+    """
+    Avalua molts conjunts de respostes utilitzant tots els nuclis disponibles.
+
+    Els registres es llegeixen de manera incremental i s'envien al pool de processos en blocs de `chunksize`,
+    mantenint com a màxim dos blocs pendents per procés, de manera que la memòria no depèn de la mida de l'entrada.
+    Els resultats es retornen en el mateix ordre que l'entrada.
+
+    :param records (iterable(dict)): registres {"id": ..., "answers": {input_id: valor}}.
+    :param workers (int): nombre de processos. None: tots els nuclis. 1: s'avalua al procés actual.
+    :param chunksize (int): registres per bloc enviat a cada procés.
+    :param stats (BatchStats): objecte on s'acumulen les estadístiques de l'execució (opcional).
+
+    :return (generator(dict)): resum de puntuacions per a cada registre (veure `summarize_rating`).
+    """
+    stats = stats if stats is not None else BatchStats()
+    workers = workers or os.cpu_count() or 1
+
+    def account(results):
+        for result in results:
+            stats.count += 1
+            stats.errors += "error" in result
+            yield result
+
+    if workers == 1:
+        for chunk in _chunks(records, chunksize):
+            yield from account(_score_chunk(chunk))
+        return
+
+    with ProcessPoolExecutor(max_workers = workers, initializer = _init_worker) as executor:
+        pending = []
+        for chunk in _chunks(records, chunksize):
+            pending.append(executor.submit(_score_chunk, chunk))
+            if len(pending) >= workers * 2: # Finestra limitada de blocs en curs
+                yield from account(pending.pop(0).result())
+        for future in pending:
+            yield from account(future.result())
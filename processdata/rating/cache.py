@@ -0,0 +1,147 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.utils.module_loading import import_string
+from ..data import CONFIG_VERSION
+
+logger = logging.getLogger(__name__)
+
+# Configuració per defecte (es pot sobreescriure amb RATING_CACHE a settings.py)
+DEFAULT_RATING_CACHE = {
+    "BACKEND": "processdata.rating.cache.LocalMemoryBackend",
+    "OPTIONS": {"MAX_ENTRIES": 256, "TIMEOUT": 3600},
+}
+
+#----------------------------------------------------------------
+#--------------------------- BACKENDS ---------------------------
+#----------------------------------------------------------------
+
+class LocalMemoryBackend:
+    """
+    Magatzem en memòria del procés amb expulsió LRU (menys utilitzat recentment) i caducitat (TTL).
+
+    :param MAX_ENTRIES (int): nombre màxim d'entrades. En superar-lo s'elimina la menys utilitzada.
+    :param TIMEOUT (int): segons de vida de cada entrada. None: no caduca mai.
+    """
+    def __init__(self, MAX_ENTRIES = 256, TIMEOUT = 3600):
+        self.max_entries = MAX_ENTRIES
+        self.timeout = TIMEOUT
+        self._data = OrderedDict() # clau -> (instant de caducitat, valor)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < time.monotonic(): # Entrada caducada
+                del self._data[key]
+                return None
+            self._data.move_to_end(key) # Marquem l'entrada com la més recent
+            return value
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.timeout if self.timeout is not None else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last = False) # Expulsem la menys utilitzada
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class DjangoCacheBackend:
+    """
+    Magatzem que delega en el framework de caché de Django (settings.CACHES), útil quan hi ha diversos processos.
+
+    :param ALIAS (str): àlies de la caché de Django a utilitzar.
+    :param TIMEOUT (int): segons de vida de cada entrada.
+    """
+    def __init__(self, ALIAS = "default", TIMEOUT = 3600):
+        from django.core.cache import caches
+        self.cache = caches[ALIAS]
+        self.timeout = TIMEOUT
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache.set(key, value, self.timeout)
+
+    def delete(self, key):
+        self.cache.delete(key)
+
+    def clear(self):
+        self.cache.clear()
+
+#----------------------------------------------------------------
+#------------------------ CACHÉ DE RESULTATS --------------------
+#----------------------------------------------------------------
+
+def get_answers_digest(form_answers):
+    """
+    Retorna un hash estable de les respostes (estructura de `get_results`) i de la versió dels fitxers de configuració.
+
+    :param form_answers (dict): respostes del formulari agrupades per dimensions i seccions.
+    """
+    payload = json.dumps(form_answers, sort_keys = True, default = str, ensure_ascii = False)
+    return hashlib.sha256(f"{CONFIG_VERSION}:{payload}".encode("utf-8")).hexdigest()
+
+
+class RatingCache:
+    """
+    Caché dels resultats de `calculate_rating`.
+
+    Les entrades es desen amb el hash de les respostes com a clau, de manera que dues avaluacions amb les mateixes
+    respostes comparteixen resultat. No cal invalidar res quan un usuari desa noves dades: les respostes noves tenen
+    un altre hash, i l'entrada anterior pot ser encara la d'altres usuaris (ex: tots els formularis buits). Les
+    entrades sense ús s'eliminen per LRU o caducitat. Una consulta trobada a la caché no hi escriu res.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get_or_calculate(self, fingerprint, form_answers, calculate):
+        """
+        Retorna el resultat desat per a aquestes respostes o el calcula i el desa si no existeix.
+
+        :param fingerprint (str): identificador de l'usuari (només per als registres).
+        :param form_answers (dict): respostes del formulari (sortida de `get_results`).
+        :param calculate (callable): funció de càlcul. Ex: calculate_rating
+        """
+        digest = get_answers_digest(form_answers) # Abans del càlcul: alguns calculadors modifiquen les respostes
+        ratings = self.backend.get(f"rating:{digest}")
+
+        if ratings is None:
+            logger.debug(f"CACHE - Miss per a {fingerprint}")
+            ratings = calculate(form_answers)
+            self.backend.set(f"rating:{digest}", ratings)
+        return ratings
+
+    def clear(self):
+        self.backend.clear()
+
+
+_rating_cache = None
+
+def get_rating_cache():
+    """
+    Retorna la instància de la caché de resultats configurada a settings.RATING_CACHE.
+    """
+    global _rating_cache
+    if _rating_cache is None:
+        config = getattr(settings, "RATING_CACHE", DEFAULT_RATING_CACHE)
+        backend_class = import_string(config["BACKEND"])
+        _rating_cache = RatingCache(backend_class(**config.get("OPTIONS", {})))
+    return _rating_cache
@@ -45,14 +45,45 @@ def create_section_dict(title, rating, section_result, info = None):
     return {"name": title, "rating_total": f"{rating}", "subsection_results": section_result}
 
 
-def calculate_rating(form_answers): 
+def create_score_dict(rating, out_of, cards = None):
+    """
+    Crea l'estructura de resultat numèrica (mode només puntuacions) per a una secció, dimensió o tarjeta.
+
+    :param rating(int): puntuació obtinguda.
+    :param out_of(int): puntuació màxima.
+    :param cards(dict): puntuació de cada tarjeta de la secció {ID: {"rating", "out_of"}}, si en té.
+    """
+    if cards is not None:
+        return {"rating": rating, "out_of": out_of, "cards": cards}
+    return {"rating": rating, "out_of": out_of}
+
+
+def calculate_rating(form_answers, render = True): 
     """
     Calcula el resultat de l'índex CSR a partir de les respostes del formulari.
 
     Aquest càlcul inclou:
       - El valor total agregat de totes les dimensions.
       - El valor de cada dimensió i subdimensió (secció).
-      - Informació HTML o contextual associada a cada resultat.
+      - Informació HTML o contextual associada a cada resultat (només si `render` és True).
+
+    Amb `render = False` no es genera cap contingut de presentació (HTML, textos, semàfors) i el resultat
+    només conté números, pensat per a càlculs per lots, APIs i comparacions:
+        {
+            "ambiental": {
+                "result": {
+                    "energia": {"rating": 7, "out_of": 10, "cards": {"ghg_reduction": {"rating": 4, "out_of": 5}, ...}},
+                    "aire": {"rating": -3, "out_of": 0},
+                    ...
+                },
+                "rating": 4,
+                "out_of": 10
+            },
+            ...
+            "rating": 12,
+            "out_of": 30,
+            "nrating": 54.5
+        }
 
     Args:
         form_answers (dict): Diccionari estructurat per dimensions i seccions.
@@ -68,6 +99,8 @@ def calculate_rating(form_answers):
                 ...
             }
 
+        render (bool): False per calcular només les puntuacions.
+
     Returns:
         dict: Diccionari amb tota l'estructura de resultats:
             {
@@ -91,7 +124,12 @@ def calculate_rating(form_answers):
     if not isinstance(form_answers, dict):
         logger.error("form_answers no és un diccionari.")
         return {}
- 
+
+    with rendering(render):
+        return _calculate_rating(form_answers, render)
+
+
+def _calculate_rating(form_answers, render):
     calculation_result = {}
 
     all_rating_total = []
@@ -125,8 +163,9 @@ def calculate_rating(form_answers):
 
             if not isinstance(res_ratings, bool):  # False quan no hi han valors de resposta
 
-                # Emmagatzemem resultat de la subdimensió
-                section_result.append({section: res_ratings})
+                if render:
+                    # Emmagatzemem resultat de la subdimensió
+                    section_result.append({section: res_ratings})
                 
                 if isinstance(res_ratings, dict): # Tarjetes (diccionari)
                     # Puntuació total de les tarjetes
@@ -140,7 +179,6 @@ def calculate_rating(form_answers):
                     section_rating_total.extend(ratings)
                     # Total de puntuació
                     all_ratings = sum(ratings) 
-                    rating_total = f"{all_ratings}/{out_of}"
                     
                 else: # Bloc únic (tupla)
                     section_rating_total.append(res_ratings)
@@ -148,16 +186,24 @@ def calculate_rating(form_answers):
                         out_of = 5
                     else: # Negatius
                         out_of = 0
-                    rating_total = f"{res_ratings}/{out_of}" 
+                    all_ratings = res_ratings
                 
                 # Emmagatzemem el resultat complet per a la secció d'aquesta dimensió
-                calculation_result[dimension]["result"][section] = create_section_dict(title, rating_total, section_result, info = extra_info)
+                if render:
+                    rating_total = f"{all_ratings}/{out_of}"
+                    calculation_result[dimension]["result"][section] = create_section_dict(title, rating_total, section_result, info = extra_info)
+                else:
+                    cards = {card: create_score_dict(content["rating"], content["out_of"]) for card, content in res_ratings.items()} if isinstance(res_ratings, dict) else None
+                    calculation_result[dimension]["result"][section] = create_score_dict(all_ratings, out_of, cards)
                 out_of_total += out_of
 
     
         # Puntuació total per a la dimensió        
         s_rating_total = sum(section_rating_total)
-        calculation_result[dimension]["rating_total"] = f"{s_rating_total}/{out_of_total}"
+        if render:
+            calculation_result[dimension]["rating_total"] = f"{s_rating_total}/{out_of_total}"
+        else:
+            calculation_result[dimension].update(create_score_dict(s_rating_total, out_of_total))
 
         # Emmagatzemem tots els resultats obtinguts per a la dimensió.
         all_rating_total.extend(section_rating_total)
@@ -165,7 +211,11 @@ def calculate_rating(form_answers):
     
 
     n_csr_rating_total, csr_rating_total = normalize_likert_score(all_out_of_total, all_rating_total)
-    calculation_result["rating_total"] = f"{csr_rating_total}/{all_out_of_total}"
-    calculation_result["nrating_total"] = f"{n_csr_rating_total}/100"
+    if render:
+        calculation_result["rating_total"] = f"{csr_rating_total}/{all_out_of_total}"
+        calculation_result["nrating_total"] = f"{n_csr_rating_total}/100"
+    else:
+        calculation_result.update(create_score_dict(csr_rating_total, all_out_of_total))
+        calculation_result["nrating"] = n_csr_rating_total
 
     return calculation_result
@@ -5,6 +5,107 @@ logger = logging.getLogger(__name__)
 
 DIM = 1  # Dimensió Ambiental
 
+# -----------------------------------------------------------------
+# ----------------TAULES DE REFERÈNCIA (PRECOMPILADES)-------------
+# -----------------------------------------------------------------
+
+# ENERGIA: Taula per defecte (Taula 12, 13 i 14)
+ENERGY_TABLES = {
+    "ghg_reduction": {
+        "table": DEFAULT_PERCENTAGE_TABLE, 
+        "sentence": "$value$ tècniques d’estalvi energètic implementades.",
+        "semaphore": POSITIVE_SEMAPHORE
+    },
+    "green_energy_sources": {
+        "table": DEFAULT_PERCENTAGE_TABLE, 
+        "sentence": "$value$ energia renovable utilitzada.",
+        "semaphore": POSITIVE_SEMAPHORE
+    },
+    "green_energy_fleet": {
+        "table": DEFAULT_PERCENTAGE_TABLE, 
+        "sentence": "$value$ flota amb energia verda.",
+        "semaphore": POSITIVE_SEMAPHORE
+    },
+}
+
+# RESIDUS DE PROCESSOS
+TAILINGS_TABLES = {
+    "price_increase": {
+        "table": {
+            "8-10 vegades més alt": 1,
+            "6-8 vegades més alt": 2,
+            "4-6 vegades més alt": 3,
+            "2-4 vegades més alt": 4,
+            "Fins a 2 vegades més alt":  5
+        },
+        "semaphore": POSITIVE_SEMAPHORE 
+    },
+    "other_tailing_usage" : {
+        "table": RatingTable({
+            (0, 9.99): 1,
+            (10, 19.99): 2,
+            (20, 34.99): 3,
+            (35, 49.99): 4,
+            (50, 100): 5,
+        }),
+        "sentence": "$value$ reutilització de residus miners",
+        "semaphore": POSITIVE_SEMAPHORE
+    },
+    "water_recovery_from_tailings": {
+        "table": DEFAULT_PERCENTAGE_TABLE,
+        "sentence": "$value$ recuperació d’aigua dels residus",
+        "semaphore": POSITIVE_SEMAPHORE
+    }
+}
+# Taules de percentatges (sense l'opció de preu, que es resol a part)
+TAILINGS_PERCENTAGE_TABLES = {key: value for key, value in TAILINGS_TABLES.items() if key != "price_increase"}
+
+# GESTIÓ DE RESIDUS
+WASTE_TABLES = {
+    "higher_waste_ratio": {"table": DEFAULT_PERCENTAGE_TABLE, "sentence": "$value$ excés de residus"},
+    "lower_waste_ratio": {"table": DEFAULT_PERCENTAGE_TABLE,  "sentence": "$value$ reducció de residus"},
+    "waste_reuse": {"table": DEFAULT_PERCENTAGE_TABLE, "sentence": "$value$ residus reutilitzats"},
+}
+
+# GESTIÓ DE L'AIGUA
+WATER_TABLES = {
+    "water_quality_variation": {
+        "table": RatingTable({
+            (30, 100): -4, # > 30%
+            (20, 29.99): -3, # 20% - 30%
+            (10, 19.99): -2, # 10% - 20%
+            (0, 9.99): -1 # < 10% 
+        })
+    },
+    "water_reuse": {
+        "table": DEFAULT_PERCENTAGE_TABLE
+    },
+    "waterflow_reduction": {
+        "table": RatingTable({
+            (60, 100): 1,
+            (35, 59.99): 2,
+            (20, 34.99): 3,
+            (10, 19.99): 4,
+            (0, 9.99): 5,
+        })
+    } 
+}
+
+# QUALITAT DE L'AIRE
+AIR_QUALITY_TABLE = DEFAULT_PERCENTAGE_TABLE
+
+# CANVIS DE LA MORFOLOGIA DEL TERRENY
+LANDFORM_TABLE = RatingTable({(0, 19.99): -1, (20, 39.99): -2, (40, 59.99): -3, (60, 100): -4})
+
+# BIODIVERSITAT: taula no especificada al PDF
+BIODIVERSITY_TABLE = RatingTable({(1, 19.99): 1, (20, 39.99): 2, (40, 59.99): 3, (60, 79.99): 4, (80, 100): 5})
+
+# EFECTES AMBIENTALS POSITIUS: taula creada sota el meu criteri (No s'especifica res al PDF)
+RESTORED_AREA_TABLE = DEFAULT_PERCENTAGE_TABLE
+
+# PASSIUS AMBIENTALS: Taula 28
+EXTENSION_LIABILITIES_TABLE = DEFAULT_PERCENTAGE_TABLE
+
 @safe_rating(default = False)
 def get_energy_rating(responses):
     """
@@ -14,34 +115,7 @@ def get_energy_rating(responses):
     :return dict: Diccionari amb el contingut a mostrar a la vista resultats.
     """
 
-    # TAULA PER DEFECTE (Taula 12, 13 i 14)
-    default_energy_table = {
-        (0, 19.99): 1,
-        (20, 39.99): 2,
-        (40, 59.99): 3,
-        (60, 79.99): 4,
-        (80, 100): 5,
-    }
-
-    table_energy_dicts = {
-        "ghg_reduction": {
-            "table": default_energy_table, 
-            "sentence": "$value$ tècniques d’estalvi energètic implementades.",
-            "semaphore": POSITIVE_SEMAPHORE
-        },
-        "green_energy_sources": {
-            "table": default_energy_table, 
-            "sentence": "$value$ energia renovable utilitzada.",
-            "semaphore": POSITIVE_SEMAPHORE
-        },
-        "green_energy_fleet": {
-            "table": default_energy_table, 
-            "sentence": "$value$ flota amb energia verda.",
-            "semaphore": POSITIVE_SEMAPHORE
-        },
-    }
-
-    return get_ratings_from_percentatge_tables(responses, table_energy_dicts, DIM)
+    return get_ratings_from_percentatge_tables(responses, ENERGY_TABLES, DIM)
 
 
 @safe_rating(default = False)
@@ -53,41 +127,6 @@ def get_tailings_rating(responses):
     :return dict: Diccionari amb el contingut a mostrar a la vista resultats.
     """
 
-    table_tailings_dicts = {
-        "price_increase": {
-            "table": {
-                "8-10 vegades més alt": 1,
-                "6-8 vegades més alt": 2,
-                "4-6 vegades més alt": 3,
-                "2-4 vegades més alt": 4,
-                "Fins a 2 vegades més alt":  5
-            },
-            "semaphore": POSITIVE_SEMAPHORE 
-        },
-        "other_tailing_usage" : {
-            "table": {
-                (0, 9.99): 1,
-                (10, 19.99): 2,
-                (20, 34.99): 3,
-                (35, 49.99): 4,
-                (50, 100): 5,
-            },
-            "sentence": "$value$ reutilització de residus miners",
-            "semaphore": POSITIVE_SEMAPHORE
-        },
-        "water_recovery_from_tailings": {
-            "table": {
-                (0, 19.99): 1,
-                (20, 39.99): 2,
-                (40, 59.99): 3,
-                (60, 79.99): 4,
-                (80, 100): 5,
-            },
-            "sentence": "$value$ recuperació d’aigua dels residus",
-            "semaphore": POSITIVE_SEMAPHORE
-        }
-    }
-
     ratings = {}
 
     first_element = responses[0]
@@ -95,15 +134,14 @@ def get_tailings_rating(responses):
 
     if first_id in first_element:
         option = first_element[first_id]
-        rating = table_tailings_dicts[first_id]["table"][option]
-        semaphore = table_tailings_dicts[first_id]["semaphore"]
+        rating = TAILINGS_TABLES[first_id]["table"][option]
+        semaphore = TAILINGS_TABLES[first_id]["semaphore"]
         logger.debug(f"TAILINGS - Opció: {option}. Índex: {rating}")
         ratings[first_id] = create_card_result(first_id, {"rating": rating, "out_of": 5}, semaphore, DIM)
-        del table_tailings_dicts[first_id]
-        responses.pop(0) # s'elimina per poder processar la resta amb la funció auxiliar 
+        responses = responses[1:] # es descarta (sense modificar les respostes originals) per poder processar la resta amb la funció auxiliar
 
     if len(responses) > 0:
-        ratings.update(get_ratings_from_percentatge_tables(responses, table_tailings_dicts, DIM))
+        ratings.update(get_ratings_from_percentatge_tables(responses, TAILINGS_PERCENTAGE_TABLES, DIM))
 
     return ratings
 
@@ -119,14 +157,6 @@ def get_waste_rating(responses):
   
     ratings, extra_messages = {}, []
 
-    default_waste_table = {(0, 19.99): 1, (20, 39.99): 2, (40, 59.99): 3, (60, 79.99): 4, (80, 100): 5}
-
-    table_waste_dicts = {
-        "higher_waste_ratio": {"table": default_waste_table, "sentence": "$value$ excés de residus"},
-        "lower_waste_ratio": {"table": default_waste_table,  "sentence": "$value$ reducció de residus"},
-        "waste_reuse": {"table": default_waste_table, "sentence": "$value$ residus reutilitzats"},
-    }
-
     for question, value in iterate_responses(responses):
         if question == "waste_ratio_info":
             extra_messages.append(("Tipus de mineria", value))
@@ -167,21 +197,21 @@ def get_waste_rating(responses):
                 if diff_pctg > 100: # Si supera el 100%
                     rating = 5
                 else: # Pel rang (0% - 100%)
-                    rating = get_result_from_percentatge_table(abs(diff_pctg), table_waste_dicts[ref]["table"])
+                    rating = get_result_from_percentatge_table(abs(diff_pctg), WASTE_TABLES[ref]["table"])
                 
                 if ref == "higher_waste_ratio": # Penalització
                     rating = -rating
 
-                sentence = table_waste_dicts[ref]["sentence"].replace("$value$", f"<strong>{diff_pctg}%</strong>")
+                sentence = WASTE_TABLES[ref]["sentence"].replace("$value$", f"<strong>{diff_pctg}%</strong>")
 
                 ratings[ref] = create_card_result(ref, {"rating": rating, "out_of": out_of}, sem, DIM)
                 ratings[ref]["sentence"] = get_html_sentence(sentence)
 
         elif question == "waste_reuse":
             logger.debug(f"WASTE - Reutilització de residus: {value}%")
-            rating = get_result_from_percentatge_table(value, table_waste_dicts["waste_reuse"]["table"])        
+            rating = get_result_from_percentatge_table(value, WASTE_TABLES["waste_reuse"]["table"])        
             ratings["waste_reuse"] = create_card_result("waste_reuse", {"rating": rating, "out_of": 5}, POSITIVE_SEMAPHORE, DIM)
-            ratings["waste_reuse"]["sentence"] = get_html_sentence(table_waste_dicts["waste_reuse"]["sentence"].replace("$value$", f"<strong>{value}%</strong>"))
+            ratings["waste_reuse"]["sentence"] = get_html_sentence(WASTE_TABLES["waste_reuse"]["sentence"].replace("$value$", f"<strong>{value}%</strong>"))
 
     if ratings != {}: # Retorna contingut de la tarjeta per una banda, i per l'altre el contingut que va a fora de les tarjetes (és un cas excepcional)
         return ratings, {"list": get_html_list(extra_messages)}
@@ -200,35 +230,6 @@ def get_water_rating(responses):
     """
     ratings = {}
 
-    table_water_dicts = {
-        "water_quality_variation": {
-            "table": {
-                (30, 100): -4, # > 30%
-                (20, 29.99): -3, # 20% - 30%
-                (10, 19.99): -2, # 10% - 20%
-                (0, 9.99): -1 # < 10% 
-            }
-        },
-        "water_reuse": {
-            "table": {
-                (0, 19.99): 1,
-                (20, 39.99): 2,
-                (40, 59.99): 3,
-                (60, 79.99): 4,
-                (80, 100): 5,
-            }
-        },
-        "waterflow_reduction": {
-            "table": {
-                (60, 100): 1,
-                (35, 59.99): 2,
-                (20, 34.99): 3,
-                (10, 19.99): 4,
-                (0, 9.99): 5,
-            }
-        } 
-    }
-
     for question, value in iterate_responses(responses):
         if isinstance(value, dict):
             if question == "water_quality_variation":
@@ -249,7 +250,7 @@ def get_water_rating(responses):
                         sentence = f"<strong>+100%</strong> variació qualitat de l'aigua"
                     else: # Variació inferior a 100%
                         sentence = f"<strong>{variation_pctg}%</strong> variació qualitat de l'aigua"
-                        rating = get_result_from_percentatge_table(abs(variation_pctg), table_water_dicts[question]["table"])
+                        rating = get_result_from_percentatge_table(abs(variation_pctg), WATER_TABLES[question]["table"])
                     
                     logger.debug(f"WATER - Variació qualitat de l'aigua: {variation_pctg}%. Índex {rating}") 
 
@@ -269,7 +270,7 @@ def get_water_rating(responses):
 
                 if diff != 0:
                     flow_pctg = calculate_percentatge(abs(diff), initial_cabal)
-                    rating = get_result_from_percentatge_table(flow_pctg, table_water_dicts[question]["table"])
+                    rating = get_result_from_percentatge_table(flow_pctg, WATER_TABLES[question]["table"])
                     if diff > 0: # Reducció del cabal (Més habitual)
                         question = "waterflow_reduction" 
                         sentence = f"<strong>{flow_pctg}%</strong> reducció del cabal"
@@ -290,7 +291,7 @@ def get_water_rating(responses):
                     ratings[question]["sentence"] = get_html_sentence(sentence)
         else:
             # Reutilització de l'aigua
-            rating = get_result_from_percentatge_table(value, table_water_dicts[question]["table"])
+            rating = get_result_from_percentatge_table(value, WATER_TABLES[question]["table"])
             logger.debug(f"WATER - Es reutilitza {value}% de l'aigua. - Índex {rating}")
             ratings[question] = create_card_result(question, {"rating": rating, "out_of": 5}, POSITIVE_SEMAPHORE, DIM)
             ratings[question]["sentence"] = get_html_sentence(f"<strong>{value}%</strong> aigua reutilitzada")
@@ -339,10 +340,6 @@ def get_air_rating(responses):
     # entre d’altres fonts on es defineixen aquests tòxics com a indicadors clau de contaminació.
 
 
-    air_quality_table = {
-        (0, 19.99): 1, (20, 39.99): 2, (40, 59.99): 3, (60, 79.99): 4, (80, 100): 5
-    }
-
     toxics_before_explotation = responses[0]['toxics_before_explotation']
     toxics_after_explotation = responses[1]['toxics_after_explotation']
     toxics_limit = responses[2]['limit']
@@ -388,7 +385,7 @@ def get_air_rating(responses):
                         if margin == 0 and increment == 0: # No hi ha marge ni variació
                             rating = 1
                         else:  
-                            rating = get_result_from_percentatge_table(impacte, air_quality_table)
+                            rating = get_result_from_percentatge_table(impacte, AIR_QUALITY_TABLE)
 
                 # Afegim valoració a la taula
 
@@ -449,8 +446,7 @@ def get_landform_changes_rating(responses):
                 return False
             completed = True
             list_msgs.append(("Àrea afectada", f"{value} %"))
-            landform_table = {(0, 19.99): -1, (20, 39.99): -2, (40, 59.99): -3, (60, 100): -4}
-            rating = get_result_from_percentatge_table(value, landform_table)
+            rating = get_result_from_percentatge_table(value, LANDFORM_TABLE)
             logger.debug(f"LC - Percentatge àrea alterada {value}%")
         elif id == "reversible_modification": 
             if value is False and completed is True: # Si els canvis no són reversibles -> impacte extremadament greu
@@ -509,9 +505,7 @@ def get_biodiversity_rating(responses):
             completed = True
             if value == 0:
                 return False
-            # taula no especificada al PDF
-            biodiversity_table = {(1, 19.99): 1, (20, 39.99): 2, (40, 59.99): 3, (60, 79.99): 4, (80, 100): 5}     
-            score = get_result_from_percentatge_table(value, biodiversity_table)
+            score = get_result_from_percentatge_table(value, BIODIVERSITY_TABLE)
             logger.debug(f"BE: Biodiversitat afectada: {value}%; índex: {score}") 
             list_msg.append(("Biodiversitat afectada", f"{value}%"))
 
@@ -613,10 +607,8 @@ def get_positive_environmental_rating(responses):
     
     for id, value in iterate_responses(responses):
         if id == "env_restored_area_percentage":
-            # taula creada sota el meu criteri (No s'especifica res al PDF)
-            restored_area_table = {(0, 19.99): 1, (20, 39.99): 2, (40, 59.99): 3, (60, 79.99): 4, (80, 100): 5}
             if value != 0:
-                score += get_result_from_percentatge_table(value, restored_area_table)
+                score += get_result_from_percentatge_table(value, RESTORED_AREA_TABLE)
             list_msg.append(("Àrea restaurada", f"{value}%"))
             logger.debug(f"IPE - Àrea restaurada: {value}%")
             completed = True
@@ -654,12 +646,12 @@ def get_liability_impact_rating(responses):
     for parent, children in iterate_responses(responses):
         if parent == "extension": 
             # 1. EXTENSIÓ DELS PASSIUS AMBIENTALS 
-            Id, extension_table = "ExtensionLiabilities", {(0, 19.99): 1, (20, 39.99): 2, (40, 59.99): 3, (60, 79.99): 4, (80, 100): 5} # Taula 28
+            Id = "ExtensionLiabilities"
             
             affected_area = children["extension_1"] # Percentatge de l'àrea afectada
 
             if affected_area != 0: # Si es exactament 0 no penalitza
-                rating = get_result_from_percentatge_table(affected_area, extension_table)
+                rating = get_result_from_percentatge_table(affected_area, EXTENSION_LIABILITIES_TABLE)
     
                 ratings[Id] = create_card_result(Id, {"rating": -rating, "out_of": 0}, NEGATIVE_SEMAPHORE, DIM)
 
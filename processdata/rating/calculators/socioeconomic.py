@@ -5,6 +5,62 @@ logger = logging.getLogger(__name__)
 
 DIM = 0  # Dimensió Socioeconòmica
 
+# -----------------------------------------------------------------
+# ----------------TAULES DE REFERÈNCIA (PRECOMPILADES)-------------
+# -----------------------------------------------------------------
+
+LOCAL_PROCUREMENT_TABLES = {
+    # Taula 1
+    "departments_using_local_suppliers_percentatge": {
+        "table": DEFAULT_PERCENTAGE_TABLE,
+        "sentence": "$value$ contractistes locals.",
+        "semaphore": POSITIVE_SEMAPHORE
+    },
+    # Taula 2 (la millor valoració correspon al 40-60%)
+    "large_local_contractors_percentatge": {
+        "table": RatingTable({
+            (0, 19.99): 1,
+            (20, 39.99): 2,
+            (40, 59.99): 5,
+            (60, 79.99): 4,
+            (80, 100): 3,
+        }),
+        "sentence": "$value$ grans contractistes locals.",
+        "semaphore": POSITIVE_SEMAPHORE
+    },
+}
+
+LOCAL_EXPEDITURE_TABLES = {
+    # taula 3
+    "expediture_structure_local_percentatge": {
+        "table": RatingTable({
+            (10, 19.99): 1,
+            (20, 39.99): 2,
+            (40, 59.99): 3,
+            (60, 79.99): 4,
+            (80, 100): 5,
+        }),
+        "sentence": "$value$ cost local i regional.",
+        "semaphore": POSITIVE_SEMAPHORE
+    },
+    # taula 4
+    "expediture_structure_national_percentatge": {
+        "table": RatingTable({
+            (20, 39.99): 1,
+            (40, 59.99): 2,
+            (60, 100): 3,
+        }),
+        "sentence": "$value$ cost nacional.",
+        "semaphore": {1: "RED", 2: "ORANGE", 3: "GREEN"}
+    },
+    # taula 5
+    "employment_quality_percentatge": {
+        "table": DEFAULT_PERCENTAGE_TABLE,
+        "sentence": "$value$ empleats locals i regionals.",
+        "semaphore": POSITIVE_SEMAPHORE
+    },
+}
+
 # -----------------------------------------------------------------
 # --------FUNCIONS CALCULADORES DE RATING PER SECCIONS-------------
 # -----------------------------------------------------------------
@@ -18,34 +74,7 @@ def get_local_procurement_rating(responses):
     :return dict: Diccionari amb el contingut a mostrar a la vista resultats.
     """
 
-    table_local_dicts = {
-        # Taula 1
-        "departments_using_local_suppliers_percentatge": {
-            "table": {
-                (0, 19.99): 1,
-                (20, 39.99): 2,
-                (40, 59.99): 3,
-                (60, 79.99): 4,
-                (80, 100): 5,
-            },
-            "sentence": "$value$ contractistes locals.",
-            "semaphore": POSITIVE_SEMAPHORE
-        },
-        # Taula 2
-        "large_local_contractors_percentatge": {
-            "table": {
-                (0, 19.99): 1,
-                (20, 39.99): 2,
-                (80, 100): 3,
-                (60, 79.99): 4,
-                (40, 59.99): 5,
-            },
-            "sentence": "$value$ grans contractistes locals.",
-            "semaphore": POSITIVE_SEMAPHORE
-        },
-    }
-
-    return get_ratings_from_percentatge_tables(responses, table_local_dicts, DIM)
+    return get_ratings_from_percentatge_tables(responses, LOCAL_PROCUREMENT_TABLES, DIM)
 
 
 @safe_rating(default = False)
@@ -57,43 +86,7 @@ def get_local_expediture_rating(responses):
     :return dict: Diccionari amb el contingut a mostrar a la vista resultats.
     """
 
-    table_expediture_dicts = {
-        # taula 3
-        "expediture_structure_local_percentatge": {
-            "table": {
-                (10, 19.99): 1,
-                (20, 39.99): 2,
-                (40, 59.99): 3,
-                (60, 79.99): 4,
-                (80, 100): 5,
-            },
-            "sentence": "$value$ cost local i regional.",
-            "semaphore": POSITIVE_SEMAPHORE
-        },
-        # taula 4
-        "expediture_structure_national_percentatge": {
-            "table": {
-                (20, 39.99): 1,
-                (40, 59.99): 2,
-                (60, 100): 3,
-            },
-            "sentence": "$value$ cost nacional.",
-            "semaphore": {1: "RED", 2: "ORANGE", 3: "GREEN"}
-        },
-        # taula 5
-        "employment_quality_percentatge": {
-            "table": {
-                (0, 19.99): 1,
-                (20, 39.99): 2,
-                (40, 59.99): 3,
-                (60, 79.99): 4,
-                (80, 100): 5,
-            },
-            "sentence": "$value$ empleats locals i regionals.",
-            "semaphore": POSITIVE_SEMAPHORE
-        },
-    }
-    return get_ratings_from_percentatge_tables(responses, table_expediture_dicts, DIM)
+    return get_ratings_from_percentatge_tables(responses, LOCAL_EXPEDITURE_TABLES, DIM)
 
 
 @safe_rating(default = False)
@@ -198,14 +191,6 @@ def get_value_chain_rating(responses):
             logger.debug(f"VC - Tipus de producte, Índex {rating}")
         elif question == "r_and_d":
             # Hem de tenir els tres valors per poder calcular el percentatge.
-            rating_table = {
-                (0, 19.99): 1,
-                (20, 39.99): 2,
-                (40, 59.99): 3,
-                (60, 79.99): 4,
-                (80, 100): 5,
-            }
-
             total_budget, total_inversion = (value["r_and_d_1"], value["r_and_d_2"] + value["r_and_d_3"])
 
             if (total_budget > 0 and total_inversion > 0):  # Si algún dels dos es 0, no podem realitzar els càlculs.
@@ -215,7 +200,7 @@ def get_value_chain_rating(responses):
 
                 if pctg is not None:
                     if pctg <= 100:
-                        rating = get_result_from_percentatge_table(pctg, rating_table)
+                        rating = get_result_from_percentatge_table(pctg, DEFAULT_PERCENTAGE_TABLE)
                     else:
                         rating = 5
                         sentence += """<br><span class="text-danger">**Valor irreal, revisa les dades entrades. **<span>"""
@@ -1,5 +1,6 @@
 from ....data import SOCIOECONOMIC_DIMENSION_RESULTS as SR, ENVIRONMENT_DIMENSION_RESULTS as ER
 from .html_content import *
+from .tables import RatingTable
 import statistics
 import logging 
 
@@ -14,6 +15,41 @@ DIM_CRITERION = {0: SR, 1: ER}
 POSITIVE_SEMAPHORE = {1: "RED", 2: "ORANGE", 3: "YELLOW", 4: "GREEN", 5: "DGREEN"}
 NEGATIVE_SEMAPHORE = {-1: "GREEN", -2: "YELLOW", -3: "ORANGE", -4: "RED", -5: "DRED"}
 
+#----------------------------------------------------------------
+#---------------------- TAULES DE PERCENTATGES-------------------
+#----------------------------------------------------------------
+
+# Taula per defecte (trams del 20%), compartida per la majoria de seccions.
+DEFAULT_PERCENTAGE_TABLE = RatingTable({(0, 19.99): 1, (20, 39.99): 2, (40, 59.99): 3, (60, 79.99): 4, (80, 100): 5})
+
+#----------------------------------------------------------------
+#------------------- CONTINGUT DE LES TARGETES ------------------
+#----------------------------------------------------------------
+
+def build_card_content_index(criteria):
+    """
+    Precalcula el contingut de presentació de totes les targetes: per a cada dimensió, secció i puntuació del JSON de
+    resultats, el títol (si en té), el resum ja en HTML i el consell, i la part del resum de les targetes amb frase
+    (veure `get_html_card_summary`). El contingut només depèn de la configuració, de manera que es calcula una sola
+    vegada en importar el mòdul i cada targeta es resol amb una consulta al diccionari.
+
+    :param criteria (dict): {dimensió: contingut del JSON de resultats}. Ex: DIM_CRITERION.
+    :return (tuple(dict, dict)): {(dimensió, secció, puntuació): {"name", "summary", "advice"}} i
+                                 {(dimensió, secció, puntuació): resum HTML de les targetes amb frase}.
+    """
+    cards, card_summaries = {}, {}
+    for dim, criterion in criteria.items():
+        for id, extra_data in criterion.items():
+            for rating, summary in extra_data["summaries"].items():
+                key = (dim, id, int(rating))
+                content = {"name": extra_data["name"]} if "name" in extra_data else {} # Bloc únic: el títol és el de la subdimensió
+                content.update(summary = get_html_summary(summary), advice = extra_data["advices"][rating])
+                cards[key] = content
+                card_summaries[key] = get_html_card_summary(summary)
+    return cards, card_summaries
+
+CARD_CONTENT, CARD_SUMMARIES = build_card_content_index(DIM_CRITERION)
+
 # --------------------------------------------------------------
 # -------------------FUNCIONS AUXILIARS-------------------------
 #---------------------------------------------------------------
@@ -60,33 +96,21 @@ def get_formatted_extra_info(id, rating, dim, extra_msgs = None):
     """
     Recupera i formata la informació complementària (resum i consell) associada a una secció i nivell de puntuació donat.
 
-    Aquesta funció consulta els diccionaris de referència (DIM_CRITERION) per obtenir el `summary` i `advice` 
-    corresponents a una puntuació (`rating`) per a una secció identificada per `id` dins d'una dimensió (`dim`).
+    Aquesta funció consulta l'índex precalculat a partir dels diccionaris de referència (CARD_CONTENT, veure
+    `build_card_content_index`) per obtenir el `summary` i `advice` corresponents a una puntuació (`rating`) per a
+    una secció identificada per `id` dins d'una dimensió (`dim`).
 
     També pot afegir missatges addicionals (`extra_msgs`) si es proporcionen.
 
     :param id (str): Identificador de la secció (ex. "Waste", "InfraestructureCreation").
-    :param rating (int or str): Puntuació de l'índex (es converteix a str internament per accedir al diccionari).
+    :param rating (int): Puntuació de l'índex (es fa servir el valor absolut).
     :param dim (int): Dimensió a la qual pertany la secció (0 = socioeconòmica, 1 = ambiental).
     :param extra_msgs (list, optional): Missatges addicionals en format [("títol", valor), ...] per afegir a la resposta.
     """
-
-    criterion = DIM_CRITERION[dim]  # criteri respecte la dimensió
-    rating = str(abs(rating))
-    extra_data = criterion[id] 
-    # Resum i Consell segons la puntuació resultant
-    summary, advice = get_html_summary(extra_data["summaries"][rating]), extra_data["advices"][rating]
-    
-    if "name" in extra_data: # Cada tarjeta té el seu propi títol. 
-        title = extra_data["name"]
-        if not extra_msgs:
-            return {"name": title, "summary": summary, "advice": advice}
-        else: 
-            return {"name": title, "summary": summary, "advice": advice, "messages": extra_msgs}
-    if not extra_msgs: # Bloc únic. Recordem: bloc únic el títol és el de la pròpia subdimensió.
-        return {"summary": summary, "advice": advice}
-    else: 
-        return {"summary": summary, "advice": advice, "messages": extra_msgs}
+    content = CARD_CONTENT[dim, id, abs(rating)] # Resum i Consell segons la puntuació resultant (precalculats)
+    if not extra_msgs:
+        return dict(content)
+    return {**content, "messages": extra_msgs}
     
 def create_card_result(id, rdata, sem, dim):
     """
@@ -99,6 +123,8 @@ def create_card_result(id, rdata, sem, dim):
     :param sem (str): Color del semàfor per la targeta (ex. "RED", "ORANGE", "GREEN", "NEUTRAL").
     :param dim (int): Índex de dimensió (0 = socioeconòmica, 1 = ambiental), per accedir al diccionari de contingut.
     """
+    if not is_rendering(): # Només puntuacions
+        return rdata
     view_data = get_formatted_extra_info(id, rdata['rating'], dim)
     return {
         **rdata,
@@ -117,6 +143,8 @@ def create_section_result(id, rating, dim, sem, info = None):
     :param dim (int): Dimensió a la qual pertany la secció (0 = socioeconòmica, 1 = ambiental).
     :param info (list, optional): Llista de missatges addicionals (tipus [("títol", valor), ...]) a mostrar com a detalls. 
     """
+    if not is_rendering(): # Només puntuacions
+        return rating, None
     view_data = get_formatted_extra_info(id, rating, dim, extra_msgs = info)
     return rating, {"semaphore": sem[rating], **view_data}
 
@@ -134,7 +162,7 @@ def get_ratings_from_percentatge_tables(responses, references, dim):
     :returns bool: False si les preguntes no han estat resposes.
     """
 
-    ratings = {}
+    ratings, render = {}, is_rendering()
     
     for key, pctg in iterate_responses(responses):
         if pctg is not None:
@@ -143,9 +171,12 @@ def get_ratings_from_percentatge_tables(responses, references, dim):
             pctg_table = refs["table"]
 
             rating = get_result_from_percentatge_table(pctg, pctg_table)
+
+            if not render: # Només puntuacions
+                ratings[key] = {"rating": rating, "out_of": max(pctg_table.values())}
+                continue
     
-            info = DIM_CRITERION[dim][key]
-            name, summary, advice = info["name"], info["summaries"][str(rating)], info["advices"][str(rating)]
+            content = CARD_CONTENT[dim, key, rating] # títol, consell i resum precalculats: només la frase depèn del percentatge
             sentence = refs["sentence"].replace("$value$", f"<strong>{pctg}%</strong>")
             color = refs['semaphore'][rating]
 
@@ -153,9 +184,9 @@ def get_ratings_from_percentatge_tables(responses, references, dim):
                 "rating": rating,
                 "out_of": max(pctg_table.values()),
                 "semaphore": color,
-                "name": name, 
-                "summary": create_html_sentence_with_summary(sentence, summary),
-                "advice": advice
+                "name": content["name"], 
+                "summary": get_html_card_sentence(sentence) + CARD_SUMMARIES[dim, key, rating],
+                "advice": content["advice"]
             }
     
     return ratings if ratings != {} else False
@@ -171,8 +202,12 @@ def get_result_from_percentatge_table(percentatge, table):
     Retorna el valor de rating comprovant la referència de la taula.
 
     :param percentatge(float): valor de percentatge pel qual s'ha de trobar la correspondència de rating a la taula.
-    :table(dict): diccionari amb tuples per clau amb valor mínim i máxim amb la seva correspondència de rating. Ex: {(0, 20): 1, (20, 40): 2, (40, 60): 3, (60, 80): 4, (80, 100): 5}
+    :table(RatingTable or dict): taula precompilada (cerca binària) o diccionari amb tuples per clau amb valor mínim i máxim 
+                                 amb la seva correspondència de rating. Ex: {(0, 20): 1, (20, 40): 2, (40, 60): 3, (60, 80): 4, (80, 100): 5}
     """
+    if isinstance(table, RatingTable):
+        return table.lookup(percentatge)
+
     for (min_val, max_val), rating in table.items():
         if min_val <= percentatge <= max_val:
             return rating
@@ -1,3 +1,42 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+# Mode de presentació actiu. False: només es calculen puntuacions (veure `calculate_rating(render = False)`).
+_render = ContextVar("render", default = True)
+
+def is_rendering():
+    """
+    Indica si s'ha de generar el contingut de presentació (HTML, textos i semàfors) dels resultats.
+    """
+    return _render.get()
+
+@contextmanager
+def rendering(enabled):
+    """
+    Activa o desactiva la generació del contingut de presentació dins del bloc `with`.
+
+    :param enabled (bool): False per calcular només les puntuacions.
+    """
+    token = _render.set(enabled)
+    try:
+        yield
+    finally:
+        _render.reset(token)
+
+def render_only(func):
+    """
+    Decorador per a funcions que generen HTML: si la presentació està desactivada no s'executa i retorna una cadena buida.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _render.get():
+            return ""
+        return func(*args, **kwargs)
+    return wrapper
+
+
+@render_only
 def create_html_sentence_with_summary(sentence, summary):
     """
     Crea una estructura en format HTML que mostra una frase introductòria i, a sota, un resum. 
@@ -7,17 +46,34 @@ def create_html_sentence_with_summary(sentence, summary):
     :param summary (str): Resum explicatiu que es mostrarà a continuació.
     :return (str): Cadena HTML amb el contingut formatat.
     """
-    summary_template = f"""
+    return get_html_card_sentence(sentence) + get_html_card_summary(summary)
+
+def get_html_card_sentence(sentence):
+    """
+    Part superior (frase introductòria) de `create_html_sentence_with_summary`.
+
+    :param sentence (str): Frase introductòria.
+    """
+    return f"""
     <p class="text-muted fs-5 mb-2">
         <span style="font-size: 0.8em; color: white; text-shadow: 0 0 1px #aaa;">⚪️</span> {sentence}
-    </p>
+    </p>"""
+
+def get_html_card_summary(summary):
+    """
+    Part inferior (resum) de `create_html_sentence_with_summary`. No depèn de la resposta: es pot precalcular
+    per a cada puntuació (veure `CARD_CONTENT` a helpers.py).
+
+    :param summary (str): Resum explicatiu.
+    """
+    return f"""
     <p class="text-muted fs-5 mb-3">
         {summary}
     </p>
     """
-    return summary_template
 
 
+@render_only
 def get_html_summary(summary):
     """
     Construeix un paràgraf HTML amb estil per mostrar un resum explicatiu.
@@ -33,6 +89,7 @@ def get_html_summary(summary):
     return summary_template
 
 
+@render_only
 def get_html_sentence(sentence):
     """
     Construeix un paràgraf HTML amb una frase introductòria precedida d’un icona decoratiu.
@@ -47,6 +104,7 @@ def get_html_sentence(sentence):
     """
     return sentence_template
 
+@render_only
 def get_html_list(data):
     """
     Construeix una llista HTML (<ul>) on cada element conté un títol en negreta i una descripció.
@@ -65,6 +123,7 @@ def get_html_list(data):
     """
     return list_template
 
+@render_only
 def get_html_warning(data):
     """
     Construeix un paràgraf HTML destacat amb un símbol d’advertència.
@@ -79,6 +138,7 @@ def get_html_warning(data):
 
     
 
+@render_only
 def get_html_table(headers, data):
     """
     Genera una taula HTML a partir de capçaleres i dades.
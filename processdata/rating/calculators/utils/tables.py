@@ -0,0 +1,84 @@
+from bisect import bisect_right
+
+class RatingTable:
+    """
+    Taula de correspondència percentatge -> rating precompilada.
+
+    Es construeix una sola vegada (normalment en importar el mòdul del calculador) a partir d'un diccionari amb
+    tuples (mínim, màxim) com a clau i el rating com a valor. Els intervals s'ordenen i es validen en construir-la,
+    i cada consulta es resol amb una cerca binària sobre els límits inferiors.
+
+    Els intervals es consideren contigus si la separació entre el màxim d'un i el mínim del següent no supera
+    `tolerance` (ex: 19.99 -> 20 amb percentatges de dos decimals). Un valor dins d'aquesta separació pertany a
+    l'interval inferior. Si hi ha solapaments o separacions més grans es llança ValueError.
+
+    Exemple:
+        table = RatingTable({(0, 19.99): 1, (20, 39.99): 2, (40, 59.99): 3, (60, 79.99): 4, (80, 100): 5})
+        table.lookup(45) -> 3
+        table.lookup_many([10, 85, 19.995]) -> [1, 5, 1]
+
+    :param intervals (dict): diccionari {(mínim, màxim): rating}. No cal que estigui ordenat.
+    :param default (int): rating per a valors fora del rang de la taula.
+    :param tolerance (float): separació màxima admesa entre dos intervals consecutius.
+    """
+    def __init__(self, intervals, default = 1, tolerance = 0.01):
+        if not intervals:
+            raise ValueError("RatingTable requires at least one interval.")
+
+        ordered = sorted(intervals.items())
+        previous_max = None
+
+        for (min_val, max_val), _ in ordered:
+            if min_val > max_val:
+                raise ValueError(f"Invalid interval ({min_val}, {max_val}): minimum is greater than maximum.")
+            if previous_max is not None:
+                if min_val < previous_max:
+                    raise ValueError(f"Overlapping intervals at {min_val} (previous interval ends at {previous_max}).")
+                if min_val - previous_max > tolerance + 1e-9:
+                    raise ValueError(f"Gap between {previous_max} and {min_val} is not covered by any interval.")
+            previous_max = max_val
+
+        self.intervals = dict(ordered)
+        self.default = default
+        self._lows = [min_val for (min_val, _), _ in ordered]
+        self._ratings = [rating for _, rating in ordered]
+        self._min, self._max = ordered[0][0][0], ordered[-1][0][1]
+
+    def lookup(self, value):
+        """
+        Retorna el rating corresponent a un percentatge.
+
+        :param value (float): percentatge a consultar.
+        """
+        if value < self._min or value > self._max:
+            return self.default
+        return self._ratings[bisect_right(self._lows, value) - 1]
+
+    def lookup_many(self, values):
+        """
+        Retorna el rating de cadascun dels percentatges, en el mateix ordre.
+
+        Els valors s'ordenen i es recorren conjuntament amb els intervals (una sola passada), de manera que el
+        cost és lineal respecte al nombre de valors un cop ordenats.
+
+        :param values (list(float)): percentatges a consultar.
+        """
+        results = [self.default] * len(values)
+        index, n_intervals = 0, len(self._lows)
+
+        for position, value in sorted(enumerate(values), key = lambda item: item[1]):
+            if value < self._min or value > self._max:
+                continue
+            while index + 1 < n_intervals and self._lows[index + 1] <= value:
+                index += 1
+            results[position] = self._ratings[index]
+        return results
+
+    def values(self):
+        """
+        Retorna els ratings de la taula (compatible amb els diccionaris de taules: max(table.values())).
+        """
+        return list(self._ratings)
+
+    def __repr__(self):
+        return f"RatingTable({self.intervals})"
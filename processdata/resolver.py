@@ -0,0 +1,187 @@
+import logging
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import connection, transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .models import UserFingerprint
+from .rating.cache import LocalMemoryBackend
+
+logger = logging.getLogger(__name__)
+
+# Configuració per defecte (es pot sobreescriure amb FORM_RESOLVER a settings.py)
+DEFAULT_FORM_RESOLVER = {
+    "MAX_ENTRIES": 10000,
+}
+
+# Camí des de cada model fins a l'identificador del fingerprint (consulta sense la clau del formulari)
+FINGERPRINT_PATHS = {
+    "Form": "fingerprint__fingerprint_id",
+    "SubSubForm": "subform__form__fingerprint__fingerprint_id",
+}
+DEFAULT_FINGERPRINT_PATH = "form__fingerprint__fingerprint_id" # SubForm i fills (Overview, dimensions), ResultSnapshot
+
+#----------------------------------------------------------------
+#---------------------------- CACHÉ -----------------------------
+#----------------------------------------------------------------
+
+class FormResolver:
+    """
+    Correspondència fingerprint -> clau primària del formulari, en dos nivells: la petició actual i una LRU del procés.
+
+    La clau del formulari és també la de l'Overview, les dues dimensions, SubSubForm (subdimensions) i ResultSnapshot,
+    de manera que coneixent-la totes les consultes d'un fingerprint es fan per clau primària, sense el JOIN fins a
+    UserFingerprint. La correspondència no canvia mai mentre el fingerprint existeix (un sol formulari per fingerprint).
+
+    :param MAX_ENTRIES (int): fingerprints a la LRU del procés. 0: només es recorda durant la petició.
+    """
+    def __init__(self, MAX_ENTRIES = 10000):
+        self.lru = LocalMemoryBackend(MAX_ENTRIES = MAX_ENTRIES, TIMEOUT = None) if MAX_ENTRIES else None
+        self.request_memo = ContextVar("form_resolver_memo", default = None)
+
+    def get(self, fingerprint):
+        memo = self.request_memo.get()
+        if memo is not None and fingerprint in memo:
+            return memo[fingerprint]
+        form_id = self.lru.get(fingerprint) if self.lru else None
+        if memo is not None and form_id is not None:
+            memo[fingerprint] = form_id
+        return form_id
+
+    def set(self, fingerprint, form_id):
+        """
+        Recorda la clau del formulari d'un fingerprint. A la LRU del procés només s'hi afegeix un cop confirmada la
+        transacció actual: una creació desfeta (rollback) no hi deixa cap clau.
+        """
+        memo = self.request_memo.get()
+        if memo is not None:
+            memo[fingerprint] = form_id
+        if self.lru:
+            transaction.on_commit(lambda: self._store(fingerprint, form_id))
+
+    def _store(self, fingerprint, form_id):
+        if not connection.in_atomic_block: # Les dades ja són visibles per a la resta de peticions
+            self.lru.set(fingerprint, form_id)
+
+    def invalidate(self, fingerprint):
+        memo = self.request_memo.get()
+        if memo is not None:
+            memo.pop(fingerprint, None)
+        if self.lru:
+            self.lru.delete(fingerprint)
+
+    def clear(self):
+        if self.lru:
+            self.lru.clear()
+
+
+_resolver = None
+
+def get_form_resolver():
+    """
+    Retorna la instància del resolutor configurat a settings.FORM_RESOLVER.
+    """
+    global _resolver
+    if _resolver is None:
+        _resolver = FormResolver(**{**DEFAULT_FORM_RESOLVER, **getattr(settings, "FORM_RESOLVER", {})})
+    return _resolver
+
+@receiver(post_delete, sender = UserFingerprint)
+def invalidate_deleted_fingerprint(sender, instance, **kwargs):
+    get_form_resolver().invalidate(instance.fingerprint_id)
+
+#----------------------------------------------------------------
+#--------------------------- CONSULTES --------------------------
+#----------------------------------------------------------------
+
+def get_fingerprint_path(queryset):
+    return FINGERPRINT_PATHS.get(queryset.model.__name__, DEFAULT_FINGERPRINT_PATH)
+
+def get_for_fingerprint(queryset, fingerprint):
+    """
+    Recupera la instància d'un fingerprint d'un model amb la clau primària del formulari (Form, Overview, dimensions,
+    SubSubForm, ResultSnapshot).
+
+    Si la clau ja és coneguda es consulta per clau primària. Si no, es consulta amb el JOIN fins al fingerprint i la clau
+    de la instància obtinguda es recorda: cap consulta addicional per resoldre-la. Si la clau recordada ja no existeix
+    (fingerprint eliminat des d'un altre procés), s'oblida i es torna a consultar amb el JOIN.
+
+    :param queryset (QuerySet): consulta base. Ex: Overview.objects, Form.objects.select_for_update().
+    :param fingerprint (str): identificador del fingerprint.
+    :raises ObjectDoesNotExist: (`DoesNotExist` del model) si el fingerprint no té cap instància.
+    """
+    resolver = get_form_resolver()
+    form_id = resolver.get(fingerprint)
+    if form_id is not None:
+        try:
+            return queryset.get(pk = form_id)
+        except ObjectDoesNotExist:
+            resolver.invalidate(fingerprint)
+
+    instance = queryset.get(**{get_fingerprint_path(queryset): fingerprint})
+    resolver.set(fingerprint, instance.pk)
+    return instance
+
+async def aget_for_fingerprint(queryset, fingerprint):
+    """
+    Versió asíncrona de `get_for_fingerprint` (ORM asíncron).
+    """
+    resolver = get_form_resolver()
+    form_id = resolver.get(fingerprint)
+    if form_id is not None:
+        try:
+            return await queryset.aget(pk = form_id)
+        except ObjectDoesNotExist:
+            resolver.invalidate(fingerprint)
+
+    instance = await queryset.aget(**{get_fingerprint_path(queryset): fingerprint})
+    resolver.set(fingerprint, instance.pk)
+    return instance
+
+def filter_for_fingerprint(queryset, fingerprint, field = "form_id"):
+    """
+    Filtra una consulta de files d'un formulari (ex: DimensionDocument) per la clau recordada del formulari o, si
+    no és coneguda, pel JOIN fins al fingerprint. No comprova si la clau recordada encara existeix.
+
+    :param field (str): camp amb la clau del formulari.
+    """
+    form_id = get_form_resolver().get(fingerprint)
+    if form_id is not None:
+        return queryset.filter(**{field: form_id})
+    return queryset.filter(form__fingerprint__fingerprint_id = fingerprint)
+
+#----------------------------------------------------------------
+#-------------------------- MIDDLEWARE --------------------------
+#----------------------------------------------------------------
+
+class FormResolverMiddleware:
+    """
+    Activa la memòria de la petició del resolutor: durant una petició cada fingerprint es resol com a molt una vegada,
+    encara que la LRU del procés estigui desactivada (MAX_ENTRIES = 0). Compatible amb vistes síncrones i asíncrones.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = get_form_resolver().request_memo.set({})
+        try:
+            return self.get_response(request)
+        finally:
+            get_form_resolver().request_memo.reset(token)
+
+    async def __acall__(self, request):
+        token = get_form_resolver().request_memo.set({})
+        try:
+            return await self.get_response(request)
+        finally:
+            get_form_resolver().request_memo.reset(token)
@@ -0,0 +1,153 @@
+import logging
+import time
+import tracemalloc
+from datetime import timedelta
+from django.conf import settings
+from django.db import models, router, transaction
+from django.utils.timezone import now
+from .models import UserFingerprint
+from .heartbeat import flush_heartbeats
+from .resolver import get_form_resolver
+
+logger = logging.getLogger(__name__)
+
+# Configuració per defecte (es pot sobreescriure amb RETENTION a settings.py)
+DEFAULT_RETENTION = {
+    "DAYS": 7,
+    "BATCH_SIZE": 500,
+    "SLEEP": 0.5,
+}
+
+def get_retention_config():
+    return {**DEFAULT_RETENTION, **getattr(settings, "RETENTION", {})}
+
+#----------------------------------------------------------------
+#--------------------------- ELIMINACIÓ -------------------------
+#----------------------------------------------------------------
+
+def get_dependent_relations(model):
+    """
+    Retorna les relacions inverses pròpies d'un model (sense les heretades del model pare en l'herència multitaula).
+    """
+    return [
+        field for field in model._meta.get_fields(include_parents = False)
+        if field.auto_created and not field.concrete and (field.one_to_many or field.one_to_one)
+    ]
+
+def delete_tree(model, pks, using):
+    """
+    Elimina les files `pks` d'un model i, abans, totes les files que en depenen (relacions inverses en CASCADE), amb
+    DELETE directes per taula: sense carregar cap instància ni enviar senyals (a diferència de `QuerySet.delete()`).
+
+    Per a cada model amb dependents es llegeixen només les claus primàries de les files afectades. Amb l'estructura
+    actual (Form -> SubForm -> SubSubForm -> subdimensions) són un nombre constant de consultes per bloc.
+
+    :param model (Model): model de les files a eliminar.
+    :param pks (list): claus primàries.
+    :param using (str): àlies de la base de dades.
+    :return (int): files eliminades (totes les taules).
+    """
+    if not pks:
+        return 0
+    deleted = 0
+    for relation in get_dependent_relations(model):
+        if relation.on_delete is not models.CASCADE: # Cap relació d'aquest tipus: no es pot resoldre amb DELETE directes
+            raise ValueError(f"Unsupported on_delete for {relation.related_model.__name__}.{relation.field.name}")
+        child = relation.related_model
+        rows = child._base_manager.using(using).filter(**{f"{relation.field.attname}__in": pks})
+        if get_dependent_relations(child):
+            deleted += delete_tree(child, list(rows.values_list("pk", flat = True)), using)
+        else:
+            deleted += rows._raw_delete(using)
+    return deleted + model._base_manager.using(using).filter(pk__in = pks)._raw_delete(using)
+
+
+class SweepStats:
+    """
+    Comptadors d'una neteja: usuaris i files eliminades, blocs, temps i memòria màxima (tracemalloc).
+    """
+    def __init__(self):
+        self.users, self.rows, self.batches, self.last_pk = 0, 0, 0, 0
+        self.started = time.perf_counter()
+        self.peak_memory = None
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def __str__(self):
+        rate = self.rows / self.elapsed if self.elapsed else 0
+        memory = f", peak memory {self.peak_memory / 2**20:.1f} MB" if self.peak_memory is not None else ""
+        return f"{self.users} users ({self.rows} rows) deleted in {self.batches} batches, {self.elapsed:.2f}s ({rate:.0f} rows/s){memory}"
+
+
+def get_expired_users(days = None):
+    """
+    Retorna els usuaris sense cap connexió en els últims `days` dies (per defecte, settings.RETENTION["DAYS"]).
+    """
+    days = get_retention_config()["DAYS"] if days is None else days
+    return UserFingerprint.objects.filter(last_seen__lt = now() - timedelta(days = days))
+
+def sweep_expired(days = None, batch_size = None, sleep = None, start_after = 0, max_batches = None, stats = None):
+    """
+    Elimina els usuaris inactius i tot el seu formulari en blocs de `batch_size` usuaris, per ordre de clau primària.
+
+    Cada bloc és una transacció pròpia (DELETE directes, veure `delete_tree`), de manera que la memòria és constant i
+    una neteja interrompuda es pot reprendre en qualsevol moment: les files ja eliminades no es tornen a tractar.
+    Entre blocs s'esperen `sleep` segons perquè les peticions del lloc web no esperin el bloqueig d'escriptura.
+    Abans de començar es desen les connexions pendents del procés (veure `processdata.heartbeat`).
+
+    :param days (int): dies d'inactivitat. Per defecte, settings.RETENTION["DAYS"].
+    :param batch_size (int): usuaris per bloc.
+    :param sleep (float): segons d'espera entre blocs.
+    :param start_after (int): clau primària a partir de la qual es continua (veure `SweepStats.last_pk`).
+    :param max_batches (int): blocs màxims d'aquesta execució. Per defecte, fins al final.
+    :param stats (SweepStats): comptadors a actualitzar. Opcional.
+    :return (SweepStats): comptadors de la neteja.
+    """
+    config = get_retention_config()
+    batch_size = batch_size or config["BATCH_SIZE"]
+    sleep = config["SLEEP"] if sleep is None else sleep
+    stats = stats or SweepStats()
+    stats.last_pk = start_after
+    using = router.db_for_write(UserFingerprint)
+    resolver = get_form_resolver()
+
+    flush_heartbeats()
+    expired = get_expired_users(days).order_by("pk")
+
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic(using = using):
+            users = list(expired.filter(pk__gt = stats.last_pk).values_list("pk", "fingerprint_id")[:batch_size])
+            if not users:
+                break
+            stats.rows += delete_tree(UserFingerprint, [pk for pk, _ in users], using)
+
+        for _, fingerprint in users: # Sense senyals post_delete: s'invalida el resolutor manualment
+            resolver.invalidate(fingerprint)
+        stats.users += len(users)
+        stats.batches += 1
+        batches += 1
+        stats.last_pk = users[-1][0]
+        logger.info(f"Retention sweep: {stats}")
+
+        if len(users) < batch_size:
+            break
+        if sleep:
+            time.sleep(sleep)
+
+    return stats
+
+def sweep_expired_with_memory(**kwargs):
+    """
+    Executa `sweep_expired` mesurant la memòria màxima reservada (tracemalloc).
+    """
+    stats = kwargs.pop("stats", None) or SweepStats()
+    tracemalloc.start()
+    try:
+        sweep_expired(stats = stats, **kwargs)
+        stats.peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return stats
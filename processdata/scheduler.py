@@ -0,0 +1,192 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils.timezone import now
+from .models import JobLock, JobRun
+
+logger = logging.getLogger(__name__)
+
+# Configuració per defecte (es pot sobreescriure amb SCHEDULER a settings.py)
+DEFAULT_SCHEDULER = {
+    "INTERVALS": {}, # nom de la tasca -> segons entre execucions (None: desactivada). Per defecte, el del registre.
+    "POLL_INTERVAL": 30,
+    "LOCK_TIMEOUT": 3600,
+    "IN_PROCESS": False,
+    "KEEP_RUNS": 30,
+}
+
+# Identificador d'aquest procés com a propietari dels bloquejos
+OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+# Tasca que s'està executant en cada fil (veure `renew_lock`)
+_current_job = threading.local()
+
+#----------------------------------------------------------------
+#---------------------------- REGISTRE --------------------------
+#----------------------------------------------------------------
+
+# Tasques periòdiques registrades: nom -> (funció, interval per defecte en segons)
+jobs_registry = {}
+
+def register_job(name, interval):
+    """
+    Decorador que registra una tasca periòdica. La funció no rep cap paràmetre i retorna el nombre de files tractades.
+
+    :param name (str): nom de la tasca (clau del bloqueig i de les execucions desades).
+    :param interval (int): segons entre execucions. Es pot canviar amb SCHEDULER["INTERVALS"].
+    """
+    def decorator(func):
+        jobs_registry[name] = (func, interval)
+        return func
+    return decorator
+
+def get_scheduler_config():
+    return {**DEFAULT_SCHEDULER, **getattr(settings, "SCHEDULER", {})}
+
+def get_jobs():
+    """
+    Retorna les tasques actives amb el seu interval: {nom: (funció, segons)}.
+    """
+    from . import jobs # registra les tasques de l'aplicació
+    intervals = get_scheduler_config()["INTERVALS"]
+    active = {}
+    for name, (func, interval) in jobs_registry.items():
+        interval = intervals.get(name, interval)
+        if interval is not None:
+            active[name] = (func, interval)
+    return active
+
+#----------------------------------------------------------------
+#--------------------------- BLOQUEJOS --------------------------
+#----------------------------------------------------------------
+
+def acquire_lock(name, owner = OWNER, timeout = None):
+    """
+    Reserva una tasca per a aquest procés durant `timeout` segons. Només un procés (ex: un dels workers de gunicorn)
+    pot tenir el bloqueig: es pren amb un UPDATE condicional (bloqueig caducat o propi) o, si no existeix, amb un INSERT.
+
+    :return (bool): True si s'ha obtingut el bloqueig.
+    """
+    current = now()
+    expires_at = current + timedelta(seconds = timeout or get_scheduler_config()["LOCK_TIMEOUT"])
+    if JobLock.objects.filter(Q(expires_at__lt = current) | Q(owner = owner), name = name).update(owner = owner, expires_at = expires_at):
+        return True
+    try:
+        with transaction.atomic():
+            JobLock.objects.create(name = name, owner = owner, expires_at = expires_at)
+        return True
+    except IntegrityError: # Un altre procés té el bloqueig
+        return False
+
+def renew_lock(name = None, owner = None, timeout = None):
+    """
+    Allarga `timeout` segons més el bloqueig d'una tasca, només si encara és d'aquest procés. Sense `name`, el de la
+    tasca que s'executa en aquest fil (veure `run_due_jobs`). Les tasques llargues la criden entre blocs, de manera que
+    el bloqueig no caduca mentre treballen i cap altre procés no comença la mateixa tasca.
+
+    :return (bool): False si el bloqueig ha caducat i ara és d'un altre procés (la tasca s'ha d'aturar).
+    """
+    name = name or getattr(_current_job, "name", None)
+    owner = owner or getattr(_current_job, "owner", OWNER)
+    if name is None: # Fora del planificador (ex: crida manual)
+        return True
+    expires_at = now() + timedelta(seconds = timeout or get_scheduler_config()["LOCK_TIMEOUT"])
+    return bool(JobLock.objects.filter(name = name, owner = owner).update(expires_at = expires_at))
+
+def release_lock(name, owner = OWNER):
+    JobLock.objects.filter(name = name, owner = owner).delete()
+
+#----------------------------------------------------------------
+#--------------------------- EXECUCIÓ ---------------------------
+#----------------------------------------------------------------
+
+def is_due(name, interval):
+    """
+    Indica si una tasca s'ha d'executar: no s'ha executat mai o l'última execució va començar fa més de `interval` segons.
+    """
+    last = JobRun.objects.filter(job = name).order_by("-started_at").values_list("started_at", flat = True).first()
+    return last is None or now() - last >= timedelta(seconds = interval)
+
+def run_job(name, func, owner = OWNER):
+    """
+    Executa una tasca i desa l'execució (durada, files tractades i error, si n'hi ha).
+
+    :return (JobRun): execució desada.
+    """
+    started_at, start = now(), time.perf_counter()
+    rows, status, error = 0, "ok", ""
+    try:
+        rows = func() or 0
+    except Exception as e:
+        status, error = "error", str(e)
+        logger.error(f"Error in scheduled job {name}: {e}")
+    run = JobRun.objects.create(job = name, owner = owner, started_at = started_at, duration = time.perf_counter() - start, rows = rows, status = status, error = error)
+    logger.info(f"Scheduled job {name}: {rows} rows in {run.duration:.2f}s ({status})")
+    return run
+
+def purge_runs(days = None):
+    """
+    Elimina les execucions desades (JobRun) que van començar fa més de `days` dies (per defecte, SCHEDULER["KEEP_RUNS"]).
+
+    :return (int): execucions eliminades.
+    """
+    days = get_scheduler_config()["KEEP_RUNS"] if days is None else days
+    return JobRun.objects.filter(started_at__lt = now() - timedelta(days = days)).delete()[0]
+
+def run_due_jobs(owner = OWNER, force = None):
+    """
+    Executa les tasques pendents que cap altre procés està executant.
+
+    :param force (list(str)): executa només aquestes tasques, encara que no els toqui.
+    :return (list(JobRun)): execucions fetes.
+    """
+    runs = []
+    for name, (func, interval) in get_jobs().items():
+        if force and name not in force:
+            continue
+        forced = bool(force)
+        if not forced and not is_due(name, interval):
+            continue
+        if not acquire_lock(name, owner):
+            continue
+        _current_job.name, _current_job.owner = name, owner
+        try:
+            if forced or is_due(name, interval): # Un altre procés la pot haver executat abans d'obtenir el bloqueig
+                runs.append(run_job(name, func, owner))
+        finally:
+            _current_job.name = None
+            release_lock(name, owner)
+    return runs
+
+def run_scheduler(stop_event = None, owner = OWNER):
+    """
+    Bucle del planificador: cada SCHEDULER["POLL_INTERVAL"] segons executa les tasques pendents, fins que `stop_event` s'activa.
+    """
+    stop_event = stop_event or threading.Event()
+    poll_interval = get_scheduler_config()["POLL_INTERVAL"]
+    logger.info(f"Scheduler {owner} started: {', '.join(get_jobs())}")
+    while not stop_event.is_set():
+        try:
+            run_due_jobs(owner)
+        except Exception as e: # ex: base de dades bloquejada; es torna a provar en el següent interval
+            logger.error(f"Error in run_scheduler(): {e}")
+        finally:
+            connection.close()
+        stop_event.wait(poll_interval)
+
+def start_in_background():
+    """
+    Inicia el planificador en un fil del procés actual si SCHEDULER["IN_PROCESS"] és True (ex: en cada worker de
+    gunicorn sense --preload, veure core/wsgi.py). Els bloquejos garanteixen que cada tasca només l'executa un dels workers.
+    """
+    if not get_scheduler_config()["IN_PROCESS"]:
+        return None
+    thread = threading.Thread(target = run_scheduler, name = "scheduler", daemon = True)
+    thread.start()
+    return thread
@@ -0,0 +1,89 @@
+import logging
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils.timezone import now
+from .models import Form, ResultSnapshot
+from .data import CONFIG_VERSION
+from .getdata import get_results
+from .resolver import get_for_fingerprint
+from .rating.calculate import calculate_rating, indicators_handlers
+from .tasks import enqueue
+
+logger = logging.getLogger(__name__)
+
+#----------------------------------------------------------------
+#------------------------- ACTUALITZACIÓ ------------------------
+#----------------------------------------------------------------
+
+def refresh_result_snapshot(fingerprint):
+    """
+    Recalcula el resultat numèric d'un formulari i el desa a la seva instantània (ResultSnapshot).
+
+    La versió de les respostes es llegeix abans que les respostes, de manera que la instantània mai indica una
+    versió més nova que la de les dades amb què s'ha calculat. Una instantània ja desada amb una versió posterior
+    (recàlcul concurrent) no es sobreescriu.
+
+    :param fingerprint(str): id que identifica a l'usuari a la base de dades.
+    :return (dict): puntuacions calculades, o None si el formulari no existeix.
+    """
+    try:
+        form = get_for_fingerprint(Form.objects.only("revision"), fingerprint)
+    except Form.DoesNotExist:
+        return None
+
+    results = get_results(fingerprint)
+    if results is None:
+        return None
+
+    values = {"revision": form.revision, "config_version": CONFIG_VERSION, "scores": calculate_rating(results, render = False)}
+    if not ResultSnapshot.objects.filter(pk = form.pk, revision__lte = form.revision).update(updated_at = now(), **values):
+        try:
+            with transaction.atomic():
+                ResultSnapshot.objects.create(form_id = form.pk, **values)
+        except IntegrityError: # Ja existeix una instantània d'una versió posterior
+            pass
+    return values["scores"]
+
+def schedule_snapshot_refresh(fingerprint):
+    """
+    Encua el recàlcul de la instantània de resultats a la cua de tasques (veure `processdata.tasks`) dins de la
+    transacció actual (desat de respostes): la petició només hi afegeix una fila, sense calcular res. Una sola tasca
+    pendent per formulari: els desats seguits d'un mateix usuari (ex: lots de /sync/) es calculen una sola vegada.
+    Els formularis que queden desactualitzats els recalcula també la tasca periòdica `warm_results_cache`.
+
+    :param fingerprint(str): id que identifica a l'usuari a la base de dades.
+    """
+    enqueue("refresh_result_snapshot", {"fingerprint": fingerprint}, key = f"refresh_result_snapshot:{fingerprint}")
+
+def get_outdated_forms():
+    """
+    Retorna els formularis sense instantània o amb una instantània desactualitzada (respostes o configuració més noves).
+    """
+    return Form.objects.filter(
+        Q(result_snapshot__isnull = True) | Q(result_snapshot__revision__lt = F("revision")) | ~Q(result_snapshot__config_version = CONFIG_VERSION)
+    )
+
+#----------------------------------------------------------------
+#---------------------------- LECTURA ---------------------------
+#----------------------------------------------------------------
+
+def get_snapshot_etag(form_id, revision, config_version, compact = False):
+    """
+    Retorna l'ETag d'una instantània de resultats: canvia amb la versió de les respostes, la de la configuració i el format.
+    """
+    return f'"{form_id}-{revision}-{config_version}{"-c" if compact else ""}"'
+
+def compact_scores(scores):
+    """
+    Redueix les puntuacions d'una instantània al format compacte de l'API: només números, [puntuació, màxim]
+    per dimensió i per secció.
+
+    :param scores (dict): sortida de `calculate_rating(form_answers, render = False)`.
+    """
+    compact = {"rating": scores.get("rating"), "out_of": scores.get("out_of"), "nrating": scores.get("nrating"), "dimensions": {}, "sections": {}}
+    for dimension in indicators_handlers:
+        if dimension in scores:
+            compact["dimensions"][dimension] = [scores[dimension]["rating"], scores[dimension]["out_of"]]
+            for section, content in scores[dimension]["result"].items():
+                compact["sections"][section] = [content["rating"], content["out_of"]]
+    return compact
@@ -0,0 +1,282 @@
+import logging
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.utils.module_loading import import_string
+from .models import Form, SubSubForm, DimensionDocument
+from .resolver import filter_for_fingerprint, get_for_fingerprint, get_form_resolver
+from .data import SOCIOECONOMIC_DIMENSION_QUESTIONS, ENVIRONMENT_DIMENSION_QUESTIONS
+
+logger = logging.getLogger(__name__)
+
+# Configuració per defecte (es pot sobreescriure amb ANSWER_STORAGE a settings.py)
+DEFAULT_ANSWER_STORAGE = {
+    "BACKEND": "processdata.storage.TableStorage",
+}
+
+# Dimensions del formulari: referència -> preguntes
+DIMENSIONS = {
+    "socioeconomic": SOCIOECONOMIC_DIMENSION_QUESTIONS,
+    "environment": ENVIRONMENT_DIMENSION_QUESTIONS,
+}
+
+# ID de la subdimensió (model) -> referència de la dimensió
+SECTION_DIMENSIONS = {section["id"]: reference for reference, sections in DIMENSIONS.items() for section in sections}
+
+#----------------------------------------------------------------
+#--------------------------- AUXILIARS --------------------------
+#----------------------------------------------------------------
+
+def clean_section_values(fields):
+    """
+    Aplica les regles de desat del formulari web a les respostes d'una subdimensió:
+    "on"/"off" -> booleà i contingut buit -> None.
+
+    :param fields (dict): respostes {input_id: valor} tal com arriben del formulari.
+    """
+    values = {}
+    for field, value in fields.items():
+        if value != "" and value != []:
+            values[field] = True if value == "on" else False if value == "off" else value # Valors si/no s'emmagatzemen en format booleà
+        else: # Contingut buit s'emmagatzemma com a None
+            values[field] = None
+    return values
+
+def to_column_values(model_class, fields):
+    """
+    Converteix les respostes d'una subdimensió al format de les columnes del model (ex: "45" -> 45.0, llista -> text),
+    de manera que es poden comparar amb els valors desats.
+
+    :param model_class (Model): model de la subdimensió.
+    :param fields (dict): respostes {input_id: valor} tal com arriben del formulari.
+    """
+    values = {}
+    for field, value in clean_section_values(fields).items():
+        values[field] = model_class._meta.get_field(field).to_python(value) if value is not None else None
+    return values
+
+def get_field_names(model_class):
+    """
+    Retorna els noms de les columnes pròpies (preguntes) d'un model de subdimensió, sense la clau primària.
+    """
+    return [field.attname for field in model_class._meta.local_concrete_fields if not field.primary_key]
+
+def build_instance(model_class, values):
+    """
+    Crea una instància sense desar d'un model de subdimensió a partir dels valors d'un document.
+    Les preguntes que ja no existeixen al model s'ignoren i les que no tenen valor prenen el valor per defecte.
+
+    :param model_class (Model): model de la subdimensió.
+    :param values (dict): valors {input_id: valor}.
+    """
+    field_names = set(get_field_names(model_class))
+    return model_class(**{field: value for field, value in values.items() if field in field_names})
+
+#----------------------------------------------------------------
+#--------------------------- BACKENDS ---------------------------
+#----------------------------------------------------------------
+
+class TableStorage:
+    """
+    Una taula per subdimensió (models generats per `build_subsubform_model`), unides a través de SubSubForm.
+    """
+    CREATE_ROWS = True # create_forms crea les files de les subdimensions en registrar el fingerprint
+
+    def get_instances(self, fingerprint):
+        """
+        Recupera en una única consulta les instàncies de totes les subdimensions d'un fingerprint.
+
+        Tots els models de subdimensió hereten de `SubSubForm`, per tant, a partir de la fila pare es poden
+        obtenir totes les filles amb `select_related` (un LEFT JOIN per model) en comptes de fer una consulta per model.
+        Les subdimensions sense fila (veure `LAZY_SUBDIMENSIONS`) es retornen com a instàncies sense desar, amb els
+        mateixos valors per defecte que una fila nova sense respostes.
+        """
+        # Nom de la relació inversa pare -> fill (per defecte, el nom del model en minúscules)
+        related_names = {section_id: global_apps.get_model("processdata", section_id)._meta.model_name for section_id in SECTION_DIMENSIONS}
+
+        try:
+            subsubform = get_for_fingerprint(SubSubForm.objects.select_related(*related_names.values()), fingerprint)
+        except SubSubForm.DoesNotExist:
+            # Cap secció desada encara: només és vàlid si el formulari existeix (Form.DoesNotExist si no)
+            get_for_fingerprint(Form.objects.only("pk"), fingerprint)
+            subsubform = None
+
+        return self._get_child_instances(subsubform, related_names)
+
+    def get_instances_for_forms(self, form_ids):
+        """
+        Recupera en una única consulta les instàncies de les subdimensions de diversos formularis (exportació per blocs).
+
+        :param form_ids (list(int)): claus primàries dels formularis.
+        :return (dict): {form_id: {ID de la subdimensió: instància}}.
+        """
+        related_names = {section_id: global_apps.get_model("processdata", section_id)._meta.model_name for section_id in SECTION_DIMENSIONS}
+        subsubforms = SubSubForm.objects.select_related(*related_names.values()).in_bulk(form_ids)
+        return {form_id: self._get_child_instances(subsubforms.get(form_id), related_names) for form_id in form_ids}
+
+    def _get_child_instances(self, subsubform, related_names):
+        instances = {}
+        for model_name, related_name in related_names.items():
+            try:
+                if subsubform is None:
+                    raise ObjectDoesNotExist
+                instances[model_name] = getattr(subsubform, related_name)
+            except ObjectDoesNotExist: # Subdimensió sense fila: valors per defecte
+                instances[model_name] = global_apps.get_model("processdata", model_name)()
+        return instances
+
+    def save(self, dimension_subform, data):
+        """
+        Desa les respostes de cada subdimensió a la seva taula.
+
+        Les files de totes les subdimensions rebudes es llegeixen amb una única consulta i només s'actualitzen les
+        columnes que han canviat (un UPDATE per subdimensió modificada, cap si no hi ha canvis). Les files que encara
+        no existeixen es creen. Totes les escriptures s'executen en una única transacció.
+        """
+        models = {model: global_apps.get_model("processdata", model) for model in data}
+        subsubform = SubSubForm.objects.select_related(*[Model._meta.model_name for Model in models.values()]).filter(pk = dimension_subform.pk).first()
+
+        updates, creates = [], []
+        for model, fields in data.items():
+            Model = models[model]
+            values = to_column_values(Model, fields)
+            try:
+                if subsubform is None:
+                    raise ObjectDoesNotExist
+                instance = getattr(subsubform, Model._meta.model_name)
+            except ObjectDoesNotExist: # Primera vegada que es desa la subdimensió
+                creates.append((Model, values))
+                continue
+            changed = {field: value for field, value in values.items() if getattr(instance, field) != value}
+            if changed:
+                updates.append((Model, instance.pk, changed))
+
+        if updates or creates:
+            with transaction.atomic():
+                for Model, pk, changed in updates:
+                    Model.objects.filter(pk = pk).update(**changed)
+                for Model, values in creates:
+                    Model.objects.create(subform = dimension_subform, **values)
+
+
+class DocumentStorage:
+    """
+    Un document JSON per dimensió i formulari (model `DimensionDocument`).
+
+    La lectura de totes les respostes és una consulta i el desat d'una dimensió és una lectura i una escriptura
+    d'una sola fila. Afegir o eliminar preguntes del JSON no requereix migracions per a les dades desades.
+    """
+    CREATE_ROWS = False # Les subdimensions no tenen fila: el document es crea en desar la dimensió
+
+    def get_instances(self, fingerprint):
+        """
+        Recupera els documents d'un fingerprint (una consulta) i retorna una instància sense desar per subdimensió.
+        """
+        form_id = get_form_resolver().get(fingerprint)
+        documents = list(filter_for_fingerprint(DimensionDocument.objects, fingerprint).values_list("answers", flat = True))
+
+        if not documents: # Cap dimensió desada encara: només és vàlid si el formulari existeix (Form.DoesNotExist si no)
+            form = get_for_fingerprint(Form.objects.only("pk"), fingerprint)
+            if form_id is not None and form.pk != form_id: # La clau recordada ja no existia
+                documents = list(filter_for_fingerprint(DimensionDocument.objects, fingerprint).values_list("answers", flat = True))
+
+        return self._build_instances(documents)
+
+    def get_instances_for_forms(self, form_ids):
+        """
+        Recupera en una única consulta els documents de diversos formularis (exportació per blocs).
+
+        :param form_ids (list(int)): claus primàries dels formularis.
+        :return (dict): {form_id: {ID de la subdimensió: instància}}.
+        """
+        documents = {form_id: [] for form_id in form_ids}
+        for form_id, answers in DimensionDocument.objects.filter(form_id__in = form_ids).values_list("form_id", "answers"):
+            documents[form_id].append(answers)
+        return {form_id: self._build_instances(form_documents) for form_id, form_documents in documents.items()}
+
+    def _build_instances(self, documents):
+        answers = {}
+        for document in documents:
+            answers.update(document)
+        return {section_id: build_instance(global_apps.get_model("processdata", section_id), answers.get(section_id, {})) for section_id in SECTION_DIMENSIONS}
+
+    def save(self, dimension_subform, data):
+        """
+        Desa les respostes al document de la dimensió, convertint cada valor al format de la columna del model.
+        El document només es reescriu si algun valor ha canviat.
+        """
+        grouped = {}
+        for model, fields in data.items():
+            grouped.setdefault(SECTION_DIMENSIONS[model], {})[model] = fields
+
+        for dimension, sections in grouped.items():
+            with transaction.atomic():
+                document, created = DimensionDocument.objects.select_for_update().get_or_create(form_id = dimension_subform.pk, dimension = dimension)
+                changed = created
+                for model, fields in sections.items():
+                    values = to_column_values(global_apps.get_model("processdata", model), fields)
+                    stored = document.answers.setdefault(model, {})
+                    changed = changed or any(field not in stored or stored[field] != value for field, value in values.items())
+                    stored.update(values)
+                if changed: # Cap escriptura si el document no ha canviat
+                    document.save(update_fields = ["answers", "updated_at"])
+
+
+def get_storage():
+    """
+    Retorna una instància del backend d'emmagatzematge de respostes configurat a settings.ANSWER_STORAGE.
+    """
+    config = {**DEFAULT_ANSWER_STORAGE, **getattr(settings, "ANSWER_STORAGE", {})}
+    return import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+
+#----------------------------------------------------------------
+#--------------------------- CONVERSIÓ --------------------------
+#----------------------------------------------------------------
+
+def copy_tables_to_documents(apps = global_apps, batch_size = 500):
+    """
+    Copia les respostes de les taules de subdimensió als documents JSON. Els documents existents es substitueixen.
+
+    :param apps: registre de models (el global o el d'una migració).
+    :param batch_size (int): documents per inserció.
+    :return (int): documents creats.
+    """
+    Document = apps.get_model("processdata", "DimensionDocument")
+    documents = {} # (form_id, dimensió) -> {ID de la subdimensió: valors}
+
+    for section_id, dimension in SECTION_DIMENSIONS.items():
+        Model = apps.get_model("processdata", section_id)
+        for row in Model.objects.values("pk", *get_field_names(Model)).iterator():
+            form_id = row.pop("pk")
+            documents.setdefault((form_id, dimension), {})[section_id] = row
+
+    with transaction.atomic():
+        Document.objects.all().delete()
+        Document.objects.bulk_create(
+            [Document(form_id = form_id, dimension = dimension, answers = answers) for (form_id, dimension), answers in documents.items()],
+            batch_size = batch_size
+        )
+    return len(documents)
+
+def copy_documents_to_tables(apps = global_apps):
+    """
+    Copia les respostes dels documents JSON a les taules de subdimensió, creant les files que no existeixin.
+
+    :param apps: registre de models (el global o el d'una migració).
+    :return (int): documents copiats.
+    """
+    Document = apps.get_model("processdata", "DimensionDocument")
+    count = 0
+
+    with transaction.atomic():
+        for document in Document.objects.iterator():
+            for section_id, values in document.answers.items():
+                if section_id not in SECTION_DIMENSIONS: # Subdimensió eliminada del JSON de preguntes
+                    continue
+                Model = apps.get_model("processdata", section_id)
+                field_names = set(get_field_names(Model))
+                defaults = {field: value for field, value in values.items() if field in field_names}
+                Model.objects.update_or_create(subform_id = document.form_id, defaults = defaults)
+            count += 1
+    return count
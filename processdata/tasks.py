@@ -0,0 +1,224 @@
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils.timezone import now
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+# Configuració per defecte (es pot sobreescriure amb TASK_QUEUE a settings.py)
+DEFAULT_TASK_QUEUE = {
+    "WORKERS": 2,
+    "POLL_INTERVAL": 1,
+    "LEASE_TIMEOUT": 300,
+    "MAX_ATTEMPTS": 5,
+    "RETRY_DELAY": 10,
+    "MAX_RETRY_DELAY": 3600,
+    "KEEP_FINISHED": 7,
+}
+
+# Tasques candidates llegides per cada intent de reserva (si un altre worker se les emporta, es prova la següent)
+CLAIM_CANDIDATES = 10
+
+#----------------------------------------------------------------
+#---------------------------- REGISTRE --------------------------
+#----------------------------------------------------------------
+
+# Funcions que es poden encuar: nom -> funció
+tasks_registry = {}
+
+def register_task(name):
+    """
+    Decorador que registra una funció com a tasca en segon pla. La funció rep el contingut de `payload` com a paràmetres
+    amb nom; si llança una excepció, la tasca es torna a provar més tard (veure `retry_delay`).
+
+    :param name (str): nom de la tasca (es desa a Task.name).
+    """
+    def decorator(func):
+        tasks_registry[name] = func
+        return func
+    return decorator
+
+def get_task_queue_config():
+    return {**DEFAULT_TASK_QUEUE, **getattr(settings, "TASK_QUEUE", {})}
+
+def get_tasks():
+    """
+    Retorna les tasques registrades: {nom: funció}.
+    """
+    from . import jobs # registra les tasques de l'aplicació
+    return tasks_registry
+
+#----------------------------------------------------------------
+#----------------------------- CUA ------------------------------
+#----------------------------------------------------------------
+
+def enqueue(name, payload = None, delay = 0, key = None, max_attempts = None):
+    """
+    Afegeix una tasca a la cua. La fila es desa dins de la transacció actual: si es desfà, la tasca no s'encua, i
+    si es confirma, la tasca no es perd encara que el procés s'aturi (a diferència d'un fil o d'un executor).
+
+    :param name (str): nom d'una tasca registrada (`register_task`).
+    :param payload (dict): paràmetres de la funció (serialitzables en JSON).
+    :param delay (float): segons abans de poder-la executar.
+    :param key (str): si ja hi ha una tasca pendent o en execució amb aquesta clau, no se n'afegeix cap altra
+                      (restricció única a la base de dades: també entre processos concurrents).
+    :param max_attempts (int): intents màxims. Per defecte, TASK_QUEUE["MAX_ATTEMPTS"].
+    :return (Task): tasca encuada, o None si ja n'hi havia una amb la mateixa clau.
+    """
+    if name not in get_tasks():
+        raise ValueError(f"Unknown task: {name}")
+    if key is not None and Task.objects.filter(key = key, status__in = ("queued", "running")).exists():
+        return None
+    try:
+        with transaction.atomic():
+            return Task.objects.create(
+                name = name,
+                payload = payload or {},
+                key = key,
+                run_at = now() + timedelta(seconds = delay),
+                max_attempts = max_attempts or get_task_queue_config()["MAX_ATTEMPTS"]
+            )
+    except IntegrityError: # Un altre procés l'ha encuada entre la comprovació i la inserció (restricció task_pending_key)
+        return None
+
+def claim_task(owner):
+    """
+    Reserva la següent tasca pendent per a un worker. Cada tasca es reserva amb un UPDATE condicional sobre la seva
+    fila (només si encara està `queued`), de manera que dos workers (fils o processos) no poden executar la mateixa.
+
+    :param owner (str): identificador del worker.
+    :return (Task): tasca reservada (amb l'intent ja comptat), o None si no n'hi ha cap de pendent.
+    """
+    current = now()
+    lease = timedelta(seconds = get_task_queue_config()["LEASE_TIMEOUT"])
+    candidates = Task.objects.filter(status = "queued", run_at__lte = current).order_by("run_at", "pk").values_list("pk", flat = True)
+    for pk in candidates[:CLAIM_CANDIDATES]:
+        claimed = Task.objects.filter(pk = pk, status = "queued").update(
+            status = "running", locked_by = owner, locked_until = current + lease, attempts = F("attempts") + 1
+        )
+        if claimed:
+            return Task.objects.get(pk = pk)
+    return None
+
+def retry_delay(attempts):
+    """
+    Segons d'espera abans del següent intent: TASK_QUEUE["RETRY_DELAY"] que es dobla a cada intent fallit, fins a MAX_RETRY_DELAY.
+    """
+    config = get_task_queue_config()
+    return min(config["RETRY_DELAY"] * 2 ** (attempts - 1), config["MAX_RETRY_DELAY"])
+
+def run_task(task, owner):
+    """
+    Executa una tasca reservada i en desa el resultat: `done`, o bé es torna a encuar amb espera exponencial
+    o, si ja no li queden intents, `failed`. Si el worker ha perdut la reserva (LEASE_TIMEOUT superat), no es desa res.
+
+    :return (bool): True si la tasca s'ha executat sense errors.
+    """
+    func = get_tasks().get(task.name)
+    owned = Task.objects.filter(pk = task.pk, status = "running", locked_by = owner)
+    try:
+        if func is None:
+            raise LookupError(f"Unknown task: {task.name}")
+        func(**task.payload)
+    except Exception as e:
+        logger.error(f"Error in task {task.name} #{task.pk} (attempt {task.attempts}/{task.max_attempts}): {e}")
+        if task.attempts < task.max_attempts:
+            owned.update(status = "queued", run_at = now() + timedelta(seconds = retry_delay(task.attempts)), locked_by = "", locked_until = None, last_error = str(e))
+        else:
+            owned.update(status = "failed", finished_at = now(), locked_until = None, last_error = str(e))
+        return False
+    owned.update(status = "done", finished_at = now(), locked_until = None)
+    return True
+
+def requeue_expired():
+    """
+    Recupera les tasques reservades per un worker que s'ha aturat sense acabar-les (reserva caducada): es tornen a
+    encuar o, si ja no els queden intents, es marquen com a `failed`.
+
+    :return (int): tasques recuperades.
+    """
+    expired = Task.objects.filter(status = "running", locked_until__lt = now())
+    failed = expired.filter(attempts__gte = F("max_attempts")).update(status = "failed", finished_at = now(), locked_until = None, last_error = "Lease expired")
+    return failed + expired.update(status = "queued", run_at = now(), locked_by = "", locked_until = None)
+
+def purge_finished(days = None):
+    """
+    Elimina les tasques acabades (`done` o `failed`) fa més de `days` dies (per defecte, TASK_QUEUE["KEEP_FINISHED"]).
+
+    :return (int): tasques eliminades.
+    """
+    days = get_task_queue_config()["KEEP_FINISHED"] if days is None else days
+    return Task.objects.filter(status__in = ("done", "failed"), finished_at__lt = now() - timedelta(days = days)).delete()[0]
+
+#----------------------------------------------------------------
+#---------------------------- WORKERS ---------------------------
+#----------------------------------------------------------------
+
+def get_worker_name(index = 0):
+    return f"{socket.gethostname()}:{os.getpid()}:{index}:{uuid.uuid4().hex[:8]}"
+
+def work(owner, stop_event = None, burst = False):
+    """
+    Bucle d'un worker: reserva i executa tasques fins que `stop_event` s'activa. Si la cua és buida, espera
+    TASK_QUEUE["POLL_INTERVAL"] segons i recupera les reserves caducades.
+
+    :param owner (str): identificador del worker.
+    :param burst (bool): acaba quan la cua és buida (ex: tests, tasques puntuals des de cron).
+    :return (int): tasques executades.
+    """
+    stop_event = stop_event or threading.Event()
+    poll_interval = get_task_queue_config()["POLL_INTERVAL"]
+    count = 0
+    while not stop_event.is_set():
+        try:
+            task = claim_task(owner)
+            if task is not None:
+                run_task(task, owner)
+                count += 1
+                continue
+            if requeue_expired():
+                continue
+        except Exception as e: # ex: base de dades bloquejada; es torna a provar en el següent interval
+            logger.error(f"Error in task worker {owner}: {e}")
+        if burst:
+            break
+        stop_event.wait(poll_interval)
+    return count
+
+def run_workers(workers = None, stop_event = None, burst = False):
+    """
+    Executa `workers` workers en fils del procés actual fins que `stop_event` s'activa (o, amb `burst`, fins que la cua
+    és buida). Per repartir la feina entre processos, n'hi ha prou d'iniciar més d'un procés: la reserva és per fila.
+
+    :return (int): tasques executades.
+    """
+    workers = workers or get_task_queue_config()["WORKERS"]
+    stop_event = stop_event or threading.Event()
+    counts = [0] * workers
+
+    def target(index):
+        try:
+            counts[index] = work(get_worker_name(index), stop_event, burst)
+        finally:
+            connection.close() # cada fil té la seva connexió
+
+    threads = [threading.Thread(target = target, args = (index,), name = f"task-worker-{index}", daemon = True) for index in range(workers)]
+    for thread in threads:
+        thread.start()
+    logger.info(f"{workers} task workers started: {', '.join(get_tasks())}")
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.5) # permet interrompre l'espera amb Ctrl+C
+    except KeyboardInterrupt:
+        stop_event.set() # les tasques en execució s'acaben abans d'aturar-se
+        for thread in threads:
+            thread.join()
+    return sum(counts)
@@ -1,6 +1,37 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.apps import apps
+import csv
+import json
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from decimal import Decimal
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+from datetime import timedelta
+from django.utils.timezone import now
+from django.db import OperationalError, connection, transaction
+from django.test.utils import CaptureQueriesContext
 from .rating.calculators.environment import * 
 from .rating.calculators.socioeconomic import * 
+from .models import UserFingerprint, Form, Overview, SocioeconomicDimension, DimensionDocument, JobLock, JobRun, Task, create_forms, get_subdimension_models
+from .getdata import get_results, get_socioeconomic_data, save_dimension_data, save_socioeconomic_data, save_environment_data, save_overview_data, get_overview_data_for_results
+from .geocoding import get_cached_address
+from .storage import copy_tables_to_documents, copy_documents_to_tables
+from .answers import QUESTION_INDEX, clean_answer, get_results_from_answers
+from .rating.batch import BatchStats, score_batch, score_record, summarize_rating
+from .rating.calculate import calculate_rating
+from .codec import JsonResponse, get_available_codecs
+from . import throttle, resolver, heartbeat, scheduler, tasks, geocoding, models as models_module
+from .heartbeat import flush_heartbeats
+from .retention import sweep_expired
+from .export import iter_assessments, get_csv_header
+from .snapshots import compact_scores
+from .bundle import get_question_bundle, write_question_bundle, _bundle_exists
+from .rating.cache import LocalMemoryBackend, RatingCache, get_rating_cache
 
 class HelpersTestCase(TestCase):
     def test_result_from_percentatge_table(self):
@@ -10,6 +41,27 @@ class HelpersTestCase(TestCase):
             result = get_result_from_percentatge_table(pctg, table)
             self.assertEqual(result, index)
 
+    def test_rating_table(self):
+        table = RatingTable({(80, 100): 5, (0, 19.99): 1, (40, 59.99): 3, (20, 39.99): 2, (60, 79.99): 4}) # desordenada
+        correct_responses = {1: 10, 2: 20, 3: 40, 4: 60, 5: 100}
+        for index, pctg in correct_responses.items():
+            self.assertEqual(table.lookup(pctg), index)
+            self.assertEqual(get_result_from_percentatge_table(pctg, table), index)
+
+        # Valors entre 19.99 i 20 pertanyen a l'interval inferior; fora de rang -> valor per defecte
+        self.assertEqual(table.lookup(19.995), 1)
+        self.assertEqual(table.lookup(150), 1)
+        self.assertEqual(table.values(), [1, 2, 3, 4, 5])
+
+        # Consulta de molts valors alhora (mateix ordre que l'entrada)
+        self.assertEqual(table.lookup_many([85, 10, 39.995, -5, 60]), [5, 1, 2, 1, 4])
+
+        # Validació en construir la taula
+        with self.assertRaises(ValueError): # solapament
+            RatingTable({(0, 25): 1, (20, 40): 2})
+        with self.assertRaises(ValueError): # separació no coberta
+            RatingTable({(0, 10): 1, (20, 40): 2})
+
     def test_normalize_score(self):
         # Cas 1: majoria de puntuacions baixa i amb penalització. Poor Level. 
         max_score = 28
@@ -111,6 +163,22 @@ class HelpersTestCase(TestCase):
         self.assertNotIn("name", result)
         self.assertEqual(len(result["messages"]), 1)
 
+    def test_card_content_index(self):
+        # Una entrada per dimensió, secció i puntuació dels JSON de resultats, amb el mateix HTML que es generava a cada crida
+        self.assertEqual(len(CARD_CONTENT), sum(len(data["summaries"]) for criterion in DIM_CRITERION.values() for data in criterion.values()))
+        data = DIM_CRITERION[0]["EconomicDisturbance"]
+        self.assertEqual(CARD_CONTENT[0, "EconomicDisturbance", 4], {"summary": get_html_summary(data["summaries"]["4"]), "advice": data["advices"]["4"]})
+        data = DIM_CRITERION[1]["ghg_reduction"]
+        self.assertEqual(CARD_CONTENT[1, "ghg_reduction", 2]["name"], data["name"])
+        self.assertEqual(
+            get_html_card_sentence("Frase") + CARD_SUMMARIES[1, "ghg_reduction", 2],
+            create_html_sentence_with_summary("Frase", data["summaries"]["2"])
+        )
+
+        # Les targetes retornades són còpies: modificar-les no altera l'índex
+        get_formatted_extra_info("EconomicDisturbance", 4, 0)["summary"] = ""
+        self.assertNotEqual(CARD_CONTENT[0, "EconomicDisturbance", 4]["summary"], "")
+
     def test_create_card_result(self):
         # Paràmetres d’entrada
         card_id = "departments_using_local_suppliers_percentatge"
@@ -2151,4 +2219,1013 @@ class EnvironmentTestCase(TestCase):
         self.assertEqual(results["LiabilityImpact"]["rating"], -5)
         self.assertEqual(results["LiabilityImpact"]["semaphore"], "DRED")
 
+# TEST ACCÉS A DADES
+class GetDataTestCase(TestCase):
+    def setUp(self):
+        self.fingerprint = "test-fingerprint"
+        UserFingerprint.objects.create(fingerprint_id = self.fingerprint)
+
+    def test_results_single_query(self):
+        save_socioeconomic_data(self.fingerprint, {"LocalProcurement": {"departments_using_local_suppliers_percentatge": 45}})
+        save_environment_data(self.fingerprint, {"Energy": {"ghg_reduction": 80}})
+
+        # Totes les subdimensions es carreguen amb una única consulta
+        with self.assertNumQueries(1):
+            results = get_results(self.fingerprint)
+
+        self.assertIn({"departments_using_local_suppliers_percentatge": 45}, results["socioeconomic"]["LocalProcurement"]["answers"])
+        self.assertEqual(results["socioeconomic"]["LocalProcurement"]["title"], "Contractació Local")
+        self.assertIn({"ghg_reduction": 80}, results["environment"]["Energy"]["answers"])
+
+        # Fingerprint inexistent
+        self.assertIsNone(get_results("unknown"))
+
+    def test_create_forms_bulk(self):
+        # Una inserció per taula, independentment del nombre de fingerprints
+        users = [UserFingerprint(fingerprint_id = f"bulk-{i}") for i in range(5)]
+        UserFingerprint.objects.bulk_create(users)
+        users = list(UserFingerprint.objects.filter(fingerprint_id__startswith = "bulk-"))
+        with self.assertNumQueries(3 + 3 + len(get_subdimension_models()) + 2): # + SAVEPOINT / RELEASE
+            forms = create_forms(users)
+
+        self.assertEqual(len(forms), 5)
+        for user in users:
+            self.assertTrue(Overview.objects.filter(form__fingerprint = user).exists())
+            # Mateixos valors per defecte que una subdimensió nova sense respostes
+            self.assertEqual(get_results(user.fingerprint_id), get_results_from_answers({}))
+
+    def test_partial_update(self):
+        subform = SocioeconomicDimension.objects.get(form__fingerprint__fingerprint_id = self.fingerprint)
+        data = {
+            "LocalProcurement": {"departments_using_local_suppliers_percentatge": "45", "large_local_contractors_percentatge": ""},
+            "AdditionalInvolvement": {"economic-participation": "on", "acquiring-shares": "off"},
+        }
+        save_dimension_data(subform, data)
+
+        # Mateixes dades (el formulari envia tota la dimensió a cada pas): només la lectura, cap escriptura
+        with self.assertNumQueries(1):
+            save_dimension_data(subform, data)
+
+        # Un sol camp modificat: un UPDATE només amb aquesta columna
+        data["LocalProcurement"]["departments_using_local_suppliers_percentatge"] = "50"
+        with CaptureQueriesContext(connection) as queries:
+            save_dimension_data(subform, data)
+        updates = [query["sql"] for query in queries.captured_queries if query["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertIn("departments_using_local_suppliers_percentatge", updates[0])
+        self.assertNotIn("large_local_contractors_percentatge", updates[0])
+        self.assertIn({"departments_using_local_suppliers_percentatge": 50}, get_results(self.fingerprint)["socioeconomic"]["LocalProcurement"]["answers"])
+
+    @override_settings(LAZY_SUBDIMENSIONS = True)
+    def test_lazy_subdimensions(self):
+        UserFingerprint.objects.create(fingerprint_id = "lazy-fp")
+        LocalProcurement, Energy = apps.get_model("processdata", "LocalProcurement"), apps.get_model("processdata", "Energy")
+        self.assertFalse(LocalProcurement.objects.filter(subform__form__fingerprint__fingerprint_id = "lazy-fp").exists())
+
+        # Sense files: mateixos resultats que un formulari nou amb totes les files creades
+        self.assertEqual(get_results("lazy-fp"), get_results(self.fingerprint))
+        self.assertEqual(get_socioeconomic_data("lazy-fp"), get_socioeconomic_data(self.fingerprint))
+
+        # La fila es crea en desar la secció per primera vegada i després s'actualitza
+        save_socioeconomic_data("lazy-fp", {"LocalProcurement": {"departments_using_local_suppliers_percentatge": "45"}})
+        save_socioeconomic_data("lazy-fp", {"LocalProcurement": {"large_local_contractors_percentatge": "10"}})
+        rows = LocalProcurement.objects.filter(subform__form__fingerprint__fingerprint_id = "lazy-fp")
+        self.assertEqual(rows.count(), 1)
+        self.assertEqual((rows[0].departments_using_local_suppliers_percentatge, rows[0].large_local_contractors_percentatge), (45, 10))
+        self.assertFalse(Energy.objects.filter(subform__form__fingerprint__fingerprint_id = "lazy-fp").exists())
+        self.assertIn({"departments_using_local_suppliers_percentatge": 45}, get_results("lazy-fp")["socioeconomic"]["LocalProcurement"]["answers"])
+
+# TEST EMMAGATZEMATGE EN DOCUMENTS JSON
+@override_settings(ANSWER_STORAGE = {"BACKEND": "processdata.storage.DocumentStorage"})
+class DocumentStorageTestCase(TestCase):
+    socioeconomic = {
+        "LocalProcurement": {"departments_using_local_suppliers_percentatge": "45"},
+        "AdditionalInvolvement": {"economic-participation": "on", "acquiring-shares": "off"},
+    }
+    environment = {"Energy": {"ghg_reduction": "80"}}
+
+    def save_answers(self, fingerprint):
+        UserFingerprint.objects.create(fingerprint_id = fingerprint)
+        save_socioeconomic_data(fingerprint, self.socioeconomic)
+        save_environment_data(fingerprint, self.environment)
+
+    def test_same_results_as_tables(self):
+        with override_settings(ANSWER_STORAGE = {"BACKEND": "processdata.storage.TableStorage"}):
+            self.save_answers("tables-fp")
+            expected = get_results("tables-fp")
+        self.save_answers("document-fp")
+
+        # Cap fila de subdimensió: un document per dimensió
+        self.assertFalse(apps.get_model("processdata", "LocalProcurement").objects.filter(subform__form__fingerprint__fingerprint_id = "document-fp").exists())
+        self.assertEqual(DimensionDocument.objects.filter(form__fingerprint__fingerprint_id = "document-fp").count(), 2)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(get_results("document-fp"), expected)
+        self.assertIsNone(get_results("unknown"))
+
+    def test_conversion(self):
+        with override_settings(ANSWER_STORAGE = {"BACKEND": "processdata.storage.TableStorage"}):
+            self.save_answers("convert-fp")
+            expected = get_results("convert-fp")
+            copy_tables_to_documents()
+        self.assertEqual(get_results("convert-fp"), expected)
+
+        # Canvi fet amb documents i còpia de tornada a les taules
+        save_environment_data("convert-fp", {"Energy": {"ghg_reduction": "20"}})
+        copy_documents_to_tables()
+        with override_settings(ANSWER_STORAGE = {"BACKEND": "processdata.storage.TableStorage"}):
+            self.assertIn({"ghg_reduction": 20}, get_results("convert-fp")["environment"]["Energy"]["answers"])
+
+# TEST SINCRONITZACIÓ DEL FORMULARI (/sync/)
+class SyncTestCase(TestCase):
+    def setUp(self):
+        self.fingerprint = "sync-fp"
+        UserFingerprint.objects.create(fingerprint_id = self.fingerprint)
+
+    def sync(self, changes, version = None):
+        body = {"fingerprint": self.fingerprint, "version": version, "changes": changes}
+        return self.client.post("/sync/", json.dumps(body), content_type = "application/json")
+
+    def test_delta_across_dimensions(self):
+        response = self.sync({
+            "overview": {"project_name": "Mina"},
+            "socioeconomic": {"LocalProcurement": {"departments_using_local_suppliers_percentatge": "45"}},
+            "environment": {"Energy": {"ghg_reduction": "80"}},
+        }, version = 0)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["version"], 1)
+
+        self.assertEqual(Overview.objects.get(form__fingerprint__fingerprint_id = self.fingerprint).project_name, "Mina")
+        results = get_results(self.fingerprint)
+        self.assertIn({"departments_using_local_suppliers_percentatge": 45}, results["socioeconomic"]["LocalProcurement"]["answers"])
+        self.assertIn({"ghg_reduction": 80}, results["environment"]["Energy"]["answers"])
+
+        # Sense canvis: no s'escriu res i es manté la versió
+        with CaptureQueriesContext(connection) as queries:
+            response = self.sync({"socioeconomic": {}}, version = 1)
+        self.assertEqual(response.json()["version"], 1)
+        self.assertFalse([q for q in queries.captured_queries if q["sql"].startswith(("UPDATE", "INSERT"))])
+
+    def test_version_conflict_and_errors(self):
+        self.sync({"overview": {"phase": "Exploració"}})
+        response = self.sync({"overview": {"phase": "Explotació"}}, version = 0) # versió desactualitzada
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["version"], 1)
+        self.assertEqual(Overview.objects.get(form__fingerprint__fingerprint_id = self.fingerprint).phase, "Exploració")
+
+        self.assertEqual(self.sync({"environment": {"LocalProcurement": {}}}).status_code, 400) # subdimensió d'una altra dimensió
+        self.fingerprint = "unknown"
+        self.assertEqual(self.sync({"overview": {"phase": "Explotació"}}).status_code, 404)
+
+    def test_check_fingerprint_conditional_get(self):
+        url = f"/check-fingerprint/?fingerprint_id={self.fingerprint}"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["registered"])
+        etag = response["ETag"]
+
+        # Formulari sense canvis: 304 amb una única consulta
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH = etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Després d'un desat l'ETag canvia
+        self.sync({"overview": {"project_name": "Mina"}})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH = etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["form"]["overview"]["project_name"], "Mina")
+
+        # last_seen només s'actualitza si és més antic que LAST_SEEN_RESOLUTION
+        UserFingerprint.objects.filter(fingerprint_id = self.fingerprint).update(last_seen = now() - timedelta(hours = 2))
+        self.client.get(url, HTTP_IF_NONE_MATCH = response["ETag"])
+        flush_heartbeats() # escriptura diferida
+        self.assertLess(now() - UserFingerprint.objects.get(fingerprint_id = self.fingerprint).last_seen, timedelta(minutes = 1))
+
+        self.assertFalse(self.client.get("/check-fingerprint/?fingerprint_id=unknown").json()["registered"])
+
+# TEST CACHÉ DE RESULTATS
+class RatingCacheTestCase(TestCase):
+    def test_local_backend_lru_and_ttl(self):
+        backend = LocalMemoryBackend(MAX_ENTRIES = 2, TIMEOUT = 60)
+        backend.set("a", 1)
+        backend.set("b", 2)
+        backend.get("a") # "a" passa a ser la més recent
+        backend.set("c", 3)
+        self.assertEqual(backend.get("a"), 1)
+        self.assertIsNone(backend.get("b")) # expulsada per LRU
+        self.assertEqual(backend.get("c"), 3)
+
+        backend = LocalMemoryBackend(MAX_ENTRIES = 2, TIMEOUT = -1) # caduca immediatament
+        backend.set("a", 1)
+        self.assertIsNone(backend.get("a"))
+
+    def test_get_or_calculate(self):
+        cache = RatingCache(LocalMemoryBackend())
+        calls = []
+        def calculate(answers):
+            calls.append(answers)
+            return {"rating_total": "1/5"}
+
+        answers = {"socioeconomic": {"AdditionalInvolvement": {"answers": [{"economic-participation": True}], "title": "Participació"}}}
+        self.assertEqual(cache.get_or_calculate("fp", answers, calculate), {"rating_total": "1/5"})
+        self.assertEqual(cache.get_or_calculate("fp", answers, calculate), {"rating_total": "1/5"})
+        self.assertEqual(len(calls), 1)
+
+        # Respostes diferents -> nou càlcul
+        other = {"socioeconomic": {}}
+        cache.get_or_calculate("fp", other, calculate)
+        self.assertEqual(len(calls), 2)
+
+        # Una consulta trobada a la caché no hi escriu res
+        with mock.patch.object(cache.backend, "set") as backend_set:
+            cache.get_or_calculate("fp", other, calculate)
+        backend_set.assert_not_called()
+        self.assertEqual(len(calls), 2)
+
+    def test_shared_entry_kept_on_save(self):
+        for fingerprint in ("cache-fp", "cache-other"):
+            UserFingerprint.objects.create(fingerprint_id = fingerprint)
+        cache = get_rating_cache()
+        cache.clear() # entrades d'altres tests amb les mateixes respostes
+        results = get_results("cache-fp")
+        self.assertEqual(results, get_results("cache-other")) # formularis buits: mateix hash
+        cache.get_or_calculate("cache-fp", results, calculate_rating)
+
+        # Un desat d'un usuari no obliga la resta a recalcular
+        save_environment_data("cache-fp", {"Energy": {"ghg_reduction": 80}})
+        calculate = mock.Mock(side_effect = calculate_rating)
+        cache.get_or_calculate("cache-other", get_results("cache-other"), calculate)
+        calculate.assert_not_called()
+        # Respostes noves: nou hash i nou càlcul
+        cache.get_or_calculate("cache-fp", get_results("cache-fp"), calculate)
+        calculate.assert_called_once()
+
+# TEST GEOCODIFICACIÓ INVERSA
+@override_settings(GEOCODER = {"BACKEND": "processdata.geocoding.StubGeocoder", "OPTIONS": {"ADDRESS": "Carrer Major 1, Manresa"}, "ASYNC": False})
+class GeocodingTestCase(TestCase):
+    def setUp(self):
+        self.fingerprint = "geo-fp"
+        UserFingerprint.objects.create(fingerprint_id = self.fingerprint)
+
+    def test_address_resolved_on_save(self):
+        location = {"latitude": 41.72501, "longitude": 1.82602}
+        with self.captureOnCommitCallbacks(execute = True):
+            save_overview_data(self.fingerprint, {"project_name": "Mina", "mine_ubication": location})
+
+        overview = Overview.objects.get(form__fingerprint__fingerprint_id = self.fingerprint)
+        self.assertEqual(overview.mine_address, "Carrer Major 1, Manresa")
+        # Coordenades arrodonides a la caché
+        self.assertEqual(get_cached_address(41.725012, 1.826018), "Carrer Major 1, Manresa")
+
+        # Resultats: l'adreça es llegeix de la base de dades, sense geocodificar
+        with self.settings(GEOCODER = {"BACKEND": "processdata.geocoding.StubGeocoder", "OPTIONS": {"ADDRESS": "Altra"}, "ASYNC": False}):
+            project_data = get_overview_data_for_results(self.fingerprint)
+        self.assertEqual(project_data["mine_address"], "Carrer Major 1, Manresa")
+        self.assertNotIn("mine_ubication", project_data)
+
+    def test_rolled_back_resolution_is_not_pending(self):
+        overview = Overview.objects.get(form__fingerprint__fingerprint_id = self.fingerprint)
+        overview.mine_ubication = "41.1,1.1"
+        with self.settings(GEOCODER = {"BACKEND": "processdata.geocoding.StubGeocoder", "ASYNC": True}), \
+             mock.patch.object(geocoding._executor, "submit") as submit:
+            # Transacció desfeta (ex: error en una altra dimensió del mateix /sync/): cap resolució pendent
+            with self.assertRaises(ValueError), self.captureOnCommitCallbacks(execute = True):
+                with transaction.atomic():
+                    geocoding.schedule_address_resolution(overview)
+                    raise ValueError("rollback")
+            self.assertNotIn(overview.pk, geocoding._pending)
+
+            with self.captureOnCommitCallbacks(execute = True):
+                geocoding.schedule_address_resolution(overview)
+                geocoding.schedule_address_resolution(overview) # una sola resolució per Overview
+        submit.assert_called_once()
+        geocoding._pending.discard(overview.pk)
+
+    def test_request_slots_are_not_shared(self):
+        # Reserves simultànies des de diversos fils (vistes asíncrones sota WSGI): cada una obté un interval diferent
+        start = time.monotonic() + 100
+        with mock.patch.object(geocoding, "_next_request_at", start):
+            threads = [threading.Thread(target = geocoding._reserve_request_slot) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertAlmostEqual(geocoding._next_request_at, start + 8 * geocoding.REQUEST_INTERVAL)
+
+    def test_sync_requests_share_slots(self):
+        # Peticions síncrones seguides (ex: executor del geocodificador): cada una espera el seu interval
+        geocoder = geocoding.NominatimGeocoder()
+        with mock.patch.object(geocoding, "_next_request_at", 0.0), \
+             mock.patch.object(geocoding, "reverse_geocode", return_value = "Carrer Major") as reverse, \
+             mock.patch.object(geocoding.time, "sleep") as sleep:
+            for _ in range(3):
+                self.assertEqual(geocoder.reverse(41.1, 1.1), "Carrer Major")
+        self.assertEqual(reverse.call_count, 3)
+        # Amb l'espera simulada els intervals s'acumulen: la segona petició espera 1 s i la tercera 2 s
+        waits = [call.args[0] for call in sleep.call_args_list]
+        self.assertEqual(len(waits), 2)
+        for index, wait in enumerate(waits, start = 1):
+            self.assertAlmostEqual(wait, index * geocoding.REQUEST_INTERVAL, places = 1)
+
+    def test_missing_address(self):
+        project_data = get_overview_data_for_results(self.fingerprint)
+        self.assertIsNone(project_data["mine_address"])
+        self.assertEqual(get_overview_data_for_results("unknown"), {})
+
+# TEST AVALUACIÓ PER LOTS
+class BatchScoringTestCase(TestCase):
+    answers = {
+        "departments_using_local_suppliers_percentatge": "45",
+        "economic-participation": "on",
+        "acquiring-shares": "off",
+        "ghg_reduction": "80",
+        "area_alterada": 30,
+    }
+
+    def test_answers_match_database_path(self):
+        # Mateixes respostes desades des del formulari web i avaluades per lots
+        UserFingerprint.objects.create(fingerprint_id = "batch-fp")
+        save_socioeconomic_data("batch-fp", {
+            "LocalProcurement": {"departments_using_local_suppliers_percentatge": "45"},
+            "AdditionalInvolvement": {"economic-participation": "on", "acquiring-shares": "off"},
+        })
+        save_environment_data("batch-fp", {"Energy": {"ghg_reduction": "80"}, "LandformChanges": {"area_alterada": 30}})
+
+        expected = summarize_rating(calculate_rating(get_results("batch-fp"), render = False))
+        result = score_record({"id": "site-1", "answers": self.answers})
+        self.assertEqual(result["id"], "site-1")
+        self.assertEqual({k: result[k] for k in expected}, expected)
+        self.assertEqual(result["sections"]["LocalProcurement"], "3/5")
+
+    def test_scores_only_matches_rendered(self):
+        # El mode només puntuacions ha de donar els mateixos números que el càlcul complet, sense contingut HTML
+        form_answers = get_results_from_answers(self.answers)
+        rendered = calculate_rating(form_answers)
+        scores = calculate_rating(form_answers, render = False)
+
+        self.assertEqual(f"{scores['rating']}/{scores['out_of']}", rendered["rating_total"])
+        self.assertEqual(f"{scores['nrating']}/100", rendered["nrating_total"])
+        for dimension in ["socioeconomic", "environment"]:
+            self.assertEqual(f"{scores[dimension]['rating']}/{scores[dimension]['out_of']}", rendered[dimension]["rating_total"])
+            for section, content in scores[dimension]["result"].items():
+                self.assertEqual(f"{content['rating']}/{content['out_of']}", rendered[dimension]["result"][section]["rating_total"])
+                self.assertNotIn("summary", content)
+                for card in content.get("cards", {}).values():
+                    self.assertEqual(set(card), {"rating", "out_of"})
+        self.assertEqual(scores["environment"]["result"]["Energy"]["cards"]["ghg_reduction"], {"rating": 5, "out_of": 5})
+        # La presentació es restaura després del càlcul
+        self.assertIn("summary", calculate_rating(form_answers)["socioeconomic"]["result"]["LocalProcurement"]["subsection_results"][0]["LocalProcurement"]["departments_using_local_suppliers_percentatge"])
+
+    def test_score_batch(self):
+        records = [
+            {"id": "site-1", "answers": self.answers},
+            {"id": "site-2", "answers": {"ghg_reduction": "abc"}}, # valor no vàlid
+            {"id": "site-3", "answers": {"unknown_question": 1}},
+        ]
+        stats = BatchStats()
+        results = list(score_batch(records, workers = 1, chunksize = 2, stats = stats))
+
+        self.assertEqual([r["id"] for r in results], ["site-1", "site-2", "site-3"])
+        self.assertNotIn("error", results[0])
+        self.assertIn("error", results[1])
+        self.assertIn("error", results[2])
+        self.assertEqual((stats.count, stats.errors), (3, 2))
+
+    def test_clean_answer(self):
+        self.assertTrue(clean_answer("economic-participation", "Sí"))
+        self.assertEqual(clean_answer("ghg_reduction", "12.5"), 12.5)
+        self.assertIsNone(clean_answer("ghg_reduction", ""))
+        self.assertEqual(clean_answer("modifications_type", "scavages;fillers"), str(["scavages", "fillers"]))
+        with self.assertRaises(ValueError):
+            clean_answer("modifications_type", ["not-an-option"])
+
+# TEST PAQUET DE PREGUNTES DE L'AVALUADOR
+class QuestionBundleTestCase(TestCase):
+    def test_inline_markup_without_bundle(self):
+        with override_settings(STATIC_ROOT = tempfile.mkdtemp()):
+            _bundle_exists.cache_clear()
+            response = self.client.get("/evaluator/")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'id="ghg_reduction"')
+        self.assertNotContains(response, "assets/build/questions.")
+
+    def test_hashed_bundle(self):
+        directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(directory, "assets/build"))
+        open(os.path.join(directory, "assets/build/questions.000000000000.js"), "w").close() # paquet d'una versió anterior
+
+        name, content = get_question_bundle()
+        self.assertRegex(name, r"^assets/build/questions\.[0-9a-f]{12}\.js$")
+        self.assertIn("ghg_reduction", content)
+        path = write_question_bundle(directory)
+        self.assertEqual(os.listdir(os.path.join(directory, "assets/build")), [os.path.basename(path)])
+
+        # Amb el paquet generat, l'avaluador només inclou l'script i els contenidors buits
+        with override_settings(STATIC_ROOT = directory):
+            _bundle_exists.cache_clear()
+            response = self.client.get("/evaluator/")
+        _bundle_exists.cache_clear()
+        self.assertContains(response, f'src="/static/{name}"')
+        self.assertContains(response, '<div id="environment-questions"></div>')
+        self.assertNotContains(response, 'id="ghg_reduction"')
+
+# TEST VISTES ASÍNCRONES
+@override_settings(GEOCODER = {"BACKEND": "processdata.geocoding.StubGeocoder", "OPTIONS": {"ADDRESS": "Plaça Major 2, Vic"}, "ASYNC": True})
+class AsyncViewsTestCase(TestCase):
+    def setUp(self):
+        self.fingerprint = "async-fp"
+
+    def test_fingerprint_sync_and_check(self):
+        response = self.client.post("/async/save-fingerprint/", json.dumps({"fingerprint_id": self.fingerprint}), content_type = "application/json")
+        self.assertTrue(response.json()["new"])
+        self.assertTrue(Overview.objects.filter(form__fingerprint__fingerprint_id = self.fingerprint).exists())
+
+        body = {"fingerprint": self.fingerprint, "version": 0, "changes": {"overview": {"project_name": "Mina"}}}
+        response = self.client.post("/async/sync/", json.dumps(body), content_type = "application/json")
+        self.assertEqual(response.json()["version"], 1)
+
+        # Mateixa resposta i ETag que la vista síncrona
+        url = f"check-fingerprint/?fingerprint_id={self.fingerprint}"
+        expected, response = self.client.get(f"/{url}"), self.client.get(f"/async/{url}")
+        self.assertEqual(response.json(), expected.json())
+        self.assertEqual(response["ETag"], expected["ETag"])
+        self.assertEqual(self.client.get(f"/async/{url}", HTTP_IF_NONE_MATCH = response["ETag"]).status_code, 304)
+
+    def test_results_resolves_address(self):
+        UserFingerprint.objects.create(fingerprint_id = self.fingerprint)
+        save_overview_data(self.fingerprint, {"project_name": "Mina", "mine_ubication": {"latitude": 42.0, "longitude": 2.25}})
+
+        response = self.client.get(f"/async/results/?fingerprintId={self.fingerprint}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["project_data"]["mine_address"], "Plaça Major 2, Vic")
+        self.assertEqual(Overview.objects.get(form__fingerprint__fingerprint_id = self.fingerprint).mine_address, "Plaça Major 2, Vic")
+
+# TEST CÒDEC JSON
+class JsonCodecTestCase(TestCase):
+    def test_codecs_are_equivalent(self):
+        payload = {"form": {"ghg_reduction": 12.5, "name": "Mineria Catalana", "options": ["a", "b"], "empty": None}, 1: True, "amount": Decimal("1.50")}
+        expected = {"form": payload["form"], "1": True, "amount": "1.50"}
+        for codec_class in get_available_codecs():
+            codec = codec_class()
+            self.assertEqual(codec.loads(codec.dumps(payload)), expected)
+            self.assertEqual(codec.loads(b'{"a": [1, "\\u00e0"]}'), {"a": [1, "à"]})
+            with self.assertRaises(ValueError):
+                codec.loads(b"{")
+
+    def test_json_response(self):
+        response = JsonResponse({"message": "Fingerprint saved"}, status = 201)
+        self.assertEqual((response.status_code, response["Content-Type"]), (201, "application/json"))
+        self.assertEqual(json.loads(response.content), {"message": "Fingerprint saved"})
+        with self.assertRaises(TypeError):
+            JsonResponse([1, 2])
+
+# TEST API DE RESULTATS (/api/results/<fingerprint>/)
+class ResultsApiTestCase(TestCase):
+    def setUp(self):
+        self.fingerprint = "api-fp"
+        UserFingerprint.objects.create(fingerprint_id = self.fingerprint)
+        self.url = f"/api/results/{self.fingerprint}/"
+
+    def test_snapshot_refreshed_on_save(self):
+        self.assertEqual(self.client.get(self.url).status_code, 404) # encara no s'ha desat cap resposta
+
+        # El desat només encua el recàlcul (una tasca per formulari, encara que es desi més d'una vegada)
+        save_environment_data(self.fingerprint, {"Energy": {"ghg_reduction": "70"}})
+        save_environment_data(self.fingerprint, {"Energy": {"ghg_reduction": "80"}})
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertEqual(list(Task.objects.values_list("name", "key")), [("refresh_result_snapshot", f"refresh_result_snapshot:{self.fingerprint}")])
+        self.assertEqual(tasks.work("worker-1", burst = True), 1)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"], calculate_rating(get_results(self.fingerprint), render = False))
+        self.assertFalse(response.json()["stale"])
+
+        # Sense canvis: 304 amb una única consulta, sense recalcular
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH = response["ETag"]).status_code, 304)
+
+        compact = self.client.get(f"{self.url}?format=compact")
+        self.assertNotEqual(compact["ETag"], response["ETag"])
+        self.assertEqual(compact.json()["results"]["rating"], response.json()["results"]["rating"])
+        self.assertIn("energy", [section.lower() for section in compact.json()["results"]["sections"]])
+
+        # Nou desat: canvia l'ETag
+        save_environment_data(self.fingerprint, {"Energy": {"ghg_reduction": "10"}})
+        tasks.work("worker-1", burst = True)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH = response["ETag"]).status_code, 200)
+
+# TEST LÍMIT I AGRUPACIÓ DE DESATS (/sync/)
+@override_settings(SAVE_THROTTLE = {"BACKEND": "processdata.throttle.LocalTokenBuckets", "OPTIONS": {"RATE": 0.01, "BURST": 2}, "COALESCE_WINDOW": 60})
+class SaveThrottleTestCase(TestCase):
+    def setUp(self):
+        throttle._throttle = None # cubells i comptadors nous amb la configuració del test
+        self.fingerprint = "throttle-fp"
+        UserFingerprint.objects.create(fingerprint_id = self.fingerprint)
+
+    def tearDown(self):
+        throttle._throttle = None
+        throttle.get_coalescer().pending.clear() # lots d'aquest test (els temporitzadors ja no troben cap lot)
+
+    def sync(self, changes, version):
+        body = {"fingerprint": self.fingerprint, "version": version, "changes": changes}
+        return self.client.post("/sync/", json.dumps(body), content_type = "application/json")
+
+    def test_burst_is_coalesced(self):
+        self.assertEqual(self.sync({"overview": {"project_name": "A"}}, 0).json()["version"], 1)
+        self.assertEqual(self.sync({"overview": {"project_name": "B"}}, 1).json()["version"], 2)
+
+        # Cubell buit: els desats s'agrupen sense escriure a la base de dades
+        response = self.sync({"overview": {"project_name": "C"}, "environment": {"Energy": {"ghg_reduction": "10"}}}, 2)
+        self.assertEqual(response.status_code, 202) # encara no desat: el client l'ha de confirmar
+        self.assertEqual(response.json(), {"message": "Form sync pending", "version": 3, "coalesced": True, "retry_after": 60})
+        self.assertEqual(self.sync({"environment": {"Energy": {"ghg_reduction": "20"}}}, 3).json()["version"], 3)
+        self.assertEqual(self.sync({"overview": {"project_name": "D"}}, 1).status_code, 409)
+        self.assertEqual(Overview.objects.get(form__fingerprint__fingerprint_id = self.fingerprint).project_name, "B")
+
+        # Una sola escriptura amb l'últim valor de cada camp
+        self.assertEqual(throttle.get_coalescer().flush(self.fingerprint), 3)
+        self.assertEqual(Overview.objects.get(form__fingerprint__fingerprint_id = self.fingerprint).project_name, "C")
+        self.assertIn({"ghg_reduction": 20}, get_results(self.fingerprint)["environment"]["Energy"]["answers"])
+        self.assertEqual(throttle.get_save_stats(), {"hits": 2, "coalesced": 2, "dropped": 0, "flushes": 1, "discarded": 0, "pending": 0})
+
+    def coalesce(self):
+        self.sync({"overview": {"project_name": "A"}}, 0)
+        self.sync({"overview": {"project_name": "B"}}, 1)
+        self.assertEqual(self.sync({"overview": {"project_name": "C"}}, 2).status_code, 202)
+
+    def test_concurrent_write_discards_batch(self):
+        self.coalesce()
+        # Desat d'un altre procés (o reenviament complet del client) abans de desar el lot
+        save_overview_data(self.fingerprint, {"project_name": "Nou"})
+        self.assertIsNone(throttle.get_coalescer().flush(self.fingerprint))
+        self.assertEqual(Overview.objects.get(form__fingerprint__fingerprint_id = self.fingerprint).project_name, "Nou")
+        self.assertEqual(throttle.get_save_stats()["discarded"], 1)
+
+    def test_failed_flush_is_retried(self):
+        self.coalesce()
+        coalescer = throttle.get_coalescer()
+        with mock.patch("processdata.throttle.sync_form_data", side_effect = OperationalError("database is locked")), \
+             mock.patch.object(coalescer, "_schedule") as schedule:
+            self.assertIsNone(coalescer.flush(self.fingerprint))
+        schedule.assert_called_once_with(self.fingerprint, 60)
+        self.assertEqual(coalescer.pending[self.fingerprint].attempts, 1) # el lot no es perd
+
+        self.assertEqual(self.sync({"overview": {"company_name": "Empresa"}}, 3).status_code, 202) # confirmació durant el reintent
+        self.assertEqual(coalescer.flush(self.fingerprint), 3)
+        overview = Overview.objects.get(form__fingerprint__fingerprint_id = self.fingerprint)
+        self.assertEqual((overview.project_name, overview.company_name), ("C", "Empresa"))
+
+    def test_dropped_without_coalescing(self):
+        with self.settings(SAVE_THROTTLE = {"OPTIONS": {"RATE": 0.5, "BURST": 1}, "COALESCE_WINDOW": 0}):
+            self.assertEqual(self.sync({"overview": {"project_name": "A"}}, 0).status_code, 200)
+            response = self.sync({"overview": {"project_name": "B"}}, 1)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "2")
+        self.assertEqual(throttle.get_save_stats()["dropped"], 1)
+
+# TEST EXPORTACIÓ D'AVALUACIONS
+class ExportTestCase(TestCase):
+    def setUp(self):
+        for fingerprint in ("export-a", "export-b", "export-c"):
+            UserFingerprint.objects.create(fingerprint_id = fingerprint)
+        save_overview_data("export-a", {"project_name": "Mina A"})
+        with self.captureOnCommitCallbacks(execute = True): # export-a amb instantània de resultats
+            save_environment_data("export-a", {"Energy": {"ghg_reduction": "80"}})
+        save_environment_data("export-b", {"Energy": {"ghg_reduction": "10"}})
+
+    def test_iter_assessments(self):
+        # Consultes constants per bloc: formularis, overview, instantànies i respostes
+        with self.assertNumQueries(4):
+            records = list(iter_assessments(chunk_size = 3))
+        self.assertEqual([record["fingerprint"] for record in records], ["export-a", "export-b", "export-c"])
+        self.assertEqual(records[0]["overview"]["project_name"], "Mina A")
+        self.assertEqual(records[1]["answers"]["ghg_reduction"], 10)
+        for record in records:
+            self.assertEqual(record["scores"], compact_scores(calculate_rating(get_results(record["fingerprint"]), render = False)))
+        self.assertEqual(list(iter_assessments(chunk_size = 2)), records)
+
+    def test_command_and_admin_action(self):
+        output = StringIO()
+        call_command("export_assessments", "--format", "csv", stdout = output, stderr = StringIO())
+        rows = list(csv.reader(StringIO(output.getvalue())))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual({len(row) for row in rows}, {len(get_csv_header())})
+
+        get_user_model().objects.create_superuser("admin", "admin@example.com", "password")
+        self.client.login(username = "admin", password = "password")
+        response = self.client.post("/admin/processdata/userfingerprint/", {
+            "action": "export_assessments_jsonl",
+            "_selected_action": list(UserFingerprint.objects.filter(fingerprint_id = "export-b").values_list("pk", flat = True)),
+        })
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["fingerprint"] for line in lines], ["export-b"])
+
+class ImportTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, lines):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w", encoding = "utf-8", newline = "") as file:
+            file.write("\n".join(lines) + "\n")
+        return path
+
+    def test_import_jsonl(self):
+        UserFingerprint.objects.create(fingerprint_id = "existing")
+        path = self.write("assessments.jsonl", [
+            json.dumps({"fingerprint": "import-a", "overview": {"project_name": "Mina A", "phase": "Operació", "mine_ubication": "41.5,1.9"}, "answers": {"ghg_reduction": 80}}),
+            json.dumps({"fingerprint": "import-b", "ghg_reduction": "10", "project_name": "Mina B"}),
+            json.dumps({"fingerprint": "import-c", "answers": {"ghg_reduction": "molt"}}), # valor no vàlid
+            json.dumps({"fingerprint": "import-d", "overview": {"phase": "Desconeguda"}}), # opció no vàlida
+            json.dumps({"fingerprint": "existing", "answers": {"ghg_reduction": 5}}),
+            json.dumps({"fingerprint": "import-a", "answers": {"ghg_reduction": 5}}), # repetit al fitxer
+        ])
+        output, errors = StringIO(), StringIO()
+        call_command("import_assessments", path, "--chunk-size", "2", stdout = output, stderr = errors)
+        self.assertIn("6 rows read", output.getvalue())
+        self.assertIn("2 imported, 2 skipped", output.getvalue())
+        self.assertIn("Line 3:", errors.getvalue())
+        self.assertIn("Line 4:", errors.getvalue())
+
+        # Mateixes dades que si s'haguessin desat des del formulari web
+        self.assertEqual(get_results("import-a"), get_results_from_answers({"ghg_reduction": 80}))
+        self.assertEqual(get_results("import-b")["environment"], get_results_from_answers({"ghg_reduction": "10"})["environment"])
+        overview = Overview.objects.get(form__fingerprint__fingerprint_id = "import-a")
+        self.assertEqual((overview.project_name, overview.phase, overview.mine_ubication), ("Mina A", "Operació", "41.5,1.9"))
+        self.assertEqual(len(get_socioeconomic_data("import-b")), len(get_socioeconomic_data("existing")))
+
+        # Resultats disponibles a l'API sense recalcular (instantània creada en importar)
+        response = self.client.get("/api/results/import-a/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"], calculate_rating(get_results("import-a"), render = False))
+        self.assertFalse(response.json()["stale"])
+
+    def test_export_round_trip(self):
+        UserFingerprint.objects.create(fingerprint_id = "round-trip")
+        save_overview_data("round-trip", {"project_name": "Mina", "mine_ubication": {"latitude": 41.5, "longitude": 1.9}})
+        save_environment_data("round-trip", {"Energy": {"ghg_reduction": "80"}})
+        # Una pregunta de selecció múltiple: es desa com a text i s'ha de poder tornar a importar
+        input_id, (dimension, section_id, question) = next((input_id, item) for input_id, item in QUESTION_INDEX.items() if item[2]["type"] == "multiple-select")
+        save = save_socioeconomic_data if dimension == "socioeconomic" else save_environment_data
+        save("round-trip", {section_id: {input_id: [option["id"] for option in question["options"][:2]]}})
+
+        exported = StringIO()
+        call_command("export_assessments", "--format", "csv", stdout = exported, stderr = StringIO())
+        expected = list(iter_assessments())
+        UserFingerprint.objects.all().delete()
+
+        path = self.write("assessments.csv", exported.getvalue().splitlines())
+        call_command("import_assessments", path, stdout = StringIO(), stderr = StringIO())
+        for before, after in zip(expected, iter_assessments()):
+            for key in ("fingerprint", "overview", "answers", "scores"):
+                self.assertEqual(before[key], after[key])
+
+    @override_settings(ANSWER_STORAGE = {"BACKEND": "processdata.storage.DocumentStorage"})
+    def test_import_documents(self):
+        path = self.write("assessments.csv", ["fingerprint,ghg_reduction", "import-doc,80", "import-empty,"])
+        call_command("import_assessments", path, stdout = StringIO(), stderr = StringIO())
+        self.assertEqual(DimensionDocument.objects.get(form__fingerprint__fingerprint_id = "import-doc").answers, {"Energy": {"ghg_reduction": 80.0}})
+        self.assertFalse(DimensionDocument.objects.filter(form__fingerprint__fingerprint_id = "import-empty").exists())
+        self.assertEqual(get_results("import-doc"), get_results_from_answers({"ghg_reduction": 80}))
+
+class FormResolverTestCase(TestCase):
+    def setUp(self):
+        self.addCleanup(setattr, resolver, "_resolver", None)
+        resolver._resolver = None
+        self.fingerprint = "resolver-fp"
+        UserFingerprint.objects.create(fingerprint_id = self.fingerprint)
+        save_environment_data(self.fingerprint, {"Energy": {"ghg_reduction": "80"}})
+        self.form_id = Overview.objects.get(form__fingerprint__fingerprint_id = self.fingerprint).pk
+
+    def fingerprint_joins(self, queries):
+        return [query["sql"] for query in queries.captured_queries if "processdata_userfingerprint" in query["sql"]]
+
+    def test_known_form_without_join(self):
+        expected = get_results(self.fingerprint)
+        resolver.get_form_resolver().lru.set(self.fingerprint, self.form_id) # resolt en una petició anterior
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(get_results(self.fingerprint), expected)
+            self.assertEqual(get_overview_data_for_results(self.fingerprint)["project_name"], None)
+        self.assertEqual(len(queries.captured_queries), 2)
+        self.assertEqual(self.fingerprint_joins(queries), [])
+
+    def test_stale_and_deleted(self):
+        expected = get_results(self.fingerprint)
+        lru = resolver.get_form_resolver().lru
+        lru.set(self.fingerprint, self.form_id + 1000) # formulari eliminat des d'un altre procés
+        self.assertEqual(get_results(self.fingerprint), expected)
+        self.assertIsNone(lru.get(self.fingerprint))
+
+        lru.set(self.fingerprint, self.form_id)
+        UserFingerprint.objects.filter(fingerprint_id = self.fingerprint).delete()
+        self.assertIsNone(lru.get(self.fingerprint))
+        self.assertIsNone(get_results(self.fingerprint))
+
+    def test_request_memo(self):
+        # Vista de resultats: només la primera consulta del fingerprint fa el JOIN
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"/results/?fingerprintId={self.fingerprint}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.fingerprint_joins(queries)), 1)
+        self.assertIsNone(resolver.get_form_resolver().lru.get(self.fingerprint)) # dins d'una transacció sense confirmar
+
+class HeartbeatTestCase(TestCase):
+    def setUp(self):
+        self.addCleanup(setattr, heartbeat, "_writer", None)
+        heartbeat._writer = None
+        self.users = [UserFingerprint.objects.create(fingerprint_id = f"heartbeat-{i}") for i in range(3)]
+        UserFingerprint.objects.update(last_seen = now() - timedelta(days = 2))
+
+    def last_seen(self, user):
+        return UserFingerprint.objects.get(pk = user.pk).last_seen
+
+    def test_views_record_without_writing(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post("/save-fingerprint/", json.dumps({"fingerprint_id": "heartbeat-0"}), content_type = "application/json")
+            self.client.get("/check-fingerprint/?fingerprint_id=heartbeat-1")
+        self.assertFalse([query["sql"] for query in queries.captured_queries if query["sql"].startswith("UPDATE")])
+        self.assertLess(now() - self.last_seen(self.users[0]), timedelta(days = 3))
+
+        # Un sol UPDATE per a tots els usuaris pendents
+        with self.assertNumQueries(1):
+            self.assertEqual(flush_heartbeats(), 2)
+        for user in self.users[:2]:
+            self.assertLess(now() - self.last_seen(user), timedelta(minutes = 1))
+        self.assertGreater(now() - self.last_seen(self.users[2]), timedelta(days = 1))
+        self.assertEqual(flush_heartbeats(), 0)
+
+    def test_write_heartbeats(self):
+        recent, older = now(), now() - timedelta(days = 3)
+        self.assertEqual(heartbeat.write_heartbeats({self.users[0].pk: recent, self.users[1].pk: older, 999999: recent}), 2)
+        self.assertEqual(self.last_seen(self.users[0]), recent)
+        self.assertGreater(now() - self.last_seen(self.users[1]), timedelta(days = 1)) # no retrocedeix
+
+class RetentionTestCase(TestCase):
+    def setUp(self):
+        for i in range(5):
+            UserFingerprint.objects.create(fingerprint_id = f"retention-{i}")
+            save_environment_data(f"retention-{i}", {"Energy": {"ghg_reduction": "80"}})
+        tasks.work("worker-1", burst = True) # amb instantània de resultats
+        UserFingerprint.objects.exclude(fingerprint_id = "retention-4").update(last_seen = now() - timedelta(days = 10))
+
+    def assert_only_active_left(self):
+        self.assertEqual(list(UserFingerprint.objects.values_list("fingerprint_id", flat = True)), ["retention-4"])
+        form_id = Overview.objects.get(form__fingerprint__fingerprint_id = "retention-4").pk
+        for model in [Overview, SocioeconomicDimension, *get_subdimension_models(), apps.get_model("processdata", "ResultSnapshot")]:
+            self.assertEqual(list(model.objects.values_list("pk", flat = True)), [form_id])
+
+    def test_sweep_in_batches(self):
+        with CaptureQueriesContext(connection) as first:
+            stats = sweep_expired(batch_size = 1, sleep = 0, max_batches = 1)
+        self.assertEqual((stats.users, stats.batches), (1, 1))
+
+        # Es reprèn on s'havia quedat, amb el mateix nombre de consultes per bloc (independent dels usuaris del bloc)
+        with CaptureQueriesContext(connection) as second:
+            sweep_expired(batch_size = 3, sleep = 0, start_after = stats.last_pk, max_batches = 1, stats = stats)
+        self.assertEqual(len(first.captured_queries), len(second.captured_queries))
+        self.assertEqual(stats.users, 4)
+        self.assert_only_active_left()
+        self.assertEqual(stats.rows, 4 * (1 + 1 + 1 + 3 + 1 + len(get_subdimension_models()) + 1))
+
+    @override_settings(ANSWER_STORAGE = {"BACKEND": "processdata.storage.DocumentStorage"})
+    def test_command_with_documents(self):
+        save_environment_data("retention-0", {"Energy": {"ghg_reduction": "10"}})
+        output = StringIO()
+        call_command("sweep_retention", "--dry-run", stdout = output)
+        self.assertIn("4 users", output.getvalue())
+        call_command("sweep_retention", "--sleep", "0", stdout = output)
+        self.assertIn("rows/s", output.getvalue())
+        self.assertIn("peak memory", output.getvalue())
+        self.assert_only_active_left()
+        self.assertFalse(DimensionDocument.objects.exists())
+
+@override_settings(GEOCODER = {"BACKEND": "processdata.geocoding.StubGeocoder", "OPTIONS": {"ADDRESS": "Carrer Nou 2, Súria"}, "ASYNC": False})
+class SchedulerTestCase(TestCase):
+    def setUp(self):
+        for fingerprint in ("job-active", "job-expired"):
+            UserFingerprint.objects.create(fingerprint_id = fingerprint)
+        UserFingerprint.objects.filter(fingerprint_id = "job-expired").update(last_seen = now() - timedelta(days = 30))
+        Overview.objects.filter(form__fingerprint__fingerprint_id = "job-active").update(mine_ubication = "41.8312,1.7523")
+
+    def test_lock(self):
+        self.assertTrue(scheduler.acquire_lock("job", owner = "a"))
+        self.assertTrue(scheduler.acquire_lock("job", owner = "a")) # renovació del propi bloqueig
+        self.assertFalse(scheduler.acquire_lock("job", owner = "b"))
+        JobLock.objects.filter(name = "job").update(expires_at = now() - timedelta(seconds = 1)) # procés aturat sense alliberar-lo
+        self.assertTrue(scheduler.acquire_lock("job", owner = "b"))
+        scheduler.release_lock("job", owner = "b")
+        self.assertFalse(JobLock.objects.exists())
+
+    @override_settings(RETENTION = {"SLEEP": 0, "BATCH_SIZE": 1})
+    def test_renew_lock(self):
+        from .jobs import retention_sweep
+        scheduler.acquire_lock("job", owner = "a", timeout = 1)
+        self.assertTrue(scheduler.renew_lock("job", owner = "a"))
+        self.assertGreater(JobLock.objects.get(name = "job").expires_at, now() + timedelta(seconds = 3000))
+        self.assertFalse(scheduler.renew_lock("job", owner = "b"))
+
+        # La neteja renova el bloqueig de la tasca a cada bloc
+        for fingerprint in ("job-expired-2", "job-expired-3"):
+            UserFingerprint.objects.create(fingerprint_id = fingerprint)
+        UserFingerprint.objects.filter(fingerprint_id__startswith = "job-expired").update(last_seen = now() - timedelta(days = 30))
+        renewed = []
+        def renew():
+            renewed.append(scheduler.renew_lock())
+            return renewed[-1]
+        with mock.patch("processdata.jobs.renew_lock", side_effect = renew):
+            scheduler.run_due_jobs(owner = "worker-1", force = ["retention_sweep"])
+        self.assertEqual(renewed, [True] * 4) # 3 blocs amb un usuari i l'últim buit
+        self.assertFalse(UserFingerprint.objects.filter(fingerprint_id__startswith = "job-expired").exists())
+
+        # Bloqueig perdut (caducat i pres per un altre procés): la neteja s'atura
+        for fingerprint in ("job-expired-4", "job-expired-5"):
+            UserFingerprint.objects.create(fingerprint_id = fingerprint)
+        UserFingerprint.objects.filter(fingerprint_id__startswith = "job-expired").update(last_seen = now() - timedelta(days = 30))
+        with mock.patch("processdata.jobs.renew_lock", side_effect = [True, False]):
+            retention_sweep()
+        self.assertEqual(UserFingerprint.objects.filter(fingerprint_id__startswith = "job-expired").count(), 1)
+
+    @override_settings(RETENTION = {"SLEEP": 0})
+    def test_run_due_jobs(self):
+        runs = {run.job: run for run in scheduler.run_due_jobs(owner = "worker-1")}
+        self.assertEqual(set(runs), {"retention_sweep", "warm_results_cache", "geocode_backfill", "purge_tasks"})
+        self.assertEqual([run.status for run in runs.values()], ["ok"] * 4)
+        self.assertEqual(runs["retention_sweep"].rows, 1 + 1 + 1 + 3 + 1 + len(get_subdimension_models()))
+        self.assertEqual(runs["warm_results_cache"].rows, 1)
+        self.assertEqual(runs["geocode_backfill"].rows, 1)
+        self.assertFalse(UserFingerprint.objects.filter(fingerprint_id = "job-expired").exists())
+        self.assertEqual(Overview.objects.get(form__fingerprint__fingerprint_id = "job-active").mine_address, "Carrer Nou 2, Súria")
+
+        # Cap tasca pendent fins al següent interval
+        self.assertEqual(scheduler.run_due_jobs(owner = "worker-2"), [])
+        self.assertEqual(JobRun.objects.count(), 4)
+
+        # Tasca bloquejada per un altre worker: no s'executa
+        scheduler.acquire_lock("warm_results_cache", owner = "worker-1")
+        self.assertEqual(scheduler.run_due_jobs(owner = "worker-2", force = ["warm_results_cache"]), [])
+
+    def test_geocode_backfill_skips_failed(self):
+        from .jobs import geocode_backfill
+        UserFingerprint.objects.create(fingerprint_id = "job-other")
+        Overview.objects.filter(form__fingerprint__fingerprint_id = "job-other").update(mine_ubication = "41.9,1.8")
+
+        # Coordenades sense adreça: l'intent es marca i no es torna a provar a la següent execució
+        with mock.patch("processdata.jobs.resolve_overview_address", return_value = None) as resolve:
+            self.assertEqual(geocode_backfill(), 0)
+            self.assertEqual(resolve.call_count, 2)
+            self.assertEqual(geocode_backfill(), 0)
+            self.assertEqual(resolve.call_count, 2)
+        self.assertEqual(Overview.objects.filter(geocode_failed_at__isnull = False).count(), 2)
+
+        # Passat l'interval es torna a provar; les files fallides recents no bloquegen la resta
+        Overview.objects.filter(form__fingerprint__fingerprint_id = "job-other").update(geocode_failed_at = now() - timedelta(days = 2))
+        self.assertEqual(geocode_backfill(), 1)
+        self.assertEqual(Overview.objects.get(form__fingerprint__fingerprint_id = "job-other").mine_address, "Carrer Nou 2, Súria")
+
+        # Noves coordenades: s'esborra la marca de l'intent fallit
+        save_overview_data("job-active", {"mine_ubication": {"latitude": 41.7, "longitude": 1.9}})
+        self.assertIsNone(Overview.objects.get(form__fingerprint__fingerprint_id = "job-active").geocode_failed_at)
+
+    def test_purge_runs(self):
+        from .jobs import purge_tasks
+        for days in (1, 29, 31, 60):
+            JobRun.objects.create(job = "warm_results_cache", owner = "worker-1", started_at = now() - timedelta(days = days), duration = 0.1)
+        self.assertEqual(purge_tasks(), 2) # SCHEDULER["KEEP_RUNS"] = 30 dies
+        self.assertEqual(JobRun.objects.count(), 2)
+        self.assertEqual(scheduler.purge_runs(days = 0), 2)
+
+    @override_settings(GEOCODER = {"BACKEND": "processdata.geocoding.NominatimGeocoder", "ASYNC": False})
+    def test_geocode_backfill_shares_request_slots(self):
+        from .jobs import geocode_backfill
+        UserFingerprint.objects.create(fingerprint_id = "job-other")
+        Overview.objects.filter(form__fingerprint__fingerprint_id = "job-active").update(mine_ubication = "41.8713,1.7011")
+        Overview.objects.filter(form__fingerprint__fingerprint_id = "job-other").update(mine_ubication = "41.8714,1.7012")
+        # Les peticions de la tasca reserven l'interval compartit amb l'executor i les vistes asíncrones
+        with mock.patch.object(geocoding, "_next_request_at", 0.0), \
+             mock.patch.object(geocoding, "reverse_geocode", return_value = "Carrer Major") as reverse, \
+             mock.patch.object(geocoding, "wait_for_request_slot") as wait:
+            self.assertEqual(geocode_backfill(), 2)
+        self.assertEqual(reverse.call_count, 2)
+        self.assertEqual(wait.call_count, 2)
+
+    def test_command(self):
+        output = StringIO()
+        call_command("run_scheduler", "--job", "warm_results_cache", stdout = output)
+        self.assertIn("warm_results_cache: 2 rows", output.getvalue())
+        self.assertEqual(list(JobRun.objects.values_list("job", flat = True)), ["warm_results_cache"])
+
+# TEST CUA DE TASQUES
+@override_settings(TASK_QUEUE = {"RETRY_DELAY": 10, "MAX_RETRY_DELAY": 15, "LEASE_TIMEOUT": 60})
+class TaskQueueTestCase(TestCase):
+    def setUp(self):
+        self.calls = []
+        tasks.tasks_registry["test_task"] = self.record_call
+
+    def tearDown(self):
+        tasks.tasks_registry.pop("test_task", None)
+
+    def record_call(self, value, fail = False):
+        self.calls.append(value)
+        if fail:
+            raise RuntimeError("Failed")
+
+    def test_enqueue_and_claim(self):
+        task = tasks.enqueue("test_task", {"value": 1}, key = "one")
+        self.assertIsNone(tasks.enqueue("test_task", {"value": 1}, key = "one")) # ja pendent
+        # Dos processos alhora: tots dos passen la comprovació, però la restricció única només en desa una
+        with mock.patch("django.db.models.query.QuerySet.exists", return_value = False):
+            self.assertIsNone(tasks.enqueue("test_task", {"value": 1}, key = "one"))
+        self.assertEqual(Task.objects.filter(key = "one").count(), 1)
+        with self.assertRaises(ValueError):
+            tasks.enqueue("unknown")
+
+        claimed = tasks.claim_task("worker-1")
+        self.assertEqual((claimed.pk, claimed.status, claimed.attempts, claimed.locked_by), (task.pk, "running", 1, "worker-1"))
+        self.assertIsNone(tasks.claim_task("worker-2")) # cap altre worker la pot reservar
+
+        self.assertTrue(tasks.run_task(claimed, "worker-1"))
+        self.assertEqual(self.calls, [1])
+        self.assertEqual(Task.objects.get(pk = task.pk).status, "done")
+        self.assertIsNotNone(tasks.enqueue("test_task", {"value": 2}, key = "one")) # la primera ja s'ha acabat
+
+        # Les tasques acabades fa temps s'eliminen
+        Task.objects.filter(pk = task.pk).update(finished_at = now() - timedelta(days = 30))
+        self.assertEqual(tasks.purge_finished(), 1)
+
+    def test_retry_with_backoff(self):
+        task = tasks.enqueue("test_task", {"value": 1, "fail": True}, max_attempts = 3)
+        self.assertFalse(tasks.run_task(tasks.claim_task("worker-1"), "worker-1"))
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts, task.last_error), ("queued", 1, "Failed"))
+        self.assertGreater(task.run_at, now() + timedelta(seconds = 9))
+        self.assertIsNone(tasks.claim_task("worker-1")) # encara no toca
+        self.assertEqual([tasks.retry_delay(attempts) for attempts in (1, 2, 3)], [10, 15, 15])
+
+        for attempt in (2, 3):
+            Task.objects.filter(pk = task.pk).update(run_at = now())
+            tasks.run_task(tasks.claim_task("worker-1"), "worker-1")
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), ("failed", 3))
+        self.assertEqual(len(self.calls), 3)
+
+    def test_expired_lease(self):
+        task = tasks.enqueue("test_task", {"value": 1}, max_attempts = 2)
+        claimed = tasks.claim_task("worker-1")
+        Task.objects.filter(pk = task.pk).update(locked_until = now() - timedelta(seconds = 1)) # worker aturat
+        self.assertEqual(tasks.requeue_expired(), 1)
+
+        reclaimed = tasks.claim_task("worker-2")
+        self.assertEqual(reclaimed.attempts, 2)
+        tasks.run_task(claimed, "worker-1") # el primer worker ja no té la reserva: no es desa el resultat
+        self.assertEqual(Task.objects.get(pk = task.pk).status, "running")
+        tasks.run_task(reclaimed, "worker-2")
+        self.assertEqual(Task.objects.get(pk = task.pk).status, "done")
+
+        # Sense intents restants: es marca com a fallida
+        tasks.enqueue("test_task", {"value": 2}, max_attempts = 1)
+        tasks.claim_task("worker-1")
+        Task.objects.filter(status = "running").update(locked_until = now() - timedelta(seconds = 1))
+        tasks.requeue_expired()
+        self.assertEqual(Task.objects.get(payload__value = 2).last_error, "Lease expired")
+
+    def test_work_burst(self):
+        for value in range(3):
+            tasks.enqueue("test_task", {"value": value})
+        self.assertEqual(tasks.work("worker-1", burst = True), 3)
+        self.assertEqual(self.calls, [0, 1, 2])
+
+@override_settings(GEOCODER = {"BACKEND": "processdata.geocoding.StubGeocoder", "OPTIONS": {"ADDRESS": "Carrer Nou 2, Súria"}, "QUEUE": True})
+class TaskWorkerTestCase(TransactionTestCase):
+    def test_geocode_in_worker(self):
+        UserFingerprint.objects.create(fingerprint_id = "task-fp")
+        # La resolució de l'adreça s'encua (una sola tasca per Overview) en comptes d'executar-se en un fil del procés web
+        save_overview_data("task-fp", {"mine_ubication": {"latitude": 41.83, "longitude": 1.75}})
+        save_overview_data("task-fp", {"mine_ubication": {"latitude": 41.84, "longitude": 1.76}})
+        self.assertEqual(list(Task.objects.filter(name = "geocode_overview").values_list("status", flat = True)), ["queued"])
+
+        output = StringIO()
+        # Un sol worker: amb la base de dades de test en memòria, dues escriptures simultànies fallen ("table is locked")
+        call_command("run_task_worker", "--burst", "--workers", "1", stdout = output)
+        self.assertIn("2 tasks executed by 1 workers", output.getvalue()) # adreça i instantània de resultats
+        self.assertEqual(set(Task.objects.values_list("status", flat = True)), {"done"})
+        self.assertEqual(Overview.objects.get(form__fingerprint__fingerprint_id = "task-fp").mine_address, "Carrer Nou 2, Súria")
+
+# TEST INSERCIÓ DE LES FILES DELS MODELS FILLS
+class InsertChildrenTestCase(TestCase):
+    def test_bulk_insert_api(self):
+        # insert_children depèn de QuerySet._insert (API interna): si una actualització de Django en canvia la signatura,
+        # cal revisar-lo (mentrestant s'utilitza la inserció fila a fila)
+        self.assertTrue(models_module.has_bulk_insert_api())
+
+    def test_row_by_row_fallback(self):
+        with mock.patch.object(models_module, "BULK_INSERT_API", False):
+            UserFingerprint.objects.create(fingerprint_id = "insert-fp")
+        form = Form.objects.get(fingerprint__fingerprint_id = "insert-fp")
+        self.assertTrue(Overview.objects.filter(pk = form.pk).exists())
+        self.assertTrue(SocioeconomicDimension.objects.filter(pk = form.pk).exists())
+        for model_class in get_subdimension_models():
+            self.assertTrue(model_class.objects.filter(pk = form.pk).exists())
+
 # command: python3 manage.py test
@@ -0,0 +1,324 @@
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+from .models import Form
+from .getdata import VersionConflict, get_form_version, sync_form_data, validate_changes
+
+logger = logging.getLogger(__name__)
+
+# Configuració per defecte (es pot sobreescriure amb SAVE_THROTTLE a settings.py)
+DEFAULT_SAVE_THROTTLE = {
+    "BACKEND": "processdata.throttle.LocalTokenBuckets",
+    "OPTIONS": {"RATE": 2, "BURST": 10},
+    "COALESCE_WINDOW": 1.0,
+}
+
+COUNTERS = ("hits", "coalesced", "dropped", "flushes", "discarded")
+
+# Intents de desar un lot si la base de dades falla (ex: bloquejada), separats per COALESCE_WINDOW segons
+MAX_FLUSH_ATTEMPTS = 3
+
+
+class Throttled(Exception):
+    """
+    El fingerprint ha superat el límit de desats i no es poden agrupar (COALESCE_WINDOW = 0).
+
+    :param retry_after(float): segons fins que hi haurà un desat disponible.
+    """
+    def __init__(self, retry_after):
+        super().__init__(f"Retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+#----------------------------------------------------------------
+#--------------------------- BACKENDS ---------------------------
+#----------------------------------------------------------------
+
+class LocalTokenBuckets:
+    """
+    Un cubell de fitxes per fingerprint a la memòria del procés (LRU), amb comptadors locals.
+
+    Cada desat consumeix una fitxa. Les fitxes es recuperen a RATE per segon fins a un màxim de BURST,
+    de manera que s'admeten ràfegues de BURST desats i, després, RATE desats per segon.
+
+    :param RATE (float): fitxes recuperades per segon.
+    :param BURST (int): capacitat del cubell.
+    :param MAX_ENTRIES (int): fingerprints amb cubell en memòria.
+    """
+    def __init__(self, RATE = 2, BURST = 10, MAX_ENTRIES = 10000):
+        self.rate, self.burst, self.max_entries = float(RATE), float(BURST), MAX_ENTRIES
+        self._buckets = OrderedDict() # fingerprint -> (fitxes, instant de l'última recàrrega)
+        self._counters = dict.fromkeys(COUNTERS, 0)
+        self._lock = threading.Lock()
+
+    def consume(self, key):
+        """
+        Consumeix una fitxa del cubell. Retorna (True, 0) si n'hi havia o (False, segons d'espera) si és buit.
+        """
+        with self._lock:
+            current = time.monotonic()
+            tokens, updated = self._buckets.pop(key, (self.burst, current))
+            tokens = min(self.burst, tokens + (current - updated) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, current)
+            if len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last = False)
+            return allowed, 0 if allowed else (1 - tokens) / self.rate
+
+    def incr(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def get_counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+
+class CacheTokenBuckets:
+    """
+    Cubells i comptadors desats al framework de caché de Django (settings.CACHES), compartits entre processos.
+    La lectura i escriptura d'un cubell no és atòmica: amb peticions simultànies d'un mateix fingerprint el límit és aproximat.
+
+    :param RATE (float): fitxes recuperades per segon.
+    :param BURST (int): capacitat del cubell.
+    :param ALIAS (str): àlies de la caché de Django a utilitzar.
+    """
+    def __init__(self, RATE = 2, BURST = 10, ALIAS = "default"):
+        from django.core.cache import caches
+        self.rate, self.burst = float(RATE), float(BURST)
+        self.cache = caches[ALIAS]
+        self.timeout = int(self.burst / self.rate) + 60 # passat aquest temps el cubell torna a estar ple
+
+    def consume(self, key):
+        current = time.time()
+        tokens, updated = self.cache.get(f"throttle:{key}", (self.burst, current))
+        tokens = min(self.burst, tokens + (current - updated) * self.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self.cache.set(f"throttle:{key}", (tokens, current), self.timeout)
+        return allowed, 0 if allowed else (1 - tokens) / self.rate
+
+    def incr(self, counter):
+        self.cache.add(f"throttle-counter:{counter}", 0, None)
+        self.cache.incr(f"throttle-counter:{counter}")
+
+    def get_counters(self):
+        return {counter: self.cache.get(f"throttle-counter:{counter}", 0) for counter in COUNTERS}
+
+#----------------------------------------------------------------
+#--------------------------- AGRUPACIÓ --------------------------
+#----------------------------------------------------------------
+
+class PendingSync:
+    """
+    Canvis acceptats d'un fingerprint pendents de desar. Tots els canvis rebuts durant la finestra d'agrupació
+    es fusionen (l'últim valor de cada camp guanya) i es desen amb una única escriptura, que deixa les respostes a
+    la versió `target`. Només es desen si les respostes encara són a la versió `base`.
+    """
+    def __init__(self, base, window = 0):
+        self.base, self.target = base, base + 1
+        self.window = window
+        self.attempts = 0
+        self.changes = {}
+
+    def merge(self, changes):
+        for reference, values in changes.items():
+            pending = self.changes.setdefault(reference, {})
+            if reference == "overview":
+                pending.update(values)
+            else:
+                for section, fields in values.items():
+                    pending.setdefault(section, {}).update(fields)
+
+
+class WriteCoalescer:
+    """
+    Desats pendents per fingerprint (memòria del procés, també amb CacheTokenBuckets: cada procés té els seus lots).
+    Cada lot es desa en acabar la finestra d'agrupació en un fil temporitzador, o en aturar el procés.
+
+    Els desats agrupats es responen amb 202: el client manté aquests camps pendents de confirmar i els torna a enviar
+    amb la versió `target` passada la finestra (veure `sync_answers` a user_data_manager.js). Si el lot no es pot desar
+    (desat concurrent d'un altre procés o de la mateixa pàgina), el client rep 409 i reenvia totes les respostes.
+    """
+    def __init__(self):
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def flush(self, fingerprint, retry = True):
+        """
+        Desa els canvis pendents d'un fingerprint (si n'hi ha) en una única transacció, només si les respostes encara
+        són a la versió del lot: un desat concurrent no es sobreescriu amb els valors (més antics) del lot, que es descarta.
+        Si la base de dades falla, el lot es torna a programar (fins a MAX_FLUSH_ATTEMPTS intents).
+
+        :param retry (bool): torna a programar el lot si falla. False en aturar el procés.
+        :return (int): versió desada, o None si no s'ha desat res.
+        """
+        with self.lock:
+            batch = self.pending.pop(fingerprint, None)
+        if batch is None:
+            return None
+        try:
+            version = sync_form_data(fingerprint, batch.changes, batch.base)
+            get_throttle().incr("flushes")
+            return version
+        except (VersionConflict, Form.DoesNotExist) as e: # Desat concurrent o formulari eliminat: el client reenviarà les respostes
+            logger.warning(f"Coalesced sync for {fingerprint} discarded (version {batch.base}): {e}")
+            get_throttle().incr("discarded")
+        except Exception as e:
+            batch.attempts += 1
+            if retry and batch.attempts < MAX_FLUSH_ATTEMPTS:
+                logger.warning(f"Error in WriteCoalescer.flush({fingerprint}), attempt {batch.attempts}: {e}")
+                self._reschedule(fingerprint, batch)
+            else:
+                logger.error(f"Error in WriteCoalescer.flush({fingerprint}): {e}")
+                get_throttle().incr("discarded")
+        return None
+
+    def _reschedule(self, fingerprint, batch):
+        """
+        Torna a programar un lot que no s'ha pogut desar. Si mentrestant s'ha obert un lot nou sobre la mateixa versió,
+        els canvis del lot anterior s'hi afegeixen per davant (els nous guanyen); si és d'una altra versió, es descarta.
+        """
+        with self.lock:
+            newer = self.pending.get(fingerprint)
+            if newer is None:
+                self.pending[fingerprint] = batch
+                self._schedule(fingerprint, batch.window)
+            elif newer.base == batch.base:
+                newer_changes, newer.changes = newer.changes, batch.changes
+                newer.merge(newer_changes)
+            else:
+                logger.warning(f"Coalesced sync for {fingerprint} discarded (version {batch.base} superseded by {newer.base})")
+                get_throttle().incr("discarded")
+
+    def _schedule(self, fingerprint, window):
+        timer = threading.Timer(window, self._flush_in_background, args = [fingerprint])
+        timer.daemon = True
+        timer.start()
+
+    def flush_all(self):
+        for fingerprint in list(self.pending):
+            self.flush(fingerprint, retry = False)
+
+    def _flush_in_background(self, fingerprint):
+        try:
+            self.flush(fingerprint)
+        finally:
+            connection.close() # el fil no forma part del cicle petició/resposta, tanquem la seva connexió
+
+    def merge(self, fingerprint, changes, version):
+        """
+        Afegeix canvis al lot pendent del fingerprint.
+
+        :return (int): versió que tindran les respostes quan es desi el lot, o None si el fingerprint no té cap lot pendent.
+        :raises VersionConflict: si la versió del client no correspon al lot.
+        """
+        with self.lock:
+            batch = self.pending.get(fingerprint)
+            if batch is None:
+                return None
+            if version is not None and version not in (batch.base, batch.target):
+                raise VersionConflict(batch.target)
+            batch.merge(changes)
+            return batch.target
+
+    def open(self, fingerprint, changes, version, base, window):
+        """
+        Crea el lot pendent del fingerprint a partir de la versió desada `base` i programa el seu desat al cap de
+        `window` segons. Si un altre fil l'ha creat mentrestant, els canvis s'hi afegeixen.
+
+        :return (int): versió que tindran les respostes quan es desi el lot.
+        :raises VersionConflict: si la versió del client no és la desada.
+        """
+        with self.lock:
+            batch = self.pending.get(fingerprint)
+            if batch is None:
+                if version is not None and version != base:
+                    raise VersionConflict(base)
+                batch = self.pending[fingerprint] = PendingSync(base, window)
+                self._schedule(fingerprint, window)
+            elif version is not None and version not in (batch.base, batch.target):
+                raise VersionConflict(batch.target)
+            batch.merge(changes)
+            return batch.target
+
+#----------------------------------------------------------------
+#------------------------------ API -----------------------------
+#----------------------------------------------------------------
+
+_throttle, _coalescer = None, WriteCoalescer()
+atexit.register(_coalescer.flush_all) # no es perden els canvis pendents en aturar el procés
+
+def get_throttle_config():
+    return {**DEFAULT_SAVE_THROTTLE, **getattr(settings, "SAVE_THROTTLE", {})}
+
+def get_throttle():
+    """
+    Retorna la instància dels cubells de fitxes configurats a settings.SAVE_THROTTLE.
+    """
+    global _throttle
+    if _throttle is None:
+        config = get_throttle_config()
+        _throttle = import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+    return _throttle
+
+def get_coalescer():
+    return _coalescer
+
+def throttled_sync(fingerprint, changes, version = None):
+    """
+    Aplica una sincronització del formulari (veure `sync_form_data`) limitant els desats per fingerprint.
+
+    - Si el fingerprint té un lot pendent, els canvis s'hi afegeixen (sense escriure a la base de dades).
+    - Si no, i li queden fitxes, es desa immediatament.
+    - Si no li queden fitxes, s'obre un lot que es desarà en acabar COALESCE_WINDOW segons: una ràfega de
+      desats es redueix a una sola escriptura amb l'últim valor de cada camp. Amb COALESCE_WINDOW = 0 es rebutja.
+
+    Els canvis agrupats encara no s'han desat: la versió retornada és la que tindran les respostes si el lot es desa
+    (veure `WriteCoalescer`).
+
+    :return (tuple): (versió de les respostes, True si els canvis s'han agrupat en un lot pendent).
+    :raises Throttled: si no queden fitxes i l'agrupació està desactivada.
+    :raises Form.DoesNotExist, VersionConflict, ValueError: com `sync_form_data`.
+    """
+    validate_changes(changes)
+    if not any(changes.values()): # Res a desar: no consumeix cap fitxa
+        return sync_form_data(fingerprint, changes, version), False
+
+    config, throttle = get_throttle_config(), get_throttle()
+    window = config["COALESCE_WINDOW"]
+
+    target = _coalescer.merge(fingerprint, changes, version)
+    if target is not None:
+        throttle.incr("coalesced")
+        return target, True
+
+    allowed, retry_after = throttle.consume(fingerprint)
+    if allowed:
+        throttle.incr("hits")
+        return sync_form_data(fingerprint, changes, version), False
+
+    if not window:
+        throttle.incr("dropped")
+        raise Throttled(retry_after)
+
+    base = get_form_version(fingerprint)
+    if base is None:
+        raise Form.DoesNotExist(f"No form found for fingerprint {fingerprint}.")
+    target = _coalescer.open(fingerprint, changes, version, base, window)
+    throttle.incr("coalesced")
+    return target, True
+
+def get_save_stats():
+    """
+    Retorna els comptadors de desats: immediats (hits), agrupats (coalesced), rebutjats (dropped), escriptures de lots
+    (flushes) i lots descartats (discarded). Els lots pendents (pending) són els del procés que respon.
+    """
+    return {**get_throttle().get_counters(), "pending": len(_coalescer.pending)}
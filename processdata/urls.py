@@ -6,10 +6,15 @@ urlpatterns = [
     path('get-csrf-token/', views.get_csrf_token, name='get_csrf_token'),
     path('check-fingerprint/', views.check_fingerprint_and_send_form, name = 'check_fingerprint'),
     path('save-fingerprint/', views.save_fingerprint, name = 'save_fingerprint'),
-    path('update-overview/', views.update_overview, name = 'update_overview'),
-    path('update-socioeconomic-dimension/', views.update_socioeconomic_dimension, name = 'update_socioeconomic_dimension'),
-    path('update-environment-dimension/', views.update_environment_dimension, name = 'update_environment_dimension'),
+    path('sync/', views.sync, name = 'sync'),
     path('results/', views.results, name = 'results'),
     path('evaluator/', views.evaluator, name = 'evaluator'),
-    path('tutorial/', views.tutorial, name = 'tutorial')
+    path('tutorial/', views.tutorial, name = 'tutorial'),
+    path('api/results/<str:fingerprint>/', views.api_results, name = 'api_results'),
+    path('api/save-stats/', views.save_stats, name = 'save_stats'),
+    # Versions asíncrones (ASGI)
+    path('async/check-fingerprint/', views.check_fingerprint_and_send_form_async, name = 'check_fingerprint_async'),
+    path('async/save-fingerprint/', views.save_fingerprint_async, name = 'save_fingerprint_async'),
+    path('async/sync/', views.sync_async, name = 'sync_async'),
+    path('async/results/', views.results_async, name = 'results_async'),
 ]
@@ -1,6 +1,7 @@
 import re
 import os
 import json
+import hashlib
 from django.conf import settings
 import requests
 
@@ -14,33 +15,74 @@ def load_json(filename):
     with open(file_path, "r", encoding = "utf-8") as file:
         return json.load(file)
     
-def reverse_geocode(lat, lon):
+def get_config_version(filenames):
     """
-    Retorna l'adreça en format de text donades latitud i longitud.
+    Retorna un identificador curt de la versió dels fitxers JSON de configuració (hash del seu contingut).
+    Canvia cada vegada que es modifica qualsevol dels fitxers.
+
+    :param filenames(list(str)): noms dels fitxers de processdata/config/.
+    """
+    digest = hashlib.sha256()
+    for filename in filenames:
+        with open(os.path.join(settings.JSON_DIR, filename), "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()[:12]
+
+# Geocodificació inversa amb Nominatim (OpenStreetMap)
+NOMINATIM_REVERSE_URL = "https://nominatim.openstreetmap.org/reverse"
+NOMINATIM_HEADERS = {
+    "User-Agent": "tfg-app-astrid/1.0 (astriddominguez@estudiantat.upc.edu)" 
+}
+
+def get_reverse_geocode_params(lat, lon):
+    """
+    Retorna els paràmetres de la petició de geocodificació inversa a Nominatim.
 
     :param lat(float): latitud 
     :param lon(float): longitud
     """
-    url = "https://nominatim.openstreetmap.org/reverse"
-    params = {
+    return {
         "format": "json",
         "lat": lat,
         "lon": lon,
         "zoom": 18, # 0-18; 18: building -> la ubicació més completa
         "addressdetails": 0 # 0 or 1. No necessitem l'adreça desglosada. 
     }
-    headers = {
-        "User-Agent": "tfg-app-astrid/1.0 (astriddominguez@estudiantat.upc.edu)" 
-    }
 
+def reverse_geocode(lat, lon, timeout = 5):
+    """
+    Retorna l'adreça en format de text donades latitud i longitud.
+
+    :param lat(float): latitud 
+    :param lon(float): longitud
+    :param timeout(float): segons màxims d'espera de la resposta de Nominatim.
+    """
     try:
-        response = requests.get(url, params=params, headers=headers)
+        response = requests.get(NOMINATIM_REVERSE_URL, params=get_reverse_geocode_params(lat, lon), headers=NOMINATIM_HEADERS, timeout=timeout)
         response.raise_for_status() # Si el codi és 404, 500, etc. Llança error
         data = response.json()
         return data.get("display_name") 
     except requests.RequestException as e:
         print("Error obtenint l’adreça:", e)
         return None
+
+async def areverse_geocode(lat, lon, timeout = 5):
+    """
+    Versió asíncrona de `reverse_geocode` (requereix httpx): l'espera de la resposta no bloqueja el fil.
+
+    :param lat(float): latitud 
+    :param lon(float): longitud
+    :param timeout(float): segons màxims d'espera de la resposta de Nominatim.
+    """
+    import httpx # dependència opcional, només per a les vistes asíncrones
+    try:
+        async with httpx.AsyncClient(headers=NOMINATIM_HEADERS, timeout=timeout) as client:
+            response = await client.get(NOMINATIM_REVERSE_URL, params=get_reverse_geocode_params(lat, lon))
+            response.raise_for_status()
+            return response.json().get("display_name")
+    except httpx.HTTPError as e:
+        print("Error obtenint l’adreça:", e)
+        return None
     
 def is_child(question_id):
     """
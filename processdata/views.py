@@ -1,13 +1,29 @@
 from django.utils.timezone import now
-from django.http import JsonResponse
+from django.http import HttpResponseNotModified
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from datetime import timedelta
+import math
 from django.views.decorators.csrf import csrf_protect
+from django.contrib.admin.views.decorators import staff_member_required
 from django.shortcuts import render
-from .models import UserFingerprint
+from asgiref.sync import sync_to_async
+from .models import UserFingerprint, Form, ResultSnapshot
+from .codec import JsonResponse, loads
 from django.middleware.csrf import get_token
-from .data import OVERVIEW_QUESTIONS, SOCIOECONOMIC_DIMENSION_QUESTIONS, ENVIRONMENT_DIMENSION_QUESTIONS
-import json
+from .data import OVERVIEW_QUESTIONS, SOCIOECONOMIC_DIMENSION_QUESTIONS, ENVIRONMENT_DIMENSION_QUESTIONS, CONFIG_VERSION
 from .rating.calculate import calculate_rating
+from .rating.cache import get_rating_cache
+from .bundle import get_built_question_bundle, render_question_markup
+from .snapshots import get_snapshot_etag, compact_scores
+from .throttle import Throttled, throttled_sync, get_save_stats, get_throttle_config
+from .resolver import get_for_fingerprint
+from .heartbeat import record_heartbeat
 from .getdata import *
+import logging
+
+logger = logging.getLogger(__name__)
 
 #-----------------------------------------------------------------------
 #----------------------------- VISTES-----------------------------------
@@ -23,13 +39,19 @@ def evaluator(request):
     step = request.GET.get("last") # Si es True es prové de la vista resultats.
     fingerprint = request.GET.get("fingerprintId") # únicament necessari si es prové de resultats.
 
-    return render(request, "pages/evaluator.html", {"overview_questions": OVERVIEW_QUESTIONS, "socio_economic_questions": SOCIOECONOMIC_DIMENSION_QUESTIONS, "environment_questions": ENVIRONMENT_DIMENSION_QUESTIONS, "LastStep": step, "fingerprintId": fingerprint})  
+    # Les preguntes es renderitzen una sola vegada: si s'ha generat el paquet estàtic (build_question_bundle) el navegador
+    # el descarrega i el manté a la caché; si no, s'insereix l'HTML pre-renderitzat directament a la pàgina.
+    question_bundle = get_built_question_bundle()
+    question_markup = {} if question_bundle else render_question_markup()
+
+    return render(request, "pages/evaluator.html", {"question_bundle": question_bundle, "question_markup": question_markup, "LastStep": step, "fingerprintId": fingerprint})
 
 # VISTA DE RESULTATS
 def results(request):
     fingerprint_id = request.GET.get("fingerprintId") 
     results = get_results(fingerprint_id) # s'obté respostes del formulari per l'usuari a partir del seu identificador.
-    ratings = calculate_rating(results) # a partir de les anteriors respostes es fa el càlcul i s'obté l'estructura de dades a mostrar.
+    # a partir de les anteriors respostes es fa el càlcul i s'obté l'estructura de dades a mostrar (o es recupera de la caché si no han canviat).
+    ratings = get_rating_cache().get_or_calculate(fingerprint_id, results, calculate_rating)
 
     return render(request, 'pages/results.html', {
         "fingerprint": fingerprint_id, 
@@ -62,36 +84,66 @@ def get_csrf_token(request):
     return response
 
 
+def get_form_etag(form_id, revision):
+    """
+    Retorna l'ETag de les respostes d'un formulari: canvia amb cada desat (revisió) i amb la configuració de preguntes.
+
+    :param form_id (int): clau primària del formulari.
+    :param revision (int): versió de les respostes.
+    """
+    return f'"{form_id}-{revision}-{CONFIG_VERSION[:12]}"'
+
+def is_last_seen_stale(last_seen):
+    """
+    Indica si cal actualitzar l'última connexió: només si és més antiga que settings.LAST_SEEN_RESOLUTION segons.
+
+    :param last_seen (datetime): última connexió desada.
+    """
+    return now() - last_seen >= timedelta(seconds = getattr(settings, "LAST_SEEN_RESOLUTION", 3600))
+
+def get_request_fingerprint_id(request):
+    """
+    Retorna el fingerprint d'una petició GET (`?fingerprint_id=...`) o POST (cos JSON).
+    """
+    if request.method == "GET":
+        return request.GET.get("fingerprint_id")
+    return loads(request.body).get("fingerprint_id")
+
 @csrf_protect 
 def check_fingerprint_and_send_form(request): 
     """
     Revisa si el fingerprint (ID de l'usuari existeix), i si ja existeix es retorna les dades contingudes del formulari
     per mostrar-les novament a la pàgina. 
+
+    Accepta GET (`?fingerprint_id=...`) amb petició condicional: la resposta porta un ETag derivat de la versió de
+    les respostes i, si coincideix amb `If-None-Match`, es respon 304 després d'una única consulta indexada.
+    L'última connexió (`last_seen`) només s'actualitza si és més antiga que settings.LAST_SEEN_RESOLUTION segons,
+    i es desa amb escriptura diferida (settings.HEARTBEAT).
     
     :param request (HttpRequest): petició HTTP rebuda.
     """
-    if request.method == "POST":
-        data = json.loads(request.body)
-        fingerprint_id = data.get("fingerprint_id")
+    if request.method in ("GET", "POST"):
+        fingerprint_id = get_request_fingerprint_id(request)
 
         if fingerprint_id:
-            
-            # Si afecta alguna columna l'usuari existeix i actualitza l'última vegada que aquest s'ha connectat
-            updated_rows = UserFingerprint.objects.filter(fingerprint_id = fingerprint_id).update(last_seen = now())
-            user_exists = updated_rows > 0
+            # Una única consulta (índex únic de fingerprint_id): formulari, versió i última connexió
+            form = Form.objects.filter(fingerprint__fingerprint_id = fingerprint_id).values("pk", "revision", "fingerprint_id", "fingerprint__last_seen").first()
+            user_exists = form is not None
 
             if user_exists: # Si l'usuari existeix retornem les respostes del formulari emmagatzemades 
-                overview_data = get_overview_data(fingerprint_id)
-                socioeconomic_data = get_socioeconomic_data(fingerprint_id)
-                environment_data = get_environment_data(fingerprint_id)
-                
-                form_data = {
-                    "overview": overview_data,
-                    "socioeconomic_dimension": socioeconomic_data,
-                    "environment_dimension": environment_data
-                }
-                
-                return JsonResponse({"message": "Searched if fingerprint is registered", "registered": user_exists, "form": form_data})
+                # Actualitza l'última vegada que l'usuari s'ha connectat (com a molt, una per interval, amb escriptura diferida)
+                if is_last_seen_stale(form["fingerprint__last_seen"]):
+                    record_heartbeat(form["fingerprint_id"])
+
+                etag = get_form_etag(form["pk"], form["revision"])
+                if etag in parse_etags(request.headers.get("If-None-Match", "")): # Respostes sense canvis
+                    response = HttpResponseNotModified()
+                else:
+                    response = JsonResponse({"message": "Searched if fingerprint is registered", "registered": user_exists, "form": get_form_data(fingerprint_id), "version": form["revision"]})
+
+                response["ETag"] = etag
+                patch_cache_control(response, private = True, no_cache = True) # el navegador revalida sempre amb l'ETag
+                return response
             else:
                 return JsonResponse({"message": "Searched if fingerprint is registered", "registered": user_exists})
 
@@ -106,85 +158,223 @@ def save_fingerprint(request):
     :param request (HttpRequest): petició HTTP rebuda.
     """ 
     if request.method == "POST":
-        data = json.loads(request.body)
+        data = loads(request.body)
         fingerprint_id = data.get("fingerprint_id")
 
         if fingerprint_id:
             user, created = UserFingerprint.objects.get_or_create(fingerprint_id = fingerprint_id)
 
-            user.last_seen = now() # última connexió 
-            user.save(update_fields = ['last_seen'])
+            if not created: # en crear-lo, last_seen ja és l'hora actual
+                record_heartbeat(user.pk) # última connexió (escriptura diferida, veure `processdata.heartbeat`)
 
             return JsonResponse({"message": "Fingerprint saved", "new": created}) 
 
     return JsonResponse({"error": "Method Not Allowed"}, status = 405)
 
+def get_sync_response(version, coalesced):
+    """
+    Resposta de /sync/: 200 si els canvis s'han desat, o 202 si s'han agrupat en un lot pendent (encara no desat).
+    Amb 202 el client ha de tornar a enviar els camps passats `retry_after` segons per confirmar-los (veure `WriteCoalescer`).
+    """
+    if coalesced:
+        retry_after = get_throttle_config()["COALESCE_WINDOW"]
+        return JsonResponse({"message": "Form sync pending", "version": version, "coalesced": True, "retry_after": retry_after}, status = 202)
+    return JsonResponse({"message": "Form synchronized", "version": version, "coalesced": False}, status = 200)
+
 @csrf_protect 
-def update_overview(request):
+def sync(request):
     """
-    Crida a la funció encarregada d'actualitzar la base de dades amb el formulari de dades generals del projecte
-    per a un usuari en concret.
-    
+    Aplica en una sola transacció els canvis del formulari (només els camps modificats, de qualsevol dimensió)
+    i retorna la nova versió de les respostes.
+
+    Cos de la petició: {"fingerprint": ..., "version": versió coneguda pel client, "changes": {"overview": {...},
+    "socioeconomic": {subdimensió: {...}}, "environment": {subdimensió: {...}}}}. Si la versió no és l'actual es
+    respon 409 amb la versió desada, perquè el client torni a enviar totes les seves respostes.
+
+    Els desats es limiten per fingerprint (settings.SAVE_THROTTLE): les ràfegues s'agrupen en una sola escriptura
+    (resposta 202 amb `coalesced`, veure `get_sync_response`) o, si l'agrupació està desactivada, es respon 429 amb `Retry-After`.
+
     :param request (HttpRequest): petició HTTP rebuda.
     """ 
     if request.method == "POST":
-        data = json.loads(request.body)
+        data = loads(request.body)
         fingerprint = data.get("fingerprint")
 
         if not fingerprint:
             return JsonResponse({"error": "Fingerprint is required"}, status = 400)
-        
-        del data["fingerprint"] 
-        if save_overview_data(fingerprint, data):
-            return JsonResponse({"message": "Overview updated successfully"}, status = 200)
-        else:
-            return JsonResponse({"error": "Failed to save overview data"}, status = 500)
+
+        try:
+            version, coalesced = throttled_sync(fingerprint, data.get("changes", {}), data.get("version"))
+            return get_sync_response(version, coalesced)
+        except Throttled as e:
+            response = JsonResponse({"error": "Too many saves", "retry_after": round(e.retry_after, 1)}, status = 429)
+            response["Retry-After"] = math.ceil(e.retry_after)
+            return response
+        except VersionConflict as e:
+            return JsonResponse({"error": "Version conflict", "version": e.version}, status = 409)
+        except Form.DoesNotExist:
+            return JsonResponse({"error": "Fingerprint not found"}, status = 404)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status = 400)
+        except Exception as e:
+            logger.error(f"Error in sync(...): {e}")
+            return JsonResponse({"error": "Failed to synchronize form"}, status = 500)
 
     return JsonResponse({"error": "Method Not Allowed"}, status = 405)
 
-@csrf_protect 
-def update_socioeconomic_dimension(request):
+def api_results(request, fingerprint):
     """
-    Crida a la funció encarregada d'actualitzar la base de dades amb el formulari de dimensió socioeconòmica per a un usuari concret.
-    
+    API de només lectura amb el resultat d'un formulari, a partir de la instantània recalculada per la cua de tasques
+    després de cada desat de respostes (veure `processdata.snapshots`): no es recalcula ni es renderitza res.
+
+    Amb `?format=compact` es retornen només les puntuacions [puntuació, màxim] per dimensió i secció. La resposta
+    porta un ETag i, si coincideix amb `If-None-Match`, es respon 304 sense llegir les puntuacions.
+    `stale` indica que la instantània es va calcular amb una altra versió de la configuració (veure `refresh_result_snapshots`).
+
     :param request (HttpRequest): petició HTTP rebuda.
-    """ 
+    :param fingerprint (str): id que identifica a l'usuari.
+    """
+    if request.method != "GET":
+        return JsonResponse({"error": "Method Not Allowed"}, status = 405)
+
+    compact = request.GET.get("format") == "compact"
+    try:
+        snapshot = get_for_fingerprint(ResultSnapshot.objects.only("revision", "config_version"), fingerprint)
+    except ResultSnapshot.DoesNotExist:
+        return JsonResponse({"error": "Results not available"}, status = 404)
+
+    etag = get_snapshot_etag(snapshot.form_id, snapshot.revision, snapshot.config_version, compact)
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponseNotModified()
+    else:
+        scores, updated_at = ResultSnapshot.objects.filter(pk = snapshot.form_id).values_list("scores", "updated_at").get()
+        response = JsonResponse({
+            "fingerprint": fingerprint,
+            "revision": snapshot.revision,
+            "updated_at": updated_at,
+            "stale": snapshot.config_version != CONFIG_VERSION,
+            "results": compact_scores(scores) if compact else scores
+        })
+
+    response["ETag"] = etag
+    patch_cache_control(response, private = True, no_cache = True)
+    return response
+
+@staff_member_required
+def save_stats(request):
+    """
+    Comptadors del límit de desats de /sync/ (veure `processdata.throttle`): desats immediats, agrupats, rebutjats,
+    escriptures de lots i lots pendents. Amb LocalTokenBuckets els comptadors són els del procés que respon.
+
+    :param request (HttpRequest): petició HTTP rebuda.
+    """
+    return JsonResponse(get_save_stats())
+
+#------------------------------------------------------------------------------
+#--------------------- PETICIONS ASÍNCRONES (ASGI) ----------------------------
+#------------------------------------------------------------------------------
+# Mateix comportament que les vistes anteriors, amb l'ORM asíncron. Servides amb ASGI (core/asgi.py), l'espera de
+# la base de dades i del geocodificador no bloqueja cap worker. Les operacions que requereixen transaccions
+# (desat de respostes i creació del formulari) s'executen amb sync_to_async.
+
+@csrf_protect
+async def check_fingerprint_and_send_form_async(request):
+    """
+    Versió asíncrona de `check_fingerprint_and_send_form`.
+
+    :param request (HttpRequest): petició HTTP rebuda.
+    """
+    if request.method in ("GET", "POST"):
+        fingerprint_id = get_request_fingerprint_id(request)
+
+        if fingerprint_id:
+            form = await Form.objects.filter(fingerprint__fingerprint_id = fingerprint_id).values("pk", "revision", "fingerprint_id", "fingerprint__last_seen").afirst()
+
+            if form is not None:
+                if is_last_seen_stale(form["fingerprint__last_seen"]):
+                    record_heartbeat(form["fingerprint_id"])
+
+                etag = get_form_etag(form["pk"], form["revision"])
+                if etag in parse_etags(request.headers.get("If-None-Match", "")):
+                    response = HttpResponseNotModified()
+                else:
+                    form_data = await sync_to_async(get_form_data)(fingerprint_id)
+                    response = JsonResponse({"message": "Searched if fingerprint is registered", "registered": True, "form": form_data, "version": form["revision"]})
+
+                response["ETag"] = etag
+                patch_cache_control(response, private = True, no_cache = True)
+                return response
+            else:
+                return JsonResponse({"message": "Searched if fingerprint is registered", "registered": False})
+
+    return JsonResponse({"error": "Method Not Allowed"}, status = 405)
+
+@csrf_protect
+async def save_fingerprint_async(request):
+    """
+    Versió asíncrona de `save_fingerprint`.
+
+    :param request (HttpRequest): petició HTTP rebuda.
+    """
     if request.method == "POST":
-        data = json.loads(request.body)
-        fingerprint = data.get("fingerprint")
+        fingerprint_id = loads(request.body).get("fingerprint_id")
 
-        if not fingerprint:
-            return JsonResponse({"error": "Fingerprint is required"}, status = 400)
+        if fingerprint_id:
+            user, created = await UserFingerprint.objects.aget_or_create(fingerprint_id = fingerprint_id)
 
-        del data["fingerprint"] 
-        if save_socioeconomic_data(fingerprint, data):
-            return JsonResponse({"message": "Socioeconomic Dimension updated"}, status = 200) 
-        else:
-            return JsonResponse({"error": "Failed to update Socioeconomic Dimension"}, status = 500)
+            if not created:
+                record_heartbeat(user.pk)
+
+            return JsonResponse({"message": "Fingerprint saved", "new": created}) 
 
     return JsonResponse({"error": "Method Not Allowed"}, status = 405)
 
-@csrf_protect 
-def update_environment_dimension(request):
+@csrf_protect
+async def sync_async(request):
     """
-    Crida a la funció encarregada d'actualitzar la base de dades amb el formulari de dimensió ambiental per a un usuari concret.
-    
+    Versió asíncrona de `sync`. La transacció amb bloqueig del formulari s'executa amb sync_to_async.
+
     :param request (HttpRequest): petició HTTP rebuda.
-    """ 
+    """
     if request.method == "POST":
-        data = json.loads(request.body)
+        data = loads(request.body)
         fingerprint = data.get("fingerprint")
 
         if not fingerprint:
             return JsonResponse({"error": "Fingerprint is required"}, status = 400)
-        
-        del data["fingerprint"]
-        if save_environment_data(fingerprint, data):
-            return JsonResponse({"message": "Environment Dimension updated"}, status = 200) 
-        else:
-            return JsonResponse({"error": "Failed to update Environment Dimension"}, status = 500)
+
+        try:
+            version, coalesced = await sync_to_async(throttled_sync)(fingerprint, data.get("changes", {}), data.get("version"))
+            return get_sync_response(version, coalesced)
+        except Throttled as e:
+            response = JsonResponse({"error": "Too many saves", "retry_after": round(e.retry_after, 1)}, status = 429)
+            response["Retry-After"] = math.ceil(e.retry_after)
+            return response
+        except VersionConflict as e:
+            return JsonResponse({"error": "Version conflict", "version": e.version}, status = 409)
+        except Form.DoesNotExist:
+            return JsonResponse({"error": "Fingerprint not found"}, status = 404)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status = 400)
+        except Exception as e:
+            logger.error(f"Error in sync_async(...): {e}")
+            return JsonResponse({"error": "Failed to synchronize form"}, status = 500)
 
     return JsonResponse({"error": "Method Not Allowed"}, status = 405)
 
+async def results_async(request):
+    """
+    Versió asíncrona de la vista de resultats: l'adreça de la mina pendent de resoldre s'obté amb el geocodificador
+    asíncron (veure `aget_overview_data_for_results`).
 
+    :param request (HttpRequest): petició HTTP rebuda.
+    """
+    fingerprint_id = request.GET.get("fingerprintId") 
+    results = await sync_to_async(get_results)(fingerprint_id)
+    ratings = await sync_to_async(get_rating_cache().get_or_calculate)(fingerprint_id, results, calculate_rating)
 
+    return render(request, 'pages/results.html', {
+        "fingerprint": fingerprint_id, 
+        "project_data": await aget_overview_data_for_results(fingerprint_id),
+        "ratings": ratings
+    })